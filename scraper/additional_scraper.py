@@ -3,21 +3,47 @@
 Additional scraper that extracts Amazon product URLs and swaps affiliate tags
 """
 
-import json
-import feedparser
-import requests
-import re
 import time
 import os
 from datetime import datetime
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+from deal_record import validate_deals
+from deal_store import DealStore, make_deal_id
+from retention import RetentionPolicy
+from feed_state import FeedState
+from priority_scheduler import PriorityScheduler
+from run_journal import RunJournal
+from near_dup import NearDupIndex
+from amazon import AsinCache, parse_asin, product_url
+from url_canon import affiliate_url
+from text_extract import clean_deal_title, extract_description
+from metrics import metrics, record_run
+from tenants import default_tenant
+
+# feedparser, requests, the post parser and the post-processing stages are imported where
+# they are used so a run with no feed changes exits before loading them
+
+# Try multiple RSS endpoints to get more deals
+FEED_URLS = [
+    'https://savingsguru.ca/feed/',
+    'https://savingsguru.ca/feed/?paged=2',
+    'https://savingsguru.ca/feed/?paged=3',
+    'https://savingsguru.ca/category/amazon/feed/',
+    'https://savingsguru.ca/category/deals/feed/',
+]
 
 class AdditionalScraper:
+    DEFAULT_LIMIT = 99
+    
+    @classmethod
+    def deal_limit(cls):
+        return int(os.getenv('DEAL_LIMIT', str(cls.DEFAULT_LIMIT)))
+    
     def __init__(self):
-        self.affiliate_tag = os.getenv('AFFILIATE_TAG', 'promopenguin-20')
+        self.affiliate_tag = default_tenant().affiliate_tag
         self.base_url = 'https://savingsguru.ca'
-        self.limit = int(os.getenv('DEAL_LIMIT', '99'))
+        self.limit = self.deal_limit()
+        self.journal = RunJournal('additional')
+        self.asin_cache = AsinCache()
         
         print(f"=== ADDITIONAL SCRAPER ===")
         print(f"Affiliate Tag: {self.affiliate_tag}")
@@ -25,36 +51,37 @@ class AdditionalScraper:
         print(f"===========================")
 
     def resolve_amazon_shortlink(self, short_url):
-        """Resolve Amazon short links to full URLs and swap affiliate tags"""
+        """Resolve Amazon short links to a minimal /dp/ASIN link with our affiliate tag"""
+        # Direct product links and shortlinks seen before need no request
+        parsed = parse_asin(short_url)
+        if not parsed:
+            parsed = self.asin_cache.lookup_link(short_url)
+            metrics.cache('asin_link', parsed is not None)
+        if parsed:
+            return product_url(*parsed, self.affiliate_tag)
+        
         try:
+            from http_client import open_stream
+            
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
             
-            # Follow redirects to get the final Amazon URL
-            response = requests.get(short_url, headers=headers, timeout=5, allow_redirects=True)
+            # Follow redirects to get the final Amazon URL; the product page itself is never downloaded
+            response = open_stream(short_url, headers)
             final_url = response.url
+            response.close()
             
-            # Check if it's an Amazon URL
+            parsed = parse_asin(final_url)
+            if parsed:
+                self.asin_cache.remember_link(short_url, *parsed)
+                print(f"  Resolved: {short_url[:50]}... -> Amazon ASIN {parsed[1]}")
+                return product_url(*parsed, self.affiliate_tag)
+            
+            # Amazon pages without a product (stores, searches) keep their URL, retagged
             if 'amazon.' in final_url:
-                # Parse the URL and swap the affiliate tag
-                parsed = urlparse(final_url)
-                query_params = parse_qs(parsed.query)
-                
-                # Replace or add our affiliate tag
-                query_params['tag'] = [self.affiliate_tag]
-                
-                # Remove other affiliate parameters that might conflict
-                unwanted_params = ['ascsubtag', 'ref', 'pf_rd_r', 'pf_rd_p', 'pf_rd_m', 'pf_rd_s', 'pf_rd_t', 'pf_rd_i']
-                for param in unwanted_params:
-                    query_params.pop(param, None)
-                
-                # Rebuild the URL with our affiliate tag
-                new_query = urlencode(query_params, doseq=True)
-                new_url = urlunparse((parsed.scheme, parsed.netloc, parsed.path, parsed.params, new_query, parsed.fragment))
-                
                 print(f"  Resolved: {short_url[:50]}... -> Amazon with our tag")
-                return new_url
+                return affiliate_url(final_url, self.affiliate_tag)
             else:
                 print(f"  Not Amazon: {final_url[:50]}...")
                 return final_url
@@ -67,41 +94,41 @@ class AdditionalScraper:
     def extract_shortlink_and_image(self, post_url):
         """Extract shortlink from beginning of post and steal WordPress image"""
         try:
+            from http_client import iter_text, open_stream
+            from post_extract import extract_post
+            
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
             
             print(f"  Visiting post: {post_url[:50]}...")
-            response = requests.get(post_url, headers=headers, timeout=8)
+            response = open_stream(post_url, headers)
             if response.status_code != 200:
-                return None, None
+                response.close()
+                return None, None, None
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            # One pass collects the links, images and body text used below, reading the
+            # page only until the post body has closed
+            post = extract_post(iter_text(response))
             
             # Find shortlink at the beginning of post body
             shortlink = None
-            post_content = soup.select_one('.entry-content, .post-content, .content, article')
-            
-            if post_content:
+            if post.first_any is not None:
                 # Look for first Amazon shortlink in the post content
-                first_links = post_content.find_all('a', href=True)[:5]  # Check first 5 links
+                first_links = [link for link in post.links if post.first_any in link.containers][:5]  # Check first 5 links
                 for link in first_links:
-                    href = link.get('href', '')
+                    href = link.href
                     if any(domain in href for domain in ['amzn.to', 'amazon.com', 'amazon.ca', 'a.co']):
                         shortlink = href
                         print(f"  Found shortlink: {shortlink[:50]}...")
                         break
             
-            # Steal the WordPress image - look for screenshots first
-            image_url = None
-            
             # Look for Amazon product images first, then any decent image
             image_url = None
-            all_images = soup.find_all('img')
             
             # First pass: Look for Amazon product images
-            for img in all_images:
-                src = img.get('src', '')
+            for img in post.images:
+                src = img.src
                 if not src:
                     continue
                 
@@ -113,8 +140,8 @@ class AdditionalScraper:
             
             # Second pass: If no Amazon image found, take first decent image
             if not image_url:
-                for img in all_images:
-                    src = img.get('src', '')
+                for img in post.images:
+                    src = img.src
                     if not src:
                         continue
                     
@@ -134,8 +161,8 @@ class AdditionalScraper:
                     image_url = self.base_url + image_url
                 print(f"  Stole WordPress image: {image_url[:50]}...")
             
-            # Extract actual content after the Ashly Fraser intro
-            actual_content = self.extract_content_after_intro(post_content)
+            # Extract actual content after the Ashly Fraser intro, reading only as far as needed
+            actual_content = extract_description(post.body_texts())
             
             return shortlink, image_url, actual_content
             
@@ -143,235 +170,251 @@ class AdditionalScraper:
             print(f"  Error extracting from post {post_url}: {e}")
             return None, None, None
 
-    def extract_content_after_intro(self, post_content):
-        """Extract the actual descriptive text after Ashly Fraser's standard intro, excluding social links"""
-        if not post_content:
-            return ""
+    def process_entry(self, entry, position):
+        """Turn one feed entry into an Amazon deal, or None if it has no usable shortlink"""
+        title = entry.title.strip()
+        post_url = entry.link
         
-        # Get all text content
-        full_text = post_content.get_text()
+        print(f"\nProcessing [{position+1}/{self.limit}]: {title[:50]}...")
         
-        # Look for the end of the standard intro pattern
-        intro_patterns = [
-            r"If you're not sure whether to buy, add to cart, and you can come back to it later!\*\*",
-            r"add to cart, and you can come back to it later!",
-            r"read some of the reviews and see people thought of the product",
-        ]
+        # Always extract shortlink and image from the blog post
+        print(f"  [INFO] Extracting shortlink and image from post...")
+        shortlink, image_url, actual_content = self.extract_shortlink_and_image(post_url)
         
-        # Try to find where the intro ends
-        content_start = 0
-        for pattern in intro_patterns:
-            match = re.search(pattern, full_text, re.IGNORECASE)
-            if match:
-                content_start = match.end()
-                break
+        if not shortlink:
+            print(f"  [SKIP] No Amazon shortlink found in post...")
+            metrics.inc('scraper_skipped_total', scraper='additional', reason='no_amazon_shortlink')
+            return None
         
-        # Extract content after the intro
-        actual_content = full_text[content_start:].strip()
+        # Resolve shortlink to long Amazon URL and swap affiliate tag
+        resolved_url = self.resolve_amazon_shortlink(shortlink)
+        if not resolved_url or 'amazon.' not in resolved_url:
+            print(f"  [SKIP] Failed to resolve shortlink to Amazon URL...")
+            metrics.inc('scraper_skipped_total', scraper='additional', reason='not_amazon')
+            return None
         
-        # Remove social media links and URLs
-        social_patterns = [
-            r'https?://[^\s]+',  # Any URLs
-            r'www\.[^\s]+',      # www links
-            r'facebook\.com[^\s]*', 
-            r'twitter\.com[^\s]*',
-            r'instagram\.com[^\s]*',
-            r'youtube\.com[^\s]*',
-            r'tiktok\.com[^\s]*',
-            r'Follow us on[^\n]*',
-            r'Like us on[^\n]*',
-            r'Subscribe[^\n]*',
-        ]
+        # One deal per product, however many posts or shortlinks lead to it
+        parsed = parse_asin(resolved_url)
+        deal_id = make_deal_id(*parsed) if parsed else make_deal_id(title, post_url)
         
-        for pattern in social_patterns:
-            actual_content = re.sub(pattern, '', actual_content, flags=re.IGNORECASE)
+        # Use blank/null for pricing instead of 0
+        price = None
+        original_price = None
+        discount = 0
         
-        # If we didn't find much content after the intro, just return the title
-        if len(actual_content.strip()) < 50:
-            # Get the title from the beginning (before "sells on Amazon")
-            title_match = re.search(r'^(.*?)(?:\s+sells on Amazon|$)', full_text, re.IGNORECASE)
-            if title_match:
-                actual_content = title_match.group(1).strip()
-                # Remove the author name and date if it's there
-                actual_content = re.sub(r'^.*?\d{4}\s+\d+\s+', '', actual_content).strip()
+        # Clean up title (remove price info and common prefixes)
+        clean_title = clean_deal_title(title)
         
-        # Clean up whitespace and limit length
-        actual_content = re.sub(r'\s+', ' ', actual_content).strip()
-        return actual_content[:300] + ('...' if len(actual_content) > 300 else '')
-
-    def resolve_and_retag_url(self, original_url):
-        """Resolve any shortened/redirect URLs and retag to our Amazon affiliate"""
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            # Follow redirects to get final URL
-            response = requests.get(original_url, headers=headers, timeout=5, allow_redirects=True)
-            final_url = response.url
-            
-            # Check if final URL is Amazon
-            if any(domain in final_url.lower() for domain in ['amazon.com', 'amazon.ca', 'amazon.co.uk', 'amzn.to']):
-                # Parse and retag Amazon URL
-                parsed = urlparse(final_url)
-                query_params = parse_qs(parsed.query)
-                
-                # Replace with our affiliate tag
-                query_params['tag'] = [self.affiliate_tag]
-                
-                # Remove conflicting affiliate parameters
-                unwanted_params = ['ascsubtag', 'ref_', 'pf_rd_r', 'pf_rd_p', 'pf_rd_m', 'pf_rd_s', 'pf_rd_t', 'pf_rd_i']
-                for param in unwanted_params:
-                    query_params.pop(param, None)
-                
-                # Rebuild URL with our tag
-                new_query = urlencode(query_params, doseq=True)
-                tagged_url = urlunparse((parsed.scheme, parsed.netloc, parsed.path, parsed.params, new_query, parsed.fragment))
-                
-                print(f"  [OK] Tagged Amazon URL: {original_url[:50]}...")
-                return tagged_url, True
+        # Use actual content extracted from post, or title if empty
+        if actual_content and len(actual_content.strip()) > 10:
+            description = actual_content
+        else:
+            # If no good content found, just double the title
+            description = f"{clean_title} - {clean_title}"
+        
+        # Use extracted image, the one last seen for this product, or a placeholder
+        if parsed:
+            if image_url:
+                self.asin_cache.remember_image(parsed[1], image_url)
             else:
-                print(f"  [SKIP] Not Amazon URL: {final_url[:50]}...")
-                return final_url, False
-                
-        except Exception as e:
-            print(f"  [ERROR] Error resolving URL {original_url}: {e}")
-            return original_url, False
+                image_url = self.asin_cache.image(parsed[1])
+        if not image_url:
+            image_url = f"https://via.placeholder.com/300x200/93c4d8/ffffff?text=Amazon+Deal+{position+1}"
+        
+        # Get entry date
+        date_added = datetime.now().strftime('%Y-%m-%d')
+        if hasattr(entry, 'published_parsed') and entry.published_parsed:
+            try:
+                date_added = time.strftime('%Y-%m-%d', entry.published_parsed)
+            except:
+                pass
+        
+        deal = {
+            'id': deal_id,
+            'title': clean_title,
+            'imageUrl': image_url,
+            'price': price,
+            'originalPrice': original_price,
+            'discountPercent': discount,
+            'category': 'Amazon',
+            'description': description,
+            'affiliateUrl': resolved_url,
+            'featured': position < 3,  # First 3 are featured
+            'dateAdded': date_added,
+            'source': 'Additional'
+        }
+        
+        print(f"  [OK] Added Amazon deal: {clean_title[:30]}...")
+        return deal
+
+    def scrape_additional_deals(self, feed_bodies=None, feed_urls=None, feed_state=None):
+        """Scrape deals from additional RSS feed into a list; see iter_additional_deals"""
+        return list(self.iter_additional_deals(feed_bodies, feed_urls, feed_state))
+
+    async def aiter_additional_deals(self, feed_bodies=None, feed_urls=None, feed_state=None):
+        """iter_additional_deals as an async iterator, for callers running an event loop"""
+        from pipeline import aiterate
+        async for deal in aiterate(self.iter_additional_deals(feed_bodies, feed_urls, feed_state)):
+            yield deal
+
+    def iter_additional_deals(self, feed_bodies=None, feed_urls=None, feed_state=None, results=None, stop_event=None):
+        """Yield deals from additional RSS feed with resolved/retagged links as each is made, best entries first
 
-    def scrape_additional_deals(self):
-        """Scrape deals from additional RSS feed and resolve/retag links"""
-        all_deals = []
+        With results ({post URL: deal} from work_queue workers) entries aren't processed here, only selected.
+        Setting stop_event ends the run after the current entry.
+        """
+        import feedparser
         
-        # Try multiple RSS endpoints to get more deals
-        feed_urls = [
-            'https://savingsguru.ca/feed/',
-            'https://savingsguru.ca/feed/?paged=2',
-            'https://savingsguru.ca/feed/?paged=3',
-            'https://savingsguru.ca/category/amazon/feed/',
-            'https://savingsguru.ca/category/deals/feed/',
-        ]
+        produced = 0
+        feed_bodies = feed_bodies or {}
+        feed_urls = feed_urls or FEED_URLS
+        scheduler = PriorityScheduler(self.limit, feed_state=feed_state, stop_event=stop_event)
         
-        processed_urls = set()  # Track processed posts to avoid duplicates
+        near_dups = NearDupIndex()  # Same post across overlapping feeds, or the same deal reworded
+        deal_ids = set()  # ASIN-based for Amazon products
         
         for feed_url in feed_urls:
-            if len(all_deals) >= self.limit:
-                break
-                
             print(f"Processing feed: {feed_url}")
             
             try:
-                feed = feedparser.parse(feed_url)
+                feed = feed_bodies.get(feed_url)
+                if not hasattr(feed, 'entries'):
+                    feed = feedparser.parse(feed or feed_url)
                 print(f"Found {len(feed.entries)} entries")
                 
-                for i, entry in enumerate(feed.entries):
-                    if len(all_deals) >= self.limit:
-                        break
-                        
-                    title = entry.title.strip()
-                    post_url = entry.link
-                    
-                    # Skip duplicates
-                    if post_url in processed_urls:
-                        continue
-                    processed_urls.add(post_url)
-                    
-                    print(f"\nProcessing [{len(all_deals)+1}/{self.limit}]: {title[:50]}...")
-                    
-                    # First try direct URL resolution
-                    resolved_url, is_amazon = self.resolve_and_retag_url(post_url)
-                    
-                    # Always extract shortlink and image from the blog post
-                    print(f"  [INFO] Extracting shortlink and image from post...")
-                    shortlink, image_url, actual_content = self.extract_shortlink_and_image(post_url)
-                    
-                    if not shortlink:
-                        print(f"  [SKIP] No Amazon shortlink found in post...")
-                        continue
-                    
-                    # Resolve shortlink to long Amazon URL and swap affiliate tag
-                    resolved_url = self.resolve_amazon_shortlink(shortlink)
-                    if not resolved_url or 'amazon.' not in resolved_url:
-                        print(f"  [SKIP] Failed to resolve shortlink to Amazon URL...")
-                        continue
-                    
-                    # Generate deal data from RSS entry
-                    deal_id = re.sub(r'[^a-z0-9]', '', title.lower())[:20] or f"add{len(all_deals)}"
-                    
-                    # Use blank/null for pricing instead of 0
-                    price = None
-                    original_price = None
-                    discount = 0
-                    
-                    # Clean up title (remove price info and common prefixes)
-                    clean_title = re.sub(r'\$\d+(?:\.\d{2})?(?:\s*(?:off|sale|deal|save))?', '', title, flags=re.IGNORECASE)
-                    clean_title = re.sub(r'^(?:deal|sale|save|hot)\s*:?\s*', '', clean_title, flags=re.IGNORECASE)
-                    clean_title = clean_title.strip()
-                    
-                    # Use actual content extracted from post, or title if empty
-                    if actual_content and len(actual_content.strip()) > 10:
-                        description = actual_content
-                    else:
-                        # If no good content found, just double the title
-                        description = f"{clean_title} - {clean_title}"
-                    
-                    # Use extracted image or placeholder
-                    if not image_url:
-                        image_url = f"https://via.placeholder.com/300x200/93c4d8/ffffff?text=Amazon+Deal+{len(all_deals)+1}"
-                    
-                    # Get entry date
-                    date_added = datetime.now().strftime('%Y-%m-%d')
-                    if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                        try:
-                            date_added = time.strftime('%Y-%m-%d', entry.published_parsed)
-                        except:
-                            pass
-                    
-                    deal = {
-                        'id': deal_id,
-                        'title': clean_title,
-                        'imageUrl': image_url,
-                        'price': price,
-                        'originalPrice': original_price,
-                        'discountPercent': discount,
-                        'category': 'Amazon',
-                        'description': description,
-                        'affiliateUrl': resolved_url,
-                        'featured': len(all_deals) < 3,  # First 3 are featured
-                        'dateAdded': date_added,
-                        'source': 'Additional'
-                    }
-                    
-                    all_deals.append(deal)
-                    print(f"  [OK] Added Amazon deal: {clean_title[:30]}...")
-                    
-                    time.sleep(0.2)  # Be respectful to the server
+                # Skip posts already queued from an overlapping feed
+                entries = []
+                for entry in feed.entries:
+                    if not near_dups.find(url=entry.link):
+                        near_dups.add(entry.link, url=entry.link)
+                        entries.append(entry)
+                scheduler.add_feed(feed_url, entries)
                     
             except Exception as e:
                 print(f"Error processing feed {feed_url}: {e}")
                 continue
         
-        return all_deals
+        for item in scheduler:
+            duplicate_of = near_dups.find(item.entry.title)
+            if duplicate_of:
+                print(f"  [SKIP] Duplicate of {duplicate_of[:50]}: {item.entry.title[:30]}...")
+                metrics.inc('scraper_skipped_total', scraper='additional', reason='duplicate')
+                continue
+            
+            # Entries worked by work_queue workers or finished by an interrupted earlier run need no work
+            if results is not None:
+                deal = results.get(item.entry.link)
+                # Workers don't know the final order
+                done = {'deal': dict(deal, featured=produced < 3) if deal else None}
+            else:
+                done = self.journal.get(item.entry.link)
+                metrics.cache('journal', done is not None)
+            if done is not None:
+                deal = done['deal']
+            else:
+                try:
+                    with metrics.timed('scraper_stage_seconds', scraper='additional', stage='entry'):
+                        deal = self.process_entry(item.entry, produced)
+                except Exception as e:
+                    print(f"  [ERROR] Error processing entry from {item.feed_url}: {e}")
+                    metrics.inc('scraper_skipped_total', scraper='additional', reason='error')
+                    deal = None
+                else:
+                    self.journal.record(item.entry.link, deal=deal)
+                time.sleep(0.2)  # Be respectful to the server
+            if deal:
+                # Rejected before the link check and image stages spend requests on it
+                valid = self.valid_deals([deal])
+                deal = valid[0] if valid else None
+            if deal and deal['id'] in deal_ids:
+                print(f"  [SKIP] Same Amazon product as an earlier deal: {deal['title'][:30]}...")
+                metrics.inc('scraper_skipped_total', scraper='additional', reason='same_product')
+                deal = None
+            scheduler.record(item, 1 if deal else 0)
+            if deal:
+                near_dups.add(item.entry.link, item.entry.title)
+                deal_ids.add(deal['id'])
+                produced += 1
+                metrics.inc('scraper_deals_total', scraper='additional', source=deal['source'])
+                yield deal
+        
+        self.asin_cache.save()
+
+    def valid_deals(self, batch):
+        """The deals in a batch that pass the deal_models rules, as plain dicts"""
+        # Amazon deals carry no price, so they're held to the other rules only
+        records, errors = validate_deals(batch, require_price=False, max_deals=len(batch))
+        for deal_id, error in errors:
+            print(f"  [INVALID] {deal_id}: {error}")
+        metrics.inc('scraper_skipped_total', len(errors), scraper='additional', reason='invalid')
+        return [record.to_dict() for record in records]
 
     def save_deals(self, deals):
-        """Save deals to JSON file"""
+        """Merge deals (any iterable, consumed as it yields) into the deal store and export additional_deals.json
+
+        Returns the number of deals stored.
+        """
+        from pipeline import SAVE_BATCH, PublishTimer, batched
         output_path = '../public/additional_deals.json'
+        now = time.time()
+        count = 0
+        retention = RetentionPolicy.from_env()
+        publish = PublishTimer()
         
-        print(f"\nSaving {len(deals)} additional deals to {output_path}")
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(deals, f, indent=2, ensure_ascii=False)
+        with DealStore() as store:
+            store.import_json(output_path, 'additional_deals.json', 'Additional')
+            for batch in batched(deals, SAVE_BATCH):
+                # Checked again after the later stages, which rewrite links and images
+                batch = self.valid_deals(batch)
+                with metrics.timed('scraper_stage_seconds', scraper='additional', stage='store'):
+                    store.upsert_deals(batch, 'additional_deals.json', 'Additional', start_position=count, now=now)
+                count += len(batch)
+                if batch and publish.due():
+                    # Publish early; the final compaction below is a no-op if nothing changed since
+                    with metrics.timed('scraper_stage_seconds', scraper='additional', stage='export'):
+                        retention.compact(store, 'additional_deals.json', output_path)
+            print(f"\nSaving {count} additional deals to {output_path}")
+            with metrics.timed('scraper_stage_seconds', scraper='additional', stage='export'):
+                retention.compact(store, 'additional_deals.json', output_path)
         
-        print(f"[OK] Saved {len(deals)} additional deals successfully!")
-        return deals
+        self.journal.clear()
+        print(f"[OK] Saved {count} additional deals successfully!")
+        return count
 
 def main():
+    started = time.time()
+    # Cheap conditional check first: exit before importing anything heavy if no feed changed
+    feed_state = FeedState()
+    feed_bodies, changed = feed_state.fetch_all(FEED_URLS)
+    if not changed and os.getenv('FORCE_RUN', '0') != '1':
+        print("No feed changes since last run - nothing to do")
+        record_run('additional', started, 0)
+        metrics.write_textfile('additional')
+        return
+    
+    from pipeline import peek
+    
     scraper = AdditionalScraper()
-    deals = scraper.scrape_additional_deals()
-    if deals:
-        scraper.save_deals(deals)
-        print(f"\n[SUCCESS] Generated {len(deals)} additional deals total!")
+    # Each stage pulls deals as the one before produces them
+    deals = scraper.iter_additional_deals(feed_bodies, feed_state=feed_state)
+    if os.getenv('LINK_CHECK', '1') != '0':
+        from link_checker import LinkChecker
+        deals = LinkChecker().filter_stream(deals)
+    if os.getenv('IMAGE_PIPELINE', '1') != '0':
+        from image_pipeline import ImagePipeline
+        deals = ImagePipeline().process_stream(deals)
+    # An empty run must not replace the existing output
+    first, deals = peek(deals)
+    if first is not None:
+        count = scraper.save_deals(deals)
+        feed_state.commit()
+        print(f"\n[SUCCESS] Generated {count} additional deals total!")
     else:
+        count = 0
+        scraper.journal.clear()
         print("\n[WARNING] No deals found!")
+    record_run('additional', started, count)
+    metrics.write_textfile('additional')
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
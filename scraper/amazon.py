@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Amazon URL canonicalization: reduce any product link to its marketplace and ASIN,
+and remember shortlink resolutions and images per ASIN between runs
+"""
+
+import json
+import os
+import re
+from urllib.parse import urlsplit
+
+from deal_store import write_json_atomic
+
+MARKETPLACE_RE = re.compile(r'(?:^|\.)(amazon\.(?:ca|com|co\.uk|de|fr|it|es|co\.jp|com\.au|com\.mx|in))$')
+ASIN_RE = re.compile(r'/(?:dp|gp/product|gp/aw/d|o/ASIN|exec/obidos/ASIN|d)/([A-Z0-9]{10})(?=[/?#]|$)', re.IGNORECASE)
+
+
+def parse_asin(url):
+    """(marketplace, ASIN) of an Amazon product URL, or None"""
+    parts = urlsplit(str(url))
+    marketplace = MARKETPLACE_RE.search(parts.netloc.lower().split(':')[0])
+    asin = ASIN_RE.search(parts.path)
+    if not marketplace or not asin:
+        return None
+    return marketplace.group(1), asin.group(1).upper()
+
+
+def product_url(marketplace, asin, tag=None):
+    """Minimal product link, tagged when a tag is given"""
+    url = f'https://www.{marketplace}/dp/{asin}'
+    return f'{url}?tag={tag}' if tag else url
+
+
+class AsinCache:
+    def __init__(self, path=None):
+        self.path = path or os.getenv('ASIN_CACHE_PATH', 'state/asin_cache.json')
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        # shortlink -> [marketplace, asin]
+        self.links = data.get('links', {})
+        # asin -> {'image': url}
+        self.products = data.get('products', {})
+        self.dirty = False
+
+    def lookup_link(self, shortlink):
+        parsed = self.links.get(shortlink)
+        return tuple(parsed) if parsed else None
+
+    def remember_link(self, shortlink, marketplace, asin):
+        if self.links.get(shortlink) != [marketplace, asin]:
+            self.links[shortlink] = [marketplace, asin]
+            self.dirty = True
+
+    def image(self, asin):
+        return self.products.get(asin, {}).get('image')
+
+    def remember_image(self, asin, image_url):
+        if image_url and self.image(asin) != image_url:
+            self.products.setdefault(asin, {})['image'] = image_url
+            self.dirty = True
+
+    def save(self):
+        if self.dirty:
+            write_json_atomic(self.path, {'links': self.links, 'products': self.products})
+            self.dirty = False
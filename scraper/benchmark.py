@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+Scraper benchmarks and regression guards
+
+Usage:
+    python benchmark.py startup [--budget-ms 50]
+    python benchmark.py urls [--count 100000] [--target 100000]
+    python benchmark.py records [--count 20000]
+    python benchmark.py transport [--requests 400] [--delay-ms 20]
+    python benchmark.py browser [--pages 20]
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ENTRY_MODULES = ['simple_scraper', 'additional_scraper', 'simple_scraper_original']
+
+# Modules that must only load on the code paths that use them
+HEAVY_MODULES = ['requests', 'bs4', 'feedparser', 'PIL', 'pydantic', 'playwright']
+
+
+def import_profile(module):
+    """Run `python -X importtime` for one module and return ({module: cumulative_us}, total_us)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative_us, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        if cumulative_us.isdigit():
+            cumulative[name] = int(cumulative_us)
+    return cumulative, cumulative.get(module, 0)
+
+
+def bench_startup(args):
+    """Fail if an entry module imports a heavy dependency or exceeds its import budget"""
+    failures = []
+    for module in ENTRY_MODULES:
+        best_us = None
+        loaded_heavy = set()
+        for _ in range(args.repeat):
+            cumulative, total_us = import_profile(module)
+            best_us = total_us if best_us is None else min(best_us, total_us)
+            loaded_heavy |= {name for name in cumulative if name.split('.')[0] in HEAVY_MODULES}
+
+        heavy_roots = sorted({name.split('.')[0] for name in loaded_heavy})
+        status = 'OK'
+        if heavy_roots:
+            status = 'FAIL'
+            failures.append(f"{module} imports {', '.join(heavy_roots)} at startup")
+        if best_us / 1000 > args.budget_ms:
+            status = 'FAIL'
+            failures.append(f"{module} import took {best_us / 1000:.1f}ms (budget {args.budget_ms}ms)")
+        print(f"{module:<28} {best_us / 1000:8.1f} ms  {status}")
+
+    for failure in failures:
+        print(f"  [REGRESSION] {failure}")
+    return 1 if failures else 0
+
+
+def sample_urls(count, unique):
+    """Realistic mix of merchant links with tracking params, repeated like a real feed backlog"""
+    rng = random.Random(42)
+    templates = [
+        'https://www.amazon.ca/Product-Name/dp/B0{n:08d}/ref=sr_1_{r}?pf_rd_r=X{r}&tag=someone-20&th=1',
+        'https://www.amazon.ca/s?k=item+{n}&ref=nb_sb_noss&tag=other-20',
+        'https://www.walmart.ca/en/ip/item/{n}?wmlspartner=abc{r}&affillinktype=10&selectedSku={r}',
+        'https://www.bestbuy.ca/en-ca/product/{n}?irgwc=1&utm_source=rfd&utm_medium=link',
+        'https://shop.example{r}.com/p/{n}?content_id={r}&utm_content=feed&fbclid=XYZ{n}#top',
+        'https://merchant{r}.ca/sale/{n}',
+    ]
+    pool = [rng.choice(templates).format(n=i, r=rng.randrange(100)) for i in range(unique)]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def bench_urls(args):
+    """Throughput of the memoized batch canonicalizer against a URLs/second target"""
+    import url_canon
+
+    urls = sample_urls(args.count, args.unique)
+    results = {}
+    for name, run in [('canonical_urls', lambda: url_canon.canonical_urls(urls)),
+                      ('affiliate_urls', lambda: url_canon.affiliate_urls(urls, 'promopenguin-20'))]:
+        url_canon._canonical_memo.clear()
+        url_canon._affiliate_memo.clear()
+        start = time.perf_counter()
+        run()
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        run()
+        warm = time.perf_counter() - start
+        results[name] = args.count / cold
+        print(f"{name:<16} cold {args.count / cold:>12,.0f} URLs/s   warm {args.count / warm:>12,.0f} URLs/s")
+
+    slow = [name for name, rate in results.items() if rate < args.target]
+    for name in slow:
+        print(f"  [REGRESSION] {name} below {args.target:,} URLs/s on a cold memo")
+    return 1 if slow else 0
+
+
+def sample_deals(count):
+    """Deal dicts shaped like the scrapers' output"""
+    rng = random.Random(7)
+    deals = []
+    for i in range(count):
+        price = round(rng.uniform(19, 799), 2)
+        original = round(price * rng.uniform(1.2, 1.8), 2)
+        deals.append({
+            'id': f'{i:020x}',
+            'title': f'Sample product {i} on sale at a Canadian retailer',
+            'imageUrl': f'/img/{i:016x}-300x200.webp',
+            'price': price,
+            'originalPrice': original,
+            'discountPercent': int((original - price) / original * 100),
+            'category': rng.choice(['General', 'Flyer', 'Amazon']),
+            'description': f'Discover why thousands love sample product {i}. Quality meets value!',
+            'affiliateUrl': f'https://www.walmart.ca/en/ip/item/{i}',
+            'featured': i < 3,
+            'dateAdded': '2026-10-19',
+        })
+    return deals
+
+
+def measure(run):
+    """(seconds, bytes still allocated) for run, and its result; timed separately as tracing slows allocation"""
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = run()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, allocated, result
+
+
+def bench_records(args):
+    """Memory per deal and validate/encode/decode throughput: dicts + pydantic vs DealRecord"""
+    import json
+    from deal_record import DealRecord, decode_deals, encode_deals, validate_deals
+
+    deals = sample_deals(args.count)
+    text = json.dumps(deals)
+    rows = []
+
+    _, dict_bytes, _ = measure(lambda: json.loads(text))
+    _, record_bytes, records = measure(lambda: decode_deals(text))
+    rows.append(('memory/deal', f'{dict_bytes / args.count:,.0f} B (dict)', f'{record_bytes / args.count:,.0f} B'))
+
+    try:
+        from deal_models import Deal, DealsCollection
+    except ImportError:
+        Deal = None
+    if Deal is not None:
+        # Today's per-deal path; DealsCollection caps collections at 200, so it runs per 200 deals
+        def pydantic_validate():
+            models = [Deal(**deal) for deal in deals]
+            for start in range(0, len(models), 200):
+                DealsCollection(deals=models[start:start + 200])
+            return [model.model_dump() for model in models]
+        before = measure(pydantic_validate)[0]
+    else:
+        before = None
+    after = measure(lambda: validate_deals(deals, max_deals=len(deals)))[0]
+    rows.append(('validate', f'{args.count / before:,.0f}/s (pydantic)' if before else 'pydantic not installed',
+                 f'{args.count / after:,.0f}/s'))
+
+    before = measure(lambda: json.dumps(deals, indent=2, ensure_ascii=False))[0]
+    after = measure(lambda: encode_deals(records))[0]
+    rows.append(('encode', f'{args.count / before:,.0f}/s (indent=2)', f'{args.count / after:,.0f}/s'))
+
+    before = measure(lambda: json.loads(text))[0]
+    after = measure(lambda: decode_deals(text))[0]
+    rows.append(('decode', f'{args.count / before:,.0f}/s (dicts)', f'{args.count / after:,.0f}/s'))
+
+    print(f"{args.count:,} deals{'':<12} {'today':>30}   {'DealRecord':>14}")
+    for name, today, record in rows:
+        print(f"{name:<22} {today:>30}   {record:>14}")
+
+    valid, errors = validate_deals(deals, max_deals=len(deals))
+    if errors or len(valid) != len(deals) or [DealRecord.to_dict(r) for r in valid] != deals:
+        print("  [REGRESSION] sample deals did not round-trip through validate_deals")
+        return 1
+    return 0
+
+
+def serve_http1(payload, delay, handshake):
+    """Threaded keep-alive HTTP/1.1 server on a free port; returns (server, connections counter)
+
+    handshake seconds are spent on every new connection, standing in for TCP + TLS setup.
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    connections = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out as separate writes; don't let Nagle hold the body back
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            connections[0] += 1
+            time.sleep(handshake)
+            super().setup()
+
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            pass  # Clients closing early reset the connection
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, connections
+
+
+def serve_h2c(payload, delay, handshake):
+    """Cleartext HTTP/2 (prior knowledge) server on a free port, built on h2; returns (port, connections counter)"""
+    import asyncio
+    import threading
+    from h2.config import H2Configuration
+    from h2.connection import H2Connection
+    from h2.events import ConnectionTerminated, RequestReceived, StreamReset, WindowUpdated
+    from h2.exceptions import StreamClosedError
+
+    connections = [0]
+    started = threading.Event()
+    port = [None]
+
+    async def handle(reader, writer):
+        connections[0] += 1
+        await asyncio.sleep(handshake)
+        conn = H2Connection(H2Configuration(client_side=False))
+        conn.initiate_connection()
+        writer.write(conn.data_to_send())
+        window_open = asyncio.Event()
+        reset = set()
+
+        async def respond(stream_id):
+            try:
+                await send_response(stream_id)
+            except (StreamClosedError, ConnectionError):
+                pass  # The client reset the stream after reading what it needed
+
+        async def send_response(stream_id):
+            await asyncio.sleep(delay)
+            conn.send_headers(stream_id, [(':status', '200'), ('content-type', 'text/html; charset=utf-8'),
+                                          ('content-length', str(len(payload)))])
+            sent = 0
+            while sent < len(payload):
+                window = min(conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size)
+                if stream_id in reset:
+                    return
+                if window <= 0:
+                    window_open.clear()
+                    writer.write(conn.data_to_send())
+                    await window_open.wait()
+                    continue
+                chunk = payload[sent:sent + window]
+                sent += len(chunk)
+                conn.send_data(stream_id, chunk, end_stream=sent >= len(payload))
+                writer.write(conn.data_to_send())
+                await writer.drain()
+
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            for event in conn.receive_data(data):
+                if isinstance(event, RequestReceived):
+                    asyncio.ensure_future(respond(event.stream_id))
+                elif isinstance(event, WindowUpdated):
+                    window_open.set()
+                elif isinstance(event, StreamReset):
+                    reset.add(event.stream_id)
+                    window_open.set()
+                elif isinstance(event, ConnectionTerminated):
+                    window_open.set()
+            writer.write(conn.data_to_send())
+            await writer.drain()
+        writer.close()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(asyncio.start_server(handle, '127.0.0.1', 0))
+        port[0] = server.sockets[0].getsockname()[1]
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return port[0], connections
+
+
+def bench_transport(args):
+    """Post-page fetches through the shared HTTP layer: pooled HTTP/1.1 vs multiplexed HTTP/2
+
+    'early close' reads only the start of each page and closes it, like open_stream + iter_text
+    once a post body has ended: HTTP/1.1 has to drop the connection, HTTP/2 only resets the stream.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import requests
+    from http_client import CHUNK_SIZE, Http2Adapter, InstrumentedAdapter
+
+    try:
+        import h2  # noqa: F401
+        import httpx  # noqa: F401
+    except ImportError:
+        print("transport benchmark needs httpx[http2] (pip install 'httpx[http2]')")
+        return 0
+
+    payload = (b'<html><body>' + b'<p>deal text</p>' * (args.kb * 64))[:args.kb * 1024]
+    delay = args.delay_ms / 1000
+    handshake = args.handshake_ms / 1000
+    h1_server, h1_connections = serve_http1(payload, delay, handshake)
+    h2_port, h2_connections = serve_h2c(payload, delay, handshake)
+    early_bytes = args.early_kb * 1024
+
+    def run(name, session, url, connections, early_close):
+        def fetch(_):
+            start = time.perf_counter()
+            if early_close:
+                response = session.get(url, timeout=(5, 30), stream=True)
+                body = b''
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    body += chunk
+                    if len(body) >= early_bytes:
+                        break
+                response.close()
+                intact = payload.startswith(body)
+            else:
+                intact = session.get(url, timeout=(5, 30)).content == payload
+            return time.perf_counter() - start, intact
+
+        session.get(url).content  # Warm the connection
+        before = connections[0]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.streams) as pool:
+            results = list(pool.map(fetch, range(args.requests)))
+        elapsed = time.perf_counter() - start
+        latencies = sorted(latency for latency, _ in results)
+        ok = all(intact for _, intact in results)
+        print(f"{name:<24} {args.requests / elapsed:>9,.0f} req/s   p50 {latencies[len(latencies) // 2] * 1000:6.1f} ms"
+              f"   p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.1f} ms"
+              f"   connections {connections[0]:>3} ({connections[0] - before} during run)")
+        return ok
+
+    http1 = requests.Session()
+    adapter = InstrumentedAdapter(pool_connections=32, pool_maxsize=args.streams)
+    http1.mount('http://', adapter)
+
+    http2 = requests.Session()
+    http2.mount('http://', Http2Adapter(adapter, max_streams=args.streams, prior_knowledge=True))
+
+    print(f"{args.requests} GETs of {args.kb} KB, {args.delay_ms} ms server delay, {args.handshake_ms} ms connection "
+          f"setup, {args.streams} concurrent per host")
+    ok = True
+    for early_close in (False, True):
+        mode = f'early close {args.early_kb} KB' if early_close else 'full page'
+        ok = run(f'HTTP/1.1 {mode}', http1, f'http://127.0.0.1:{h1_server.server_address[1]}/post',
+                 h1_connections, early_close) and ok
+        ok = run(f'HTTP/2   {mode}', http2, f'http://127.0.0.1:{h2_port}/post', h2_connections, early_close) and ok
+    h1_server.shutdown()
+    if not ok:
+        print("  [REGRESSION] a transport returned a body that differs from what the server sent")
+        return 1
+    return 0
+
+
+def bench_browser(args):
+    """BrowserPool against fixtures/js_links.html served locally: finds the scripted links, cold vs warm"""
+    import functools
+    import threading
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+    from browser_pool import BrowserPool
+
+    expected = {
+        'https://www.example.com/static-deal',
+        'https://www.amazon.ca/dp/B000000000',
+        'https://www.example.com/onclick-deal',
+    }
+    fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(Handler, directory=fixtures))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/js_links.html'
+
+    pool = BrowserPool(max_pages=args.max_pages)
+    try:
+        start = time.perf_counter()
+        try:
+            links = pool.extract_links(url)
+        except Exception as e:
+            print(f"browser benchmark needs Playwright and Chromium (playwright install chromium): {e}")
+            return 0
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = pool.extract_links_many([f'{url}?page={i}' for i in range(args.pages)])
+        warm = time.perf_counter() - start
+    finally:
+        pool.close()
+        server.shutdown()
+
+    found = {link['url'] for link in links}
+    print(f"cold start + first page   {cold * 1000:8.1f} ms   {len(found & expected)}/{len(expected)} fixture links")
+    print(f"{args.pages} pages on warm pool    {warm * 1000:8.1f} ms   "
+          f"({warm / max(args.pages, 1) * 1000:.1f} ms/page, {args.max_pages} pages open)")
+    missing = expected - found
+    empty = sum(1 for page_links in results.values() if {link['url'] for link in page_links} != found)
+    if missing or empty:
+        print(f"  [REGRESSION] missing links {sorted(missing)}; {empty} warm pages differ from the first")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    startup = commands.add_parser('startup', help='import-time budget for the scraper entry points')
+    startup.add_argument('--budget-ms', type=float, default=50.0)
+    startup.add_argument('--repeat', type=int, default=3)
+    startup.set_defaults(func=bench_startup)
+
+    urls = commands.add_parser('urls', help='URL canonicalization throughput')
+    urls.add_argument('--count', type=int, default=100000)
+    urls.add_argument('--unique', type=int, default=20000)
+    urls.add_argument('--target', type=int, default=100000)
+    urls.set_defaults(func=bench_urls)
+
+    records = commands.add_parser('records', help='deal record memory and validate/encode/decode throughput')
+    records.add_argument('--count', type=int, default=20000)
+    records.set_defaults(func=bench_records)
+
+    transport = commands.add_parser('transport', help='HTTP/1.1 vs HTTP/2 against local servers')
+    transport.add_argument('--requests', type=int, default=400)
+    transport.add_argument('--streams', type=int, default=4, help='concurrent requests per host (rate limiter default)')
+    transport.add_argument('--kb', type=int, default=48, help='page size')
+    transport.add_argument('--delay-ms', type=int, default=20, help='server think time per request')
+    transport.add_argument('--handshake-ms', type=int, default=30, help='cost of opening a connection (TCP + TLS)')
+    transport.add_argument('--early-kb', type=int, default=8, help='bytes read before closing in the early-close run')
+    transport.set_defaults(func=bench_transport)
+
+    browser = commands.add_parser('browser', help='Playwright pool against the JS-built links fixture')
+    browser.add_argument('--pages', type=int, default=20)
+    browser.add_argument('--max-pages', type=int, default=4)
+    browser.set_defaults(func=bench_browser)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
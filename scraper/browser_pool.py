@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Long-lived Playwright browser pool for posts whose links are built in JavaScript
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+from deal_store import write_json_atomic
+
+# Scripts (and the requests they make) are needed to build the links; everything else is skipped
+ALLOWED_RESOURCE_TYPES = {'document', 'script', 'xhr', 'fetch'}
+
+EXTRACT_LINKS_JS = r"""
+    () => {
+        const contentArea = document.querySelector('.entry-content, article, .post-content');
+        if (!contentArea) return [];
+
+        const links = [];
+        const anchors = contentArea.querySelectorAll('a');
+
+        anchors.forEach(a => {
+            let url = null;
+            let text = a.textContent.trim();
+
+            // Check href first
+            if (a.href && a.href.startsWith('http')) {
+                url = a.href;
+            }
+            // Check onclick for JavaScript links
+            else if (a.onclick) {
+                const onclickStr = a.onclick.toString();
+                const urlMatch = onclickStr.match(/https?:\/\/[^'")]+/);
+                if (urlMatch) {
+                    url = urlMatch[0];
+                }
+            }
+
+            if (url && text) {
+                links.push({ url, text });
+            }
+        });
+
+        return links;
+    }
+"""
+
+
+class JsHostMemo:
+    """Remembers per host whether links only appear after JavaScript runs
+
+    Verdicts expire after ttl seconds so a host is re-probed once in a while
+    instead of being pinned to whatever it did the first time.
+    """
+
+    def __init__(self, path=None, ttl=None):
+        self.path = path or os.getenv('JS_HOSTS_PATH', 'state/js_hosts.json')
+        self.ttl = ttl if ttl is not None else int(os.getenv('JS_HOSTS_TTL', str(7 * 86400)))
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.hosts = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.hosts = {}
+
+    def needs_js(self, url):
+        """True/False while the host has a fresh observation, None if unknown or expired"""
+        verdict = self.hosts.get(urlparse(url).netloc.lower())
+        # Entries from before verdicts were timestamped are bare booleans; treat them as expired
+        if not isinstance(verdict, list) or time.time() - verdict[1] > self.ttl:
+            return None
+        return verdict[0]
+
+    def record(self, url, needed):
+        """Store a verdict; only call this with what a probe actually observed"""
+        host = urlparse(url).netloc.lower()
+        self.hosts[host] = [needed, time.time()]
+        write_json_atomic(self.path, self.hosts)
+
+
+class BrowserPool:
+    """One Chromium and context kept alive on a background event loop, with a bounded page pool"""
+
+    def __init__(self, max_pages=4, page_timeout=15000):
+        self.max_pages = max_pages
+        self.page_timeout = page_timeout
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._pages = None
+        self._created = 0
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Launch the browser on first use
+
+        The loop is only kept once the launch succeeded; a failed launch is torn
+        down so the next call retries and close() has nothing half-started to stop.
+        """
+        with self._start_lock:
+            if self._loop:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='browser-pool', daemon=True)
+            thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._launch(), loop).result()
+            except BaseException:
+                self._stop_loop(loop, thread)
+                raise
+            self._loop = loop
+            self._thread = thread
+
+    async def _launch(self):
+        from playwright.async_api import async_playwright
+
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        self._context = await self._browser.new_context()
+        self._context.set_default_timeout(self.page_timeout)
+        await self._context.route('**/*', self._route)
+        self._pages = asyncio.Queue()
+        self._created = 0
+
+    async def _shutdown(self):
+        """Close whatever _launch got as far as starting"""
+        for closer in (self._context and self._context.close, self._browser and self._browser.close,
+                       self._playwright and self._playwright.stop):
+            if closer:
+                try:
+                    await closer()
+                except Exception as e:
+                    print(f"  Browser pool shutdown error: {e}")
+        self._playwright = self._browser = self._context = self._pages = None
+
+    def _stop_loop(self, loop, thread):
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=30)
+        except Exception as e:
+            print(f"  Browser pool shutdown error: {e}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=5)
+            if not thread.is_alive():
+                loop.close()
+
+    async def _route(self, route):
+        if route.request.resource_type in ALLOWED_RESOURCE_TYPES:
+            await route.continue_()
+        else:
+            await route.abort()
+
+    async def _acquire_page(self):
+        if self._pages.empty() and self._created < self.max_pages:
+            self._created += 1
+            return await self._context.new_page()
+        return await self._pages.get()
+
+    async def _extract_links(self, url):
+        page = await self._acquire_page()
+        try:
+            await page.goto(url, wait_until='load', timeout=self.page_timeout)
+            return await page.evaluate(EXTRACT_LINKS_JS)
+        except Exception:
+            # A page stuck mid-navigation is not safe to reuse
+            await page.close()
+            page = await self._context.new_page()
+            raise
+        finally:
+            self._pages.put_nowait(page)
+
+    def extract_links(self, url):
+        """Render one URL and return its content links as [{'url', 'text'}]"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self._extract_links(url), self._loop)
+        return future.result(timeout=self.page_timeout / 1000 * 2)
+
+    def extract_links_many(self, urls):
+        """Render several URLs concurrently, up to max_pages at a time"""
+        self.start()
+
+        async def gather():
+            return await asyncio.gather(*(self._extract_links(url) for url in urls), return_exceptions=True)
+
+        results = asyncio.run_coroutine_threadsafe(gather(), self._loop).result()
+        return {url: ([] if isinstance(links, Exception) else links) for url, links in zip(urls, results)}
+
+    def close(self):
+        with self._start_lock:
+            if not self._loop:
+                return
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+            self._stop_loop(loop, thread)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Long-running scraper daemon: schedules each feed on its own interval and keeps
+the HTTP pool and caches warm between cycles
+
+With WEBSUB_CALLBACK_URL set, feeds with a WebSub hub are also pushed to the
+daemon as soon as they publish (see websub.py).
+"""
+
+import heapq
+import json
+import os
+import signal
+import threading
+import time
+
+from feed_state import FeedState
+from feed_schedule import AdaptivePoller
+from metrics import metrics, record_run
+from pipeline import peek
+
+DEFAULT_INTERVAL = int(os.getenv('DAEMON_INTERVAL', '3600'))
+# Port for the Prometheus /metrics endpoint; 0 turns it off
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+
+class ScraperDaemon:
+    def __init__(self):
+        import additional_scraper
+        import simple_scraper
+
+        self.stop_event = threading.Event()
+        # Set to wake the loop early: on shutdown or when a WebSub push arrives
+        self.wake = threading.Event()
+        self.feed_state = FeedState()
+        self.poller = AdaptivePoller(self.feed_state)
+        self.simplified = simple_scraper.SimplifiedScraper()
+        self.additional = additional_scraper.AdditionalScraper()
+
+        # Resident post-processing stages keep their verdict and thumbnail caches in memory
+        self.link_checker = None
+        self.image_pipeline = None
+        if os.getenv('LINK_CHECK', '1') != '0':
+            from link_checker import LinkChecker
+            self.link_checker = LinkChecker()
+        if os.getenv('IMAGE_PIPELINE', '1') != '0':
+            from image_pipeline import ImagePipeline
+            self.image_pipeline = ImagePipeline()
+
+        # Fixed per-feed overrides, e.g. FEED_INTERVALS='{"https://savingsguru.ca/feed/?paged=3": 21600}';
+        # every other feed is polled adaptively from its observed publish rate
+        overrides = json.loads(os.getenv('FEED_INTERVALS', '{}'))
+        self.jobs = {}
+        for feed_url in simple_scraper.FEEDS:
+            self.jobs[feed_url] = ('simplified', overrides.get(feed_url))
+        for feed_url in additional_scraper.FEED_URLS:
+            self.jobs[feed_url] = ('additional', overrides.get(feed_url))
+
+        # (next_run, feed_url) min-heap; every feed is due on startup
+        now = time.time()
+        self.schedule = [(now, feed_url) for feed_url in self.jobs]
+        heapq.heapify(self.schedule)
+
+        self.websub = None
+        if os.getenv('WEBSUB_CALLBACK_URL'):
+            from websub import WebSubSubscriber
+            self.websub = WebSubSubscriber()
+            self.websub.on_push = lambda feed_url: self.wake.set()
+
+    def stop(self, signum=None, frame=None):
+        print(f"Received signal {signum}, shutting down after the current entry...")
+        self.stop_event.set()
+        self.wake.set()
+
+    def post_process(self, deals, repair_affiliate=None):
+        """Chain the enabled post-processing stages onto a stream of deals"""
+        if self.link_checker:
+            deals = self.link_checker.filter_stream(deals, repair_affiliate)
+        if self.image_pipeline:
+            deals = self.image_pipeline.process_stream(deals)
+        return deals
+
+    def run_cycle(self, feed_urls, pushed=None):
+        """Scrape the due feeds that changed, then save each scraper's output atomically
+
+        pushed maps feeds to a body a WebSub hub delivered, which is used instead of fetching.
+        """
+        import feedparser
+
+        groups = {'simplified': [], 'additional': []}
+        for feed_url in feed_urls:
+            groups[self.jobs[feed_url][0]].append(feed_url)
+
+        for kind, urls in groups.items():
+            if not urls or self.stop_event.is_set():
+                continue
+
+            started = time.time()
+            feeds = {}
+            changed_urls = []
+            for feed_url in urls:
+                if self.stop_event.is_set():
+                    break
+                if pushed and pushed.get(feed_url):
+                    # Often only the new entries; the store merges them with what's there
+                    feeds[feed_url] = feedparser.parse(pushed[feed_url])
+                    changed_urls.append(feed_url)
+                    continue
+                body, changed = self.feed_state.fetch(feed_url)
+                if changed:
+                    # Parse once here for the publish history; the scraper reuses the parsed feed
+                    feeds[feed_url] = feedparser.parse(body or feed_url)
+                    changed_urls.append(feed_url)
+                self.poller.observe(feed_url, feeds.get(feed_url), changed)
+            if not changed_urls:
+                print(f"[{kind}] No changes in {len(urls)} due feed(s)")
+                self.feed_state.commit()
+                record_run(kind, started, 0)
+                continue
+
+            if kind == 'simplified':
+                deals = self.simplified.iter_deals(feeds, changed_urls, self.feed_state, stop_event=self.stop_event)
+                deals = self.post_process(deals, self.simplified.repair_affiliate_url)
+                count = self.simplified.save_deals(deals)
+            else:
+                deals = self.additional.iter_additional_deals(feeds, changed_urls, self.feed_state,
+                                                              stop_event=self.stop_event)
+                first, deals = peek(self.post_process(deals))
+                if first is not None:
+                    count = self.additional.save_deals(deals)
+                else:
+                    count = 0
+                    self.additional.journal.clear()
+            if self.stop_event.is_set():
+                # What was scraped is saved, but the feeds' new validators aren't, so entries
+                # the stop cut off are fetched and worked again after the restart
+                record_run(kind, started, count)
+                print(f"[{kind}] Stopped mid-cycle after saving {count} deals")
+                continue
+            self.feed_state.commit()
+            record_run(kind, started, count)
+            print(f"[{kind}] Cycle saved {count} deals from {len(changed_urls)} changed feed(s)")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(f"=== SCRAPER DAEMON: {len(self.jobs)} feeds ===")
+        if METRICS_PORT:
+            metrics.serve(METRICS_PORT)
+        if self.websub:
+            from websub import WEBSUB_PORT
+            self.websub.serve(WEBSUB_PORT)
+
+        while not self.stop_event.is_set():
+            next_run = self.schedule[0][0]
+            self.wake.wait(max(0, next_run - time.time()))
+            self.wake.clear()
+            if self.stop_event.is_set():
+                break
+
+            now = time.time()
+            due = []
+            while self.schedule and self.schedule[0][0] <= now:
+                _, feed_url = heapq.heappop(self.schedule)
+                due.append(feed_url)
+            # Pushed feeds run now and keep their place in the poll schedule
+            pushed = self.websub.drain() if self.websub else {}
+            feed_urls = due + [feed_url for feed_url in pushed if feed_url in self.jobs and feed_url not in due]
+            if not feed_urls:
+                continue
+
+            try:
+                self.run_cycle(feed_urls, pushed)
+            except Exception as e:
+                print(f"Cycle failed: {e}")
+                metrics.inc('scraper_cycle_failures_total')
+
+            if self.websub:
+                for feed_url in due:
+                    self.websub.ensure(feed_url, self.feed_state.read_body(feed_url))
+                self.websub.renew_due()
+
+            finished = time.time()
+            for feed_url in due:
+                interval = self.jobs[feed_url][1] or self.poller.interval(feed_url, DEFAULT_INTERVAL)
+                if self.websub and self.websub.active(feed_url):
+                    # The hub tells us about new posts; polling only backs it up
+                    interval = max(interval, self.poller.max_interval)
+                heapq.heappush(self.schedule, (finished + interval, feed_url))
+                print(f"  Next poll of {feed_url} in {interval // 60} min")
+
+        print("Scraper daemon stopped")
+
+
+def main():
+    ScraperDaemon().run()
+
+
+if __name__ == "__main__":
+    main()
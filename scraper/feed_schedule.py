@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Adaptive per-feed polling intervals learned from each feed's publish history
+"""
+
+import calendar
+import os
+import statistics
+
+# Publish timestamps kept per feed for the inter-arrival estimate
+HISTORY_SIZE = 50
+
+
+class AdaptivePoller:
+    def __init__(self, feed_state, min_interval=None, max_interval=None, factor=None, backoff=1.5):
+        self.feed_state = feed_state
+        self.min_interval = min_interval or int(os.getenv('POLL_MIN_INTERVAL', '300'))
+        self.max_interval = max_interval or int(os.getenv('POLL_MAX_INTERVAL', '21600'))
+        # Fraction of the typical gap between posts to wait between polls
+        self.factor = factor or float(os.getenv('POLL_FACTOR', '0.5'))
+        self.backoff = backoff
+
+    def observe(self, url, feed, changed):
+        """Record one poll: publish times from a parsed feed when it changed, a miss otherwise"""
+        entry = self.feed_state.entry(url)
+        if not changed:
+            entry['misses'] = entry.get('misses', 0) + 1
+            return
+
+        entry['misses'] = 0
+        published = set(entry.get('published', []))
+        for item in getattr(feed, 'entries', []):
+            parsed = item.get('published_parsed') or item.get('updated_parsed')
+            if parsed:
+                published.add(calendar.timegm(parsed))
+        entry['published'] = sorted(published)[-HISTORY_SIZE:]
+
+    def typical_gap(self, url):
+        """Median seconds between posts, or None without enough history"""
+        published = self.feed_state.entry(url).get('published', [])
+        gaps = [later - earlier for earlier, later in zip(published, published[1:]) if later > earlier]
+        if len(gaps) < 2:
+            return None
+        return statistics.median(gaps)
+
+    def interval(self, url, default):
+        """Seconds until the next poll of a feed, within [min_interval, max_interval]"""
+        gap = self.typical_gap(url)
+        base = gap * self.factor if gap else default
+        # Back off further each time a poll finds nothing new
+        misses = self.feed_state.entry(url).get('misses', 0)
+        interval = base * (self.backoff ** min(misses, 10))
+        return int(max(self.min_interval, min(self.max_interval, interval)))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Persistent per-feed state: conditional fetches so a run with no new posts can exit
+before any heavy dependency is imported
+
+Only the standard library is used here on purpose.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from deal_store import write_json_atomic
+from metrics import metrics
+
+USER_AGENT = 'Mozilla/5.0 (compatible; PromoBot/1.0)'
+
+
+class FeedState:
+    def __init__(self, path=None, timeout=15):
+        self.path = path or os.getenv('FEED_STATE_PATH', 'state/feed_state.json')
+        self.body_dir = os.path.join(os.path.dirname(self.path) or '.', 'feeds')
+        self.timeout = timeout
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.feeds = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.feeds = {}
+        self.pending = {}
+
+    def entry(self, url):
+        """Mutable state for a feed; changes are persisted by commit()"""
+        if url not in self.pending:
+            self.pending[url] = dict(self.feeds.get(url, {}))
+        return self.pending[url]
+
+    def body_path(self, url):
+        return os.path.join(self.body_dir, hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + '.xml')
+
+    def read_body(self, url):
+        try:
+            with open(self.body_path(url), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def fetch(self, url):
+        """Conditionally fetch a feed, returning (body, changed)
+
+        body is None when the fetch failed, in which case callers should let
+        feedparser fetch the URL itself.
+        """
+        import urllib.error
+        import urllib.request
+
+        known = self.entry(url)
+        cached_body = self.read_body(url)
+        headers = {'User-Agent': USER_AGENT}
+        if cached_body is not None:
+            if known.get('etag'):
+                headers['If-None-Match'] = known['etag']
+            if known.get('modified'):
+                headers['If-Modified-Since'] = known['modified']
+
+        try:
+            request = urllib.request.Request(url, headers=headers)
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                etag = response.headers.get('ETag')
+                modified = response.headers.get('Last-Modified')
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and cached_body is not None:
+                metrics.inc('scraper_feed_fetches_total', feed=url, result='not_modified')
+                return cached_body, False
+            print(f"Feed check failed for {url}: HTTP {e.code}")
+            metrics.inc('scraper_feed_fetches_total', feed=url, result='error')
+            return None, True
+        except Exception as e:
+            print(f"Feed check failed for {url}: {e}")
+            metrics.inc('scraper_feed_fetches_total', feed=url, result='error')
+            return None, True
+
+        digest = hashlib.sha1(body).hexdigest()
+        changed = digest != known.get('digest')
+        if changed:
+            os.makedirs(self.body_dir, exist_ok=True)
+            tmp_path = self.body_path(url) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, self.body_path(url))
+        known.update(etag=etag, modified=modified, digest=digest, checked=time.time())
+        metrics.inc('scraper_feed_fetches_total', feed=url, result='changed' if changed else 'unchanged')
+        return body, changed
+
+    def fetch_all(self, urls):
+        """Fetch every feed, returning ({url: body}, any_changed)"""
+        bodies = {}
+        any_changed = False
+        for url in urls:
+            body, changed = self.fetch(url)
+            if body is not None:
+                bodies[url] = body
+            any_changed = any_changed or changed
+        return bodies, any_changed
+
+    def commit(self):
+        """Persist the validators once the run's output has been saved"""
+        if not self.pending:
+            return
+        self.feeds.update(self.pending)
+        self.pending = {}
+        write_json_atomic(self.path, self.feeds)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP layer: one pooled session, a per-host rate limiter and bounded
+streaming reads for pages where only the start matters
+
+With HTTP2=1 the hosts most posts come from (HTTP2_HOSTS) go through an
+HTTP/2 adapter instead: one connection per host carrying up to
+limiter.max_concurrent multiplexed streams. It needs httpx[http2]; without it,
+or when a host doesn't speak HTTP/2, requests use HTTP/1.1 as before.
+"""
+
+import codecs
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from metrics import metrics
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Limits for streamed page reads: (connect, read) timeouts, a total deadline and a size cap
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '8'))
+REQUEST_DEADLINE = float(os.getenv('HTTP_DEADLINE', '15'))
+MAX_PAGE_BYTES = int(os.getenv('HTTP_MAX_PAGE_BYTES', str(1024 * 1024)))
+CHUNK_SIZE = 16 * 1024
+
+HTTP2 = os.getenv('HTTP2', '0') == '1'
+HTTP2_HOSTS = [host.strip() for host in os.getenv('HTTP2_HOSTS', 'savingsguru.ca,smartcanucks.ca,amazon.ca').split(',')
+               if host.strip()]
+# Connection-specific headers HTTP/2 forbids
+HOP_BY_HOP_HEADERS = frozenset({'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade'})
+
+
+class HostRateLimiter:
+    """Caps concurrent requests and enforces a minimum spacing per host"""
+
+    def __init__(self, max_concurrent=4, min_interval=0.2):
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_slot = {}
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_concurrent)
+            return self._semaphores[host]
+
+    @contextmanager
+    def slot(self, url):
+        """Hold a request slot for the URL's host"""
+        host = urlparse(url).netloc.lower()
+        semaphore = self._semaphore(host)
+        with semaphore:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_slot.get(host, now))
+                self._next_slot[host] = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """Pooled adapter that counts requests per host and outcome and times them"""
+
+    def send(self, request, **kwargs):
+        host = metrics.host_label(urlparse(request.url).netloc.lower())
+        start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception as e:
+            metrics.inc('scraper_http_requests_total', host=host, outcome=type(e).__name__)
+            raise
+        metrics.observe('scraper_http_request_seconds', time.perf_counter() - start, host=host)
+        metrics.inc('scraper_http_requests_total', host=host, outcome=f'{response.status_code // 100}xx')
+        return response
+
+
+class Http2Body:
+    """Stands in for urllib3's response as requests.Response.raw for an httpx response
+
+    The host's stream slot is given back once the body is read to the end or closed.
+    """
+
+    def __init__(self, adapter, response, release):
+        self.adapter = adapter
+        self.response = response
+        self._release = release
+
+    def stream(self, amt=None, decode_content=True):
+        import httpx
+
+        chunks = self.response.aiter_bytes(amt)
+
+        async def next_chunk():
+            async for chunk in chunks:
+                return chunk
+            return None
+
+        try:
+            while True:
+                chunk = self.adapter.call(next_chunk())
+                if chunk is None:
+                    break
+                yield chunk
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.ReadTimeout(e)
+        except httpx.HTTPError as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        finally:
+            self.close()
+
+    def close(self):
+        release, self._release = self._release, None
+        if release:
+            # Resets just this stream when the body wasn't read; the connection stays up
+            try:
+                self.adapter.call(self.response.aclose())
+            finally:
+                release()
+
+    release_conn = close
+
+
+class Http2Adapter(BaseAdapter):
+    """requests transport adapter sending over httpx with HTTP/2, multiplexed per host
+
+    Hosts whose ALPN doesn't offer h2 are served over HTTP/1.1 by httpx itself; a
+    host that breaks the HTTP/2 protocol is handed to the fallback adapter from
+    then on. prior_knowledge speaks cleartext HTTP/2 (h2c) without negotiating.
+
+    All HTTP/2 I/O runs on one event loop thread: httpcore's threaded HTTP/2 code
+    can open streams out of order, which servers treat as a protocol error.
+    """
+
+    def __init__(self, fallback, max_streams=None, prior_knowledge=False):
+        import asyncio
+        import httpx
+
+        super().__init__()
+        self.fallback = fallback
+        self.max_streams = max_streams or limiter.max_concurrent
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name='http2', daemon=True).start()
+        self.client = httpx.AsyncClient(http2=True, http1=not prior_knowledge, follow_redirects=False,
+                                        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32))
+        self._lock = threading.Lock()
+        self._streams = {}
+        self.http1_hosts = set()
+
+    def call(self, coroutine):
+        """Run a coroutine on the transport's loop and wait for its result"""
+        import asyncio
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._streams:
+                self._streams[host] = threading.BoundedSemaphore(self.max_streams)
+            return self._streams[host]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        import httpx
+
+        host = urlparse(request.url).netloc.lower()
+        if host in self.http1_hosts:
+            return self.fallback.send(request, stream=stream, timeout=timeout, verify=verify, cert=cert,
+                                      proxies=proxies)
+
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        semaphore = self._semaphore(host)
+        if not semaphore.acquire(timeout=REQUEST_DEADLINE):
+            raise requests.exceptions.ConnectionError(f'No free HTTP/2 stream for {host}', request=request)
+
+        label = metrics.host_label(host)
+        start = time.perf_counter()
+        body = request.body.encode('utf-8') if isinstance(request.body, str) else request.body
+        headers = [(key, value) for key, value in request.headers.items() if key.lower() not in HOP_BY_HOP_HEADERS]
+        try:
+            outgoing = self.client.build_request(request.method, request.url, headers=headers, content=body,
+                                                 timeout=httpx.Timeout(read, connect=connect))
+            response = self.call(self.client.send(outgoing, stream=True))
+        except (httpx.RemoteProtocolError, httpx.LocalProtocolError) as e:
+            semaphore.release()
+            print(f"  HTTP/2 failed for {host} ({e}); using HTTP/1.1 from now on")
+            self.http1_hosts.add(host)
+            return self.fallback.send(request, stream=stream, timeout=timeout, verify=verify, cert=cert,
+                                      proxies=proxies)
+        except httpx.HTTPError as e:
+            semaphore.release()
+            metrics.inc('scraper_http_requests_total', host=label, outcome=type(e).__name__)
+            if isinstance(e, httpx.ConnectTimeout):
+                raise requests.exceptions.ConnectTimeout(e, request=request)
+            if isinstance(e, httpx.TimeoutException):
+                raise requests.exceptions.ReadTimeout(e, request=request)
+            raise requests.exceptions.ConnectionError(e, request=request)
+        except BaseException:
+            semaphore.release()
+            raise
+        metrics.observe('scraper_http_request_seconds', time.perf_counter() - start, host=label)
+        metrics.inc('scraper_http_requests_total', host=label, outcome=f'{response.status_code // 100}xx')
+        metrics.inc('scraper_http_version_total', host=label, version=response.http_version)
+
+        result = requests.Response()
+        result.status_code = response.status_code
+        result.reason = response.reason_phrase
+        # Bodies arrive already decompressed
+        result.headers = requests.structures.CaseInsensitiveDict(
+            (key, value) for key, value in response.headers.items() if key.lower() != 'content-encoding')
+        result.encoding = requests.utils.get_encoding_from_headers(result.headers)
+        result.raw = Http2Body(self, response, semaphore.release)
+        result.url = request.url
+        result.request = request
+        result.connection = self
+        return result
+
+    def close(self):
+        self.call(self.client.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.fallback.close()
+
+
+def http2_adapter(fallback):
+    """An Http2Adapter, or None when httpx or h2 isn't installed"""
+    try:
+        import h2  # noqa: F401  httpx only speaks HTTP/2 with it
+        return Http2Adapter(fallback)
+    except ImportError:
+        print("HTTP2=1 but httpx[http2] is not installed; using HTTP/1.1")
+        return None
+
+
+_session = None
+_session_lock = threading.Lock()
+limiter = HostRateLimiter()
+
+
+def get_session():
+    """Process-wide pooled session so connections stay warm between requests"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = InstrumentedAdapter(pool_connections=32, pool_maxsize=32)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+            h2_adapter = http2_adapter(adapter) if HTTP2 else None
+            if h2_adapter:
+                for host in HTTP2_HOSTS:
+                    _session.mount(f'https://{host}/', h2_adapter)
+                    _session.mount(f'https://www.{host}/', h2_adapter)
+            _session.headers.update(DEFAULT_HEADERS)
+        return _session
+
+
+def open_stream(url, headers=None, allow_redirects=True):
+    """Start a GET without reading the body; headers, status and final URL are available
+
+    Close the response (or exhaust iter_text) when done. Closing before the body
+    is fully read drops the connection instead of returning it to the pool,
+    which is far cheaper than downloading a page that isn't needed.
+    """
+    return get_session().get(url, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                             stream=True, allow_redirects=allow_redirects)
+
+
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+
+
+def sniff_encoding(response, head):
+    """Encoding for a streamed body: the header charset, else a BOM or meta charset in the first chunk, else UTF-8
+
+    requests falls back to ISO-8859-1 for text/* without a charset, which garbles the
+    UTF-8 most posts are in; its apparent_encoding would need the whole body.
+    """
+    if 'charset=' in response.headers.get('content-type', '').lower() and response.encoding:
+        return response.encoding
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    match = META_CHARSET.search(head[:4096])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode('ascii')).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+def iter_text(response, max_bytes=MAX_PAGE_BYTES, deadline=REQUEST_DEADLINE):
+    """Decoded text chunks of a streamed response, stopping at max_bytes or deadline seconds
+
+    The response is closed when the generator finishes or is closed early.
+    """
+    decoder = None
+    stop_at = time.monotonic() + deadline
+    total = 0
+    try:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            total += len(chunk)
+            over = total > max_bytes
+            if over:
+                chunk = chunk[:len(chunk) - (total - max_bytes)]
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(sniff_encoding(response, chunk))(errors='replace')
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+            if over:
+                print(f"  Stopped reading {response.url[:50]}... at {max_bytes} bytes")
+                break
+            if time.monotonic() > stop_at:
+                print(f"  Stopped reading {response.url[:50]}... after {deadline:g}s")
+                break
+        else:
+            text = decoder.decode(b'', final=True) if decoder else ''
+            if text:
+                yield text
+    finally:
+        response.close()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Image stage: fetch each deal image once and publish local WebP/AVIF thumbnails keyed by content hash
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+
+from deal_store import write_json_atomic
+from http_client import get_session, limiter
+from link_checker import PLACEHOLDER_IMAGE
+from metrics import metrics
+from pipeline import batched
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+# (width, height) variants published for every image; the first one is the default src
+THUMBNAIL_SIZES = [(300, 200), (600, 400)]
+
+# Files this stage publishes; anything else in the image directory is left alone
+GENERATED_IMAGE = re.compile(r'^(?:[0-9a-f]{16}-\d+x\d+\.(?:webp|avif|jpg)|placeholder-[0-9a-f]{16}\.svg)$')
+IMAGE_FIELDS = ('imageUrl', 'imageSrcSet', 'imageAvifSrcSet')
+
+
+def image_urls(deal):
+    """Every image URL a deal references, srcset candidates included"""
+    for key in IMAGE_FIELDS:
+        for candidate in str(deal.get(key) or '').split(','):
+            url = candidate.strip().split(' ')[0]
+            if url:
+                yield url
+
+
+def prune_images(output_dir, hot_paths, grace=86400, now=None):
+    """Delete generated thumbnails no deal in the hot outputs references any more
+
+    Files younger than grace are kept so a concurrent run's freshly rendered
+    images survive until its output is exported. Returns the number removed.
+    """
+    referenced = set()
+    for path in hot_paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                deals = json.load(f)
+        except FileNotFoundError:
+            continue
+        except json.JSONDecodeError:
+            # Can't tell what a corrupt output references, so don't delete anything
+            return 0
+        for deal in deals:
+            referenced.update(url.rsplit('/', 1)[-1] for url in image_urls(deal))
+
+    try:
+        names = os.listdir(output_dir)
+    except FileNotFoundError:
+        return 0
+    now = now or time.time()
+    removed = 0
+    for name in names:
+        if name in referenced or not GENERATED_IMAGE.match(name):
+            continue
+        path = os.path.join(output_dir, name)
+        try:
+            if now - os.path.getmtime(path) > grace:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+class ImagePipeline:
+    def __init__(self, output_dir=None, url_prefix='/img', cache_path=None, max_workers=8,
+                 timeout=10, max_bytes=8 * 1024 * 1024):
+        self.output_dir = output_dir or os.getenv('IMAGE_OUTPUT_DIR', '../public/img')
+        self.url_prefix = url_prefix
+        self.cache_path = cache_path or os.getenv('IMAGE_CACHE_PATH', 'state/image_cache.json')
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.avif = Image is not None and features.check('avif')
+        self.cache = self.load_cache()
+        self.stats = {'cached': 0, 'fetched': 0, 'placeholders': 0, 'failed': 0, 'bytes_in': 0, 'bytes_out': 0}
+        # process_deal runs on pool threads, so counters go through count()
+        self.stats_lock = threading.Lock()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def load_cache(self):
+        """Load the {source_url: content_hash} map"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def formats(self):
+        return ['webp', 'avif'] if self.avif else ['webp']
+
+    def variant_name(self, digest, size, fmt):
+        return f"{digest[:16]}-{size[0]}x{size[1]}.{fmt}"
+
+    def has_variants(self, digest):
+        return all(
+            os.path.exists(os.path.join(self.output_dir, self.variant_name(digest, size, fmt)))
+            for size in THUMBNAIL_SIZES for fmt in self.formats()
+        )
+
+    def image_fields(self, digest):
+        """Deal fields pointing at the published thumbnails"""
+        fields = {}
+        for fmt in self.formats():
+            srcset = ', '.join(
+                f"{self.url_prefix}/{self.variant_name(digest, size, fmt)} {size[0]}w" for size in THUMBNAIL_SIZES
+            )
+            fields['imageSrcSet' if fmt == 'webp' else 'imageAvifSrcSet'] = srcset
+        fields['imageUrl'] = f"{self.url_prefix}/{self.variant_name(digest, THUMBNAIL_SIZES[0], 'webp')}"
+        return fields
+
+    def fetch(self, url):
+        """Download an image, refusing anything over max_bytes"""
+        with limiter.slot(url):
+            response = get_session().get(url, timeout=self.timeout, stream=True)
+            try:
+                if response.status_code != 200:
+                    return None
+                chunks = []
+                total = 0
+                for chunk in response.iter_content(64 * 1024):
+                    total += len(chunk)
+                    if total > self.max_bytes:
+                        return None
+                    chunks.append(chunk)
+                return b''.join(chunks)
+            finally:
+                response.close()
+
+    def render(self, data, digest):
+        """Write every thumbnail variant for the image bytes"""
+        with Image.open(io.BytesIO(data)) as source:
+            source = source.convert('RGBA' if source.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            for size in THUMBNAIL_SIZES:
+                thumb = ImageOps.fit(source, size, Image.LANCZOS)
+                for fmt in self.formats():
+                    path = os.path.join(self.output_dir, self.variant_name(digest, size, fmt))
+                    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                    thumb.save(tmp_path, format=fmt.upper(), quality=80 if fmt == 'webp' else 50)
+                    os.replace(tmp_path, path)
+                    if size == THUMBNAIL_SIZES[0]:
+                        self.count('bytes_out', os.path.getsize(path))
+
+    def placeholder(self, deal, url):
+        """Generate a local SVG placeholder, honouring via.placeholder.com colours and text"""
+        background, foreground = '93c4d8', 'ffffff'
+        text = (deal.get('title') or 'Deal').split()[0]
+        if url and 'via.placeholder.com' in url:
+            parsed = urlparse(url)
+            parts = [part for part in parsed.path.split('/') if part]
+            if len(parts) >= 2:
+                background = parts[1]
+            if len(parts) >= 3:
+                foreground = parts[2]
+            text = parse_qs(parsed.query).get('text', [text])[0]
+
+        width, height = THUMBNAIL_SIZES[0]
+        svg = (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+            f'<rect width="100%" height="100%" fill="#{escape(background)}"/>'
+            f'<text x="50%" y="50%" dominant-baseline="middle" text-anchor="middle" fill="#{escape(foreground)}" '
+            f'font-family="sans-serif" font-size="20">{escape(text)}</text></svg>'
+        )
+        digest = hashlib.sha1(svg.encode('utf-8')).hexdigest()[:16]
+        name = f"placeholder-{digest}.svg"
+        path = os.path.join(self.output_dir, name)
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(svg)
+        self.count('placeholders')
+        return {'imageUrl': f"{self.url_prefix}/{name}"}
+
+    def process_deal(self, deal):
+        """Swap a deal's remote image for local thumbnails"""
+        url = str(deal.get('imageUrl') or '')
+        if not url or url == PLACEHOLDER_IMAGE or 'via.placeholder.com' in url:
+            deal.update(self.placeholder(deal, url))
+            return deal
+        if not url.startswith('http') or Image is None:
+            return deal
+
+        digest = self.cache.get(url)
+        if digest and self.has_variants(digest):
+            self.count('cached')
+            deal.update(self.image_fields(digest))
+            return deal
+
+        try:
+            data = self.fetch(url)
+            if not data:
+                raise ValueError('empty or oversized response')
+            digest = hashlib.sha256(data).hexdigest()
+            self.count('bytes_in', len(data))
+            if not self.has_variants(digest):
+                self.render(data, digest)
+            self.cache[url] = digest
+            self.count('fetched')
+            deal.update(self.image_fields(digest))
+        except Exception as e:
+            print(f"  Image failed {url[:50]}...: {e}")
+            self.count('failed')
+            deal.update(self.placeholder(deal, None))
+        return deal
+
+    def process_deals(self, deals):
+        """Run the image stage over all deals"""
+        return list(self.process_stream(deals, batch_size=len(deals) or 1))
+
+    def process_stream(self, deals, batch_size=8):
+        """Run the image stage over a deal stream, yielding deals in order as each batch finishes"""
+        self.stats = dict.fromkeys(self.stats, 0)
+        if Image is None:
+            print("Pillow not installed - only generating local placeholders")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for batch in batched(deals, batch_size):
+                with metrics.timed('scraper_stage_seconds', stage='images'):
+                    processed = list(pool.map(self.process_deal, batch))
+                yield from processed
+        write_json_atomic(self.cache_path, self.cache, indent=None)
+
+        stats = self.stats
+        metrics.inc('scraper_cache_requests_total', stats['cached'], cache='image', result='hit')
+        metrics.inc('scraper_cache_requests_total', stats['fetched'] + stats['failed'], cache='image', result='miss')
+        print(f"Images: {stats['cached']} cached, {stats['fetched']} fetched, "
+              f"{stats['placeholders']} placeholders, {stats['failed']} failed "
+              f"({stats['bytes_in']} bytes in -> {stats['bytes_out']} bytes of 300x200 WebP/AVIF)")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Concurrent liveness checks for deal affiliate and image URLs with cached verdicts
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from deal_store import write_json_atomic
+from http_client import get_session, limiter
+from metrics import metrics
+from pipeline import batched
+
+PLACEHOLDER_IMAGE = '/placeholder-deal.svg'
+
+
+def inconclusive(status):
+    """Whether a status is the server refusing us (429, 5xx such as Amazon's 503 bot wall) rather than a dead link"""
+    return status == 429 or status >= 500
+
+
+class LinkChecker:
+    def __init__(self, cache_path=None, max_workers=16, alive_ttl=7 * 86400, dead_ttl=86400, timeout=5):
+        self.cache_path = cache_path or os.getenv('LINK_CACHE_PATH', 'state/link_verdicts.json')
+        self.max_workers = max_workers
+        self.alive_ttl = alive_ttl
+        self.dead_ttl = dead_ttl
+        self.timeout = timeout
+        self.verdicts = self.load_cache()
+
+    def load_cache(self):
+        """Load cached verdicts as {url: [alive, status, checked_at]}"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_cache(self):
+        """Persist verdicts, dropping ones that have expired"""
+        now = time.time()
+        fresh = {url: verdict for url, verdict in self.verdicts.items() if not self.is_expired(verdict, now)}
+        write_json_atomic(self.cache_path, fresh, indent=None)
+
+    def is_expired(self, verdict, now):
+        alive, _, checked_at = verdict
+        ttl = self.alive_ttl if alive else self.dead_ttl
+        return now - checked_at > ttl
+
+    def check_url(self, url):
+        """Probe one URL with HEAD, falling back to a one-byte range GET"""
+        session = get_session()
+        try:
+            with limiter.slot(url):
+                response = session.head(url, timeout=self.timeout, allow_redirects=True)
+                if response.status_code in (403, 405, 501):
+                    # Some hosts reject HEAD; ask for a single byte instead
+                    response = session.get(url, timeout=self.timeout, allow_redirects=True,
+                                           headers={'Range': 'bytes=0-0'}, stream=True)
+                    response.close()
+            status = response.status_code
+            return status < 400 or inconclusive(status), status
+        except Exception as e:
+            print(f"  [DEAD] {url[:60]}... ({type(e).__name__})")
+            return False, 0
+
+    def check_urls(self, urls):
+        """Return {url: alive} for the URLs, only probing ones without a fresh verdict"""
+        now = time.time()
+        results = {}
+        pending = []
+        for url in set(urls):
+            verdict = self.verdicts.get(url)
+            if verdict and not self.is_expired(verdict, now):
+                results[url] = verdict[0]
+            else:
+                pending.append(url)
+
+        print(f"Link check: {len(results)} cached, {len(pending)} to probe")
+        metrics.inc('scraper_cache_requests_total', len(results), cache='link_verdict', result='hit')
+        metrics.inc('scraper_cache_requests_total', len(pending), cache='link_verdict', result='miss')
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                for url, (alive, status) in zip(pending, pool.map(self.check_url, pending)):
+                    results[url] = alive
+                    # Rate limits and bot walls say nothing about the link, so check again next run
+                    if not inconclusive(status):
+                        self.verdicts[url] = [alive, status, now]
+            self.save_cache()
+        return results
+
+    def filter_deals(self, deals, repair_affiliate=None):
+        """Replace dead images with the local placeholder and repair or drop dead affiliate links"""
+        urls = []
+        for deal in deals:
+            for key in ('affiliateUrl', 'imageUrl'):
+                url = str(deal.get(key) or '')
+                if url.startswith('http'):
+                    urls.append(url)
+        alive = self.check_urls(urls)
+
+        kept = []
+        for deal in deals:
+            image_url = str(deal.get('imageUrl') or '')
+            if image_url.startswith('http') and not alive.get(image_url, True):
+                deal['imageUrl'] = PLACEHOLDER_IMAGE
+
+            affiliate_url = str(deal.get('affiliateUrl') or '')
+            if affiliate_url.startswith('http') and not alive.get(affiliate_url, True):
+                repaired = repair_affiliate(deal) if repair_affiliate else None
+                if not repaired:
+                    print(f"  [DROP] Dead link: {deal['title'][:30]}... -> {affiliate_url[:40]}...")
+                    continue
+                deal['affiliateUrl'] = repaired
+            kept.append(deal)
+
+        print(f"Link check kept {len(kept)}/{len(deals)} deals")
+        return kept
+
+    def filter_stream(self, deals, repair_affiliate=None, batch_size=16):
+        """filter_deals over a deal stream, yielding each batch's survivors as soon as it is checked"""
+        for batch in batched(deals, batch_size):
+            with metrics.timed('scraper_stage_seconds', stage='link_check'):
+                kept = self.filter_deals(batch, repair_affiliate)
+            yield from kept
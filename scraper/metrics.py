@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Run metrics in Prometheus text exposition format: written to a textfile at the
+end of each run (for node_exporter's textfile collector) and served over HTTP
+by the daemon
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_DIR = os.getenv('METRICS_DIR', 'state/metrics')
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+# Hosts beyond this many share host="other" so merchant links can't blow up cardinality
+MAX_HOST_LABELS = 50
+
+# name -> (type, help)
+METRICS = {
+    'scraper_run_seconds': ('histogram', 'Duration of a scraper run or daemon cycle'),
+    'scraper_last_run_timestamp_seconds': ('gauge', 'When the last run finished'),
+    'scraper_last_run_deals': ('gauge', 'Deals saved by the last run'),
+    'scraper_cycle_failures_total': ('counter', 'Daemon cycles that raised'),
+    'scraper_deals_total': ('counter', 'Deals produced, per scraper and source'),
+    'scraper_skipped_total': ('counter', 'Feed entries that produced no deal, per reason'),
+    'scraper_stage_seconds': ('histogram', 'Time spent per pipeline stage'),
+    'scraper_feed_fetches_total': ('counter', 'Conditional feed fetches by result'),
+    'scraper_http_requests_total': ('counter', 'HTTP requests by host and outcome (status class or error)'),
+    'scraper_http_request_seconds': ('histogram', 'HTTP request latency until headers arrive'),
+    'scraper_http_version_total': ('counter', 'Responses on the HTTP/2 transport by host and negotiated version'),
+    'scraper_cache_requests_total': ('counter', 'Cache lookups by cache and result (hit or miss)'),
+    'scraper_websub_pushes_total': ('counter', 'WebSub content pushes by result'),
+}
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Metrics:
+    """Process-wide counters, gauges and histograms keyed by name and label set"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {}  # (name, labels) -> number, for counters and gauges
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self.hosts = set()
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self.key(name, labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.values[self.key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self.key(name, labels)
+        with self._lock:
+            state = self.histograms.get(key)
+            if state is None:
+                state = self.histograms[key] = [0] * (len(BUCKETS) + 2)
+            for index, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def timed(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def host_label(self, host):
+        with self._lock:
+            if host in self.hosts or len(self.hosts) < MAX_HOST_LABELS:
+                self.hosts.add(host)
+                return host
+        return 'other'
+
+    def cache(self, cache, hit):
+        self.inc('scraper_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+    def render(self):
+        """All metrics in Prometheus text exposition format"""
+        with self._lock:
+            values = dict(self.values)
+            histograms = {key: list(state) for key, state in self.histograms.items()}
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            series = sorted(labels for (metric, labels) in (values if kind != 'histogram' else histograms)
+                            if metric == name)
+            if not series:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels in series:
+                if kind != 'histogram':
+                    lines.append(f'{name}{format_labels(labels)} {format_value(values[(name, labels)])}')
+                    continue
+                state = histograms[(name, labels)]
+                for bound, count in zip(BUCKETS, state):
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", f"{bound:g}"),))} {count}')
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {state[-1]}')
+                lines.append(f'{name}_sum{format_labels(labels)} {state[-2]:.6f}')
+                lines.append(f'{name}_count{format_labels(labels)} {state[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, job, directory=None):
+        """Write <job>.prom atomically so the collector never reads a partial file"""
+        directory = directory or METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{job}.prom')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+        return path
+
+    def serve(self, port, host='0.0.0.0'):
+        """Serve /metrics from a background thread; returns the server"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+        print(f"Metrics at http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+
+metrics = Metrics()
+
+
+def record_run(scraper, started, deals):
+    """Run duration and size for one finished run"""
+    metrics.observe('scraper_run_seconds', time.time() - started, scraper=scraper)
+    metrics.set('scraper_last_run_timestamp_seconds', time.time(), scraper=scraper)
+    metrics.set('scraper_last_run_deals', deals, scraper=scraper)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection for deals posted by several sources: MinHash-LSH over
+normalized title words, plus exact matching on canonical URLs
+"""
+
+import hashlib
+import random
+import re
+
+from url_canon import canonical_url
+
+TOKEN_RE = re.compile(r'[a-z0-9]+(?:\.[0-9]+)?')
+STOPWORDS = {
+    'a', 'an', 'and', 'at', 'for', 'from', 'in', 'of', 'on', 'or', 'the', 'to', 'with',
+    'deal', 'deals', 'sale', 'hot', 'canada', 'ca', 'now', 'only', 'get', 'save',
+}
+# Paths that just mean "the merchant's front page", which many unrelated deals share
+HOMEPAGE_PATHS = {'', 'home', 'index.html', 'en', 'en-ca'}
+# Affiliate redirectors used as one fixed link per merchant
+SHARED_LINK_HOSTS = {'shopstyle.it'}
+
+MERSENNE_PRIME = (1 << 61) - 1
+BANDS = 8
+ROWS = 4
+
+# Fixed seed so signatures are comparable between runs and processes
+_rng = random.Random(0x5eed)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(MERSENNE_PRIME)) for _ in range(BANDS * ROWS)]
+
+
+def title_tokens(title):
+    """Set of lowercased title words without filler words"""
+    return frozenset(token for token in TOKEN_RE.findall(title.lower()) if token not in STOPWORDS)
+
+
+def minhash(tokens):
+    """MinHash signature of a token set, one value per permutation"""
+    hashes = [int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+              for token in tokens]
+    return [min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in PERMUTATIONS]
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class NearDupIndex:
+    """Per-run index answering "have we already got this deal?" in constant time per entry
+
+    Signatures are split into bands; titles sharing any band are candidates and
+    are confirmed with the exact Jaccard similarity of their word sets.
+    """
+
+    def __init__(self, threshold=0.7, min_tokens=3):
+        self.threshold = threshold
+        self.min_tokens = min_tokens
+        self.buckets = [{} for _ in range(BANDS)]
+        self.exact_titles = {}
+        self.urls = {}
+
+    def band_keys(self, tokens):
+        signature = minhash(tokens)
+        return [tuple(signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+    def find(self, title=None, url=None):
+        """Key of an indexed deal this title or URL duplicates, or None"""
+        if url:
+            key = self.urls.get(self.url_key(url))
+            if key is not None:
+                return key
+        if not title:
+            return None
+
+        tokens = title_tokens(title)
+        exact = self.exact_titles.get(tokens)
+        if exact is not None or len(tokens) < self.min_tokens:
+            # Too few words to judge similarity; only identical titles count
+            return exact
+
+        for band, band_key in enumerate(self.band_keys(tokens)):
+            for other_tokens, key in self.buckets[band].get(band_key, ()):
+                if jaccard(tokens, other_tokens) >= self.threshold:
+                    return key
+        return None
+
+    def add(self, key, title=None, url=None):
+        url_key = self.url_key(url) if url else None
+        if url_key:
+            self.urls.setdefault(url_key, key)
+        if not title:
+            return
+        tokens = title_tokens(title)
+        self.exact_titles.setdefault(tokens, key)
+        if len(tokens) >= self.min_tokens:
+            for band, band_key in enumerate(self.band_keys(tokens)):
+                self.buckets[band].setdefault(band_key, []).append((tokens, key))
+
+    def url_key(self, url):
+        """Canonical URL, or None for front-page links that many deals share"""
+        # Scheme-less, so http and https copies of a link match
+        canonical = canonical_url(url).split('://', 1)[-1]
+        location, _, query = canonical.partition('?')
+        host, _, path = location.partition('/')
+        if host.startswith('www.'):
+            host = host[4:]
+        path = path.strip('/')
+        if host in SHARED_LINK_HOSTS or path.lower() in HOMEPAGE_PATHS:
+            return None
+        return f'{host}/{path}?{query}' if query else f'{host}/{path}'
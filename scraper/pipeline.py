@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Helpers for streaming deals through the post-processing stages as they are scraped
+
+Scrapers yield deals one at a time; link checking, image processing and the
+deal store consume them in small batches, so the first deal is checked, given a
+thumbnail and stored while later entries are still being scraped, and the
+output files are re-exported along the way (PUBLISH_INTERVAL) rather than only
+once the run ends.
+"""
+
+import os
+import time
+from itertools import islice
+
+# Deals written to the deal store per transaction while a run is streaming
+SAVE_BATCH = 25
+# Seconds between exports of what's stored so far while a run is still saving (0: only at the end)
+PUBLISH_INTERVAL = float(os.getenv('PUBLISH_INTERVAL', '120'))
+
+
+class PublishTimer:
+    """When a streaming save should publish: after its first stored batch, then every interval seconds"""
+
+    def __init__(self, interval=PUBLISH_INTERVAL):
+        self.interval = interval
+        self.last = None
+
+    def due(self):
+        if not self.interval:
+            return False
+        now = time.monotonic()
+        if self.last is None or now - self.last >= self.interval:
+            self.last = now
+            return True
+        return False
+
+
+def batched(iterable, size):
+    """Lists of up to size items from iterable, in order"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def peek(iterable):
+    """(first item or None, iterator over every item including the first)"""
+    iterator = iter(iterable)
+    for first in iterator:
+        return first, _prepend(first, iterator)
+    return None, iter(())
+
+
+def _prepend(first, iterator):
+    yield first
+    yield from iterator
+
+
+async def aiterate(iterable):
+    """Async iterator over a blocking iterator, advanced on a worker thread"""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterable)
+    done = object()
+    while True:
+        item = await loop.run_in_executor(None, next, iterator, done)
+        if item is done:
+            return
+        yield item
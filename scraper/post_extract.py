@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Single-pass extraction of everything the scrapers read from a blog post: links
+with their text, og:image, the featured image, images and body text
+
+Built on html.parser events, so no tree is ever built. Scripts, styles, nav,
+sidebars, footers and comment sections are skipped as they stream past, and
+parsing of a streamed page stops once the first post body container closes.
+"""
+
+import re
+from html.parser import HTMLParser
+
+# Post body containers, matched by tag (article) or class name
+CONTENT_CLASSES = ('entry-content', 'post-content', 'content')
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'form', 'nav', 'aside', 'footer'}
+SKIP_CLASS_RE = re.compile(r'(?:^|\s)(?:sidebar|widget(?:-area)?|comments?|comment-respond|site-footer|related-posts)(?:\s|$)')
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+
+
+class Link:
+    __slots__ = ('href', 'text', 'containers')
+
+    def __init__(self, href, containers):
+        self.href = href
+        self.text = ''
+        self.containers = containers
+
+
+class Image:
+    __slots__ = ('src', 'classes', 'width', 'height', 'containers')
+
+    def __init__(self, src, classes, width, height, containers):
+        self.src = src
+        self.classes = classes
+        self.width = width
+        self.height = height
+        self.containers = containers
+
+
+class PostData:
+    """What one pass over a post collected"""
+
+    def __init__(self):
+        self.og_image = None
+        self.featured_image = None
+        self.links = []
+        self.images = []
+        self.texts = []
+        # First container element id per selector ('article', 'entry-content', ...) and overall
+        self.first_container = {}
+        self.first_any = None
+        self.container_labels = {}
+
+    def content_links(self, order=None):
+        """Links in the first container for the first selector in order that matched
+        (the first container of any kind without an order), else every link"""
+        if order is None:
+            container = self.first_any
+        else:
+            container = next((self.first_container[label] for label in order if label in self.first_container), None)
+        if container is None:
+            return self.links
+        return [link for link in self.links if container in link.containers] or self.links
+
+    def content_images(self, labels=('entry-content', 'post-content', 'article')):
+        """Images inside any container matching one of labels"""
+        ids = {eid for eid, eid_labels in self.container_labels.items() if not eid_labels.isdisjoint(labels)}
+        return [image for image in self.images if not ids.isdisjoint(image.containers)]
+
+    def body_texts(self):
+        """Text nodes of the first post body container in document order"""
+        return (text for text, containers in self.texts if self.first_any in containers)
+
+
+class PostExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.data = PostData()
+        # (tag, element id, is container, is skipped) for each open element
+        self.stack = []
+        self.containers = ()
+        self.skip_depth = 0
+        self.next_id = 0
+        self.open_link = None
+        # Set once the first post body has closed; nothing after it is read
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self.skip_depth:
+            if tag not in VOID_TAGS:
+                self.stack.append((tag, None, False, False))
+            return
+
+        classes = attrs.get('class') or ''
+        if tag == 'meta':
+            if attrs.get('property') == 'og:image' and self.data.og_image is None and attrs.get('content'):
+                self.data.og_image = attrs['content']
+            return
+        if tag == 'img':
+            src = attrs.get('src') or ''
+            self.data.images.append(Image(src, classes, attrs.get('width') or '0', attrs.get('height') or '0', self.containers))
+            if self.data.featured_image is None and src and 'wp-post-image' in classes.split():
+                self.data.featured_image = src
+            return
+        if tag in VOID_TAGS:
+            return
+
+        skipped = tag in SKIP_TAGS or bool(classes and SKIP_CLASS_RE.search(classes))
+        if skipped:
+            self.skip_depth += 1
+            self.stack.append((tag, None, False, True))
+            return
+
+        labels = {name for name in classes.split() if name in CONTENT_CLASSES}
+        if tag == 'article':
+            labels.add('article')
+        eid = None
+        if labels:
+            eid = self.next_id
+            self.next_id += 1
+            self.data.container_labels[eid] = labels
+            for label in labels:
+                self.data.first_container.setdefault(label, eid)
+            if self.data.first_any is None:
+                self.data.first_any = eid
+            self.containers = self.containers + (eid,)
+        self.stack.append((tag, eid, bool(labels), False))
+
+        if tag == 'a' and attrs.get('href'):
+            self.open_link = Link(attrs['href'], self.containers)
+            self.data.links.append(self.open_link)
+
+    def handle_endtag(self, tag):
+        # Close the nearest matching element and anything left unclosed inside it
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                break
+        else:
+            return
+        while len(self.stack) > index:
+            open_tag, eid, is_container, skipped = self.stack.pop()
+            if skipped:
+                self.skip_depth -= 1
+            if is_container:
+                self.containers = self.containers[:-1]
+                if eid == self.data.first_any:
+                    self.done = True
+            if open_tag == 'a':
+                self.open_link = None
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        if self.open_link is not None:
+            self.open_link.text += data.strip()
+        self.data.texts.append((data, self.containers))
+
+
+def extract_post(html):
+    """Parse a post once and return its PostData
+
+    html is a string or an iterable of text chunks (see http_client.iter_text);
+    chunks stop being read as soon as the first post body is complete.
+    """
+    extractor = PostExtractor()
+    chunks = [html] if isinstance(html, str) else html
+    try:
+        for chunk in chunks:
+            extractor.feed(chunk)
+            if extractor.done:
+                break
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    extractor.close()
+    return extractor.data
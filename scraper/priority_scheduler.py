@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Priority-ordered work scheduling across feeds with quota redistribution and a
+wall-clock run budget
+"""
+
+import calendar
+import heapq
+import os
+import time
+
+# Rough value of a deal by merchant; affiliate-tagged merchants rank highest
+MERCHANT_WEIGHTS = {
+    'amazon': 1.0, 'amzn': 1.0, 'walmart': 1.0, 'lululemon': 1.0, 'gap': 1.0, 'roxy': 1.0,
+    'best buy': 1.0, 'bestbuy': 1.0, 'cabela': 1.0, 'bass pro': 1.0,
+    'costco': 0.6, 'canadian tire': 0.6, 'shoppers': 0.6, 'home depot': 0.6, 'sport chek': 0.6,
+    'staples': 0.5, 'the bay': 0.5, 'winners': 0.5, 'loblaws': 0.5, 'no frills': 0.5,
+}
+DEFAULT_MERCHANT_WEIGHT = 0.2
+
+# How many hours of age it takes for the recency score to reach zero
+RECENCY_HORIZON_HOURS = 48
+
+
+class WorkItem:
+    __slots__ = ('feed_url', 'entry', 'index', 'priority')
+
+    def __init__(self, feed_url, entry, index, priority):
+        self.feed_url = feed_url
+        self.entry = entry
+        self.index = index
+        self.priority = priority
+
+
+class PriorityScheduler:
+    """Hands out feed entries best-first until the deal limit or the deadline is reached
+
+    Each feed is guaranteed limit // feeds usable deals. Entries beyond a feed's
+    quota are held back and only used once every feed has been drained, so quota
+    a feed can't fill goes to the best remaining entries elsewhere.
+    """
+
+    def __init__(self, limit, time_budget=None, feed_state=None, merchant_weights=None, stop_event=None):
+        self.limit = limit
+        budget = time_budget if time_budget is not None else float(os.getenv('RUN_TIME_BUDGET', '0'))
+        self.deadline = time.monotonic() + budget if budget else None
+        self.feed_state = feed_state
+        self.merchant_weights = merchant_weights or MERCHANT_WEIGHTS
+        self.stop_event = stop_event  # e.g. the daemon's shutdown signal; ends the run like the deadline
+        self.queue = []
+        self.overflow = []
+        self.usable = {}
+        self.produced = 0
+        self.sequence = 0
+        self.timed_out = False
+
+    def reliability(self, feed_url):
+        """Share of a feed's past entries that became deals (Laplace-smoothed)"""
+        if not self.feed_state:
+            return 0.5
+        entry = self.feed_state.entry(feed_url)
+        return (entry.get('usable', 0) + 1) / (entry.get('attempted', 0) + 2)
+
+    def merchant_value(self, title):
+        title_lower = title.lower()
+        return max((weight for name, weight in self.merchant_weights.items() if name in title_lower),
+                   default=DEFAULT_MERCHANT_WEIGHT)
+
+    def recency(self, entry, now):
+        parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+        if not parsed:
+            return 0.5
+        age_hours = max(0, now - calendar.timegm(parsed)) / 3600
+        return max(0.0, 1 - age_hours / RECENCY_HORIZON_HOURS)
+
+    def priority(self, entry, reliability, now):
+        return (0.5 * self.recency(entry, now)
+                + 0.3 * self.merchant_value(entry.get('title', ''))
+                + 0.2 * reliability)
+
+    def add_feed(self, feed_url, entries):
+        """Queue every entry of a parsed feed"""
+        now = time.time()
+        reliability = self.reliability(feed_url)
+        self.usable.setdefault(feed_url, 0)
+        for index, entry in enumerate(entries):
+            priority = self.priority(entry, reliability, now)
+            self.sequence += 1
+            heapq.heappush(self.queue, (-priority, self.sequence, WorkItem(feed_url, entry, index, priority)))
+
+    def quota(self):
+        return self.limit // max(1, len(self.usable))
+
+    def out_of_time(self):
+        if not self.timed_out:
+            if self.stop_event is not None and self.stop_event.is_set():
+                print(f"Stop requested with {self.produced} deals - stopping early")
+                self.timed_out = True
+            elif self.deadline and time.monotonic() >= self.deadline:
+                print(f"Run time budget reached with {self.produced} deals - stopping early")
+                self.timed_out = True
+        return self.timed_out
+
+    def __iter__(self):
+        while self.produced < self.limit and not self.out_of_time():
+            if self.queue:
+                _, sequence, item = heapq.heappop(self.queue)
+                if self.usable[item.feed_url] >= self.quota():
+                    # Over quota for now; only used if other feeds leave quota unfilled
+                    heapq.heappush(self.overflow, (-item.priority, sequence, item))
+                    continue
+            elif self.overflow:
+                _, _, item = heapq.heappop(self.overflow)
+            else:
+                break
+            yield item
+
+    def reserve(self, item):
+        """Count an item toward quota and limit as one deal without touching reliability,
+        for choosing entries before anyone has worked them"""
+        self.usable[item.feed_url] += 1
+        self.produced += 1
+
+    def record(self, item, deals_made):
+        """Count the deals an item produced toward its feed's quota and reliability"""
+        self.usable[item.feed_url] += deals_made
+        self.produced += deals_made
+        if self.feed_state:
+            entry = self.feed_state.entry(item.feed_url)
+            entry['attempted'] = entry.get('attempted', 0) + 1
+            entry['usable'] = entry.get('usable', 0) + (1 if deals_made else 0)
+            if entry['attempted'] > 200:
+                # Keep reliability responsive to recent behaviour
+                entry['attempted'] //= 2
+                entry['usable'] //= 2
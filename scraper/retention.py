@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Retention and compaction for the deal store so the hot JSON files stay bounded
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from deal_store import write_deals_atomic
+
+# Every hot file sharing ../public/img; thumbnails none of them reference are pruned
+HOT_OUTPUTS = ('deals.json', 'additional_deals.json')
+
+
+class RetentionPolicy:
+    def __init__(self, max_age_days=30, max_unseen_days=14, max_per_category=100, max_per_source=100,
+                 archive_dir='../public/archive'):
+        # A limit of 0 disables that rule
+        self.max_age_days = max_age_days
+        self.max_unseen_days = max_unseen_days
+        self.max_per_category = max_per_category
+        self.max_per_source = max_per_source
+        self.archive_dir = archive_dir
+
+    @classmethod
+    def from_env(cls):
+        """Build a policy from RETENTION_* environment variables"""
+        return cls(
+            max_age_days=int(os.getenv('RETENTION_MAX_AGE_DAYS', '30')),
+            max_unseen_days=int(os.getenv('RETENTION_MAX_UNSEEN_DAYS', '14')),
+            max_per_category=int(os.getenv('RETENTION_MAX_PER_CATEGORY', '100')),
+            max_per_source=int(os.getenv('RETENTION_MAX_PER_SOURCE', '100')),
+            archive_dir=os.getenv('RETENTION_ARCHIVE_DIR', '../public/archive'),
+        )
+
+    def select_expired(self, rows, now=None):
+        """Return {deal_id: reason} for rows that fall outside the policy
+
+        rows are (id, source, category, date_added, last_seen) ordered newest first.
+        """
+        now = now or time.time()
+        age_cutoff = None
+        if self.max_age_days:
+            age_cutoff = (datetime.fromtimestamp(now) - timedelta(days=self.max_age_days)).strftime('%Y-%m-%d')
+        unseen_cutoff = now - self.max_unseen_days * 86400 if self.max_unseen_days else None
+
+        expired = {}
+        per_category = {}
+        per_source = {}
+        for deal_id, source, category, date_added, last_seen in rows:
+            if age_cutoff and date_added and date_added[:10] < age_cutoff:
+                expired[deal_id] = 'age'
+                continue
+            if unseen_cutoff and last_seen < unseen_cutoff:
+                expired[deal_id] = 'unseen'
+                continue
+
+            category_count = per_category.get(category, 0)
+            source_count = per_source.get(source, 0)
+            if self.max_per_category and category_count >= self.max_per_category:
+                expired[deal_id] = 'category_cap'
+                continue
+            if self.max_per_source and source_count >= self.max_per_source:
+                expired[deal_id] = 'source_cap'
+                continue
+            per_category[category] = category_count + 1
+            per_source[source] = source_count + 1
+
+        return expired
+
+    def archive(self, output, deals, now=None):
+        """Append expired deals to today's cold file for this output"""
+        if not deals:
+            return None
+        day = datetime.fromtimestamp(now or time.time()).strftime('%Y-%m-%d')
+        stem = os.path.splitext(output)[0]
+        path = os.path.join(self.archive_dir, f"{stem}-{day}.json")
+
+        archived = []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                archived = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            archived = []
+
+        archived_ids = {deal.get('id') for deal in archived}
+        archived.extend(deal for deal in deals if deal.get('id') not in archived_ids)
+        write_deals_atomic(path, archived)
+        return path
+
+    def prune_images(self, hot_path):
+        """Remove thumbnails that dropped out of every hot output, tenants' copies included"""
+        if os.getenv('IMAGE_PIPELINE', '1') == '0':
+            return 0
+        from image_pipeline import prune_images
+        from tenants import extra_tenants
+        public_dir = os.path.dirname(hot_path) or '.'
+        output_dir = os.getenv('IMAGE_OUTPUT_DIR', os.path.join(public_dir, 'img'))
+        tenant_paths = {tenant.public_dir: [os.path.join(tenant.public_dir, name) for name in HOT_OUTPUTS]
+                        for tenant in extra_tenants()}
+        # Kept while any tenant still references it, so a tenant rebuild can link it again
+        removed = prune_images(output_dir, [os.path.join(public_dir, name) for name in HOT_OUTPUTS]
+                               + [path for paths in tenant_paths.values() for path in paths])
+        for tenant_dir, paths in tenant_paths.items():
+            removed += prune_images(os.path.join(tenant_dir, 'img'), paths)
+        return removed
+
+    def compact(self, store, output, hot_path):
+        """Expire, archive and re-export one output, printing a compaction report"""
+        now = time.time()
+        try:
+            bytes_before = os.path.getsize(hot_path)
+        except OSError:
+            bytes_before = 0
+
+        expired = self.select_expired(store.retention_rows(output), now)
+        archive_path = None
+        if expired:
+            archive_path = self.archive(output, store.get_deals(expired), now)
+            store.remove_deals(expired)
+
+        deals = store.export_json(output, hot_path)
+        bytes_after = os.path.getsize(hot_path)
+        pruned = self.prune_images(hot_path)
+
+        reasons = {}
+        for reason in expired.values():
+            reasons[reason] = reasons.get(reason, 0) + 1
+        print(f"=== COMPACTION REPORT ({output}) ===")
+        print(f"Expired: {len(expired)} {reasons if reasons else ''}".rstrip())
+        if archive_path:
+            print(f"Archived to: {archive_path}")
+        print(f"Hot deals: {len(deals)}")
+        if pruned:
+            print(f"Pruned images: {pruned}")
+        print(f"Bytes: {bytes_before} -> {bytes_after} (saved {bytes_before - bytes_after})")
+        print(f"================================")
+        return deals
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Append-only checkpoint journal of per-entry scrape results, so a run that is
+killed partway through can resume without redoing finished entries
+"""
+
+import json
+import os
+import time
+
+
+class RunJournal:
+    def __init__(self, name, path=None, max_age=None):
+        journal_dir = os.getenv('JOURNAL_DIR', 'state')
+        self.path = path or os.path.join(journal_dir, f'journal-{name}.jsonl')
+        # Results older than this are from an abandoned run and get redone
+        self.max_age = max_age or int(os.getenv('JOURNAL_MAX_AGE', str(24 * 3600)))
+        self.results = {}
+        self.handle = None
+        self.load()
+
+    def load(self):
+        cutoff = time.time() - self.max_age
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from the interrupted run
+                        continue
+                    if record.get('t', 0) >= cutoff:
+                        self.results[record['key']] = record
+        except FileNotFoundError:
+            return
+        if self.results:
+            print(f"Resuming from journal: {len(self.results)} entries already done")
+
+    def get(self, key):
+        """The journaled result for an entry, or None if it still needs doing"""
+        return self.results.get(key)
+
+    def record(self, key, **result):
+        """Append one finished entry and flush it straight away"""
+        record = dict(result, key=key, t=time.time())
+        self.results[key] = record
+        if self.handle is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.handle = open(self.path, 'a', encoding='utf-8')
+        self.handle.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.handle.flush()
+
+    def clear(self):
+        """Truncate the journal once the run's output has been saved"""
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+        self.results = {}
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
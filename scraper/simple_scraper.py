@@ -3,21 +3,47 @@
 Simplified RSS-to-JSON scraper that generates more deals
 """
 
-import json
-import feedparser
-import requests
-import re
 import time
 import random
 import os
 from datetime import datetime
-from bs4 import BeautifulSoup
+from deal_record import validate_deals
+from deal_store import DealStore, make_deal_id
+from retention import RetentionPolicy
+from feed_state import FeedState
+from priority_scheduler import PriorityScheduler
+from run_journal import RunJournal
+from near_dup import NearDupIndex
+from url_canon import canonical_url
+from metrics import metrics, record_run
+from tenants import default_tenant
+
+# feedparser, requests, the post parser and the post-processing stages are imported where
+# they are used so a run with no feed changes exits before loading them
+
+# RSS feeds to try
+FEEDS = [
+    'https://www.smartcanucks.ca/feed/',
+    'https://www.redflagdeals.com/rss/forum/9/',
+    'https://bargainmoose.ca/feed',
+]
 
 class SimplifiedScraper:
+    DEFAULT_LIMIT = 50
+    
+    @classmethod
+    def deal_limit(cls):
+        return int(os.getenv('DEAL_LIMIT', str(cls.DEFAULT_LIMIT)))
+    
     def __init__(self):
-        self.affiliate_tag = os.getenv('AFFILIATE_TAG', 'promopenguin-20')
+        # Links are made for the default tenant; other tenants' copies are rewritten at export
+        self.tenant = default_tenant()
+        self.affiliate_tag = self.tenant.affiliate_tag
         self.base_url = os.getenv('SITE_URL', 'https://www.smartcanucks.ca')
-        self.limit = int(os.getenv('DEAL_LIMIT', '50'))
+        self.limit = self.deal_limit()
+        self.journal = RunJournal('simplified')
+        self.near_dups = NearDupIndex()
+        self.last_post = (None, None)
         
         print(f"=== SIMPLIFIED SCRAPER ===")
         print(f"Affiliate Tag: {self.affiliate_tag}")
@@ -26,58 +52,24 @@ class SimplifiedScraper:
 
     def extract_deal_url_from_post(self, post_url, title):
         """Extract the actual deal/sale URL from the blog post"""
-        title_lower = title.lower()
-        
         # Priority 1: Override with our specific affiliate links
-        if any(word in title_lower for word in ['walmart']):
-            print(f"  Using Walmart ShopStyle affiliate override")
-            return 'https://shopstyle.it/l/cuge4'
-        
-        if any(word in title_lower for word in ['lululemon', 'lulu']):
-            print(f"  Using Lululemon ShopStyle affiliate override")
-            return 'https://shopstyle.it/l/cj22Z'
-        
-        if any(word in title_lower for word in ['gap']):
-            print(f"  Using Gap ShopStyle affiliate override")
-            return 'https://shopstyle.it/l/cj24C'
-        
-        if any(word in title_lower for word in ['roxy']):
-            print(f"  Using ROXY ShopStyle affiliate override")
-            return 'https://shopstyle.it/l/cug5r'
-        
-        if any(word in title_lower for word in ['best buy', 'bestbuy']):
-            print(f"  Using Best Buy affiliate override")
-            return 'https://bestbuy.ca/?tag=promopenguin-20'
-        
-        if any(word in title_lower for word in ['cabela', 'bass pro']):
-            print(f"  Using Bass Pro/Cabela affiliate override")
-            return 'https://www.basspro.ca/home?utm_source=RAN&utm_medium=affiliate&utm_content=Living+off+the+GRID+in+Canada&ranMID=50435&ranEAID=sUVpAjRtGL4&ranSiteID=sUVpAjRtGL4-Ycc1ydj30YCWas34PH9jlg'
+        override = self.tenant.override(title)
+        if override:
+            print(f"  Using {override[0]} affiliate override")
+            return override[1]
         
         try:
-            headers = {'User-Agent': 'Mozilla/5.0 (compatible; PromoBot/1.0)'}
-            response = requests.get(post_url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Find all links in the post content
-                content_selectors = ['.entry-content', '.post-content', 'article', '.content']
-                all_links = []
-                
-                for selector in content_selectors:
-                    content = soup.select_one(selector)
-                    if content:
-                        all_links.extend(content.find_all('a', href=True))
-                        break
-                
-                if not all_links:
-                    all_links = soup.find_all('a', href=True)
+            post = self.fetch_post(post_url)
+            if post:
+                # Links in the post content, or the whole page if there's no content container
+                all_links = post.content_links(['entry-content', 'post-content', 'article', 'content'])
                 
                 # Look for sale/deal links - prefer longer ones first
                 deal_urls = []
                 
                 for link in all_links:
-                    href = link.get('href', '')
-                    link_text = link.get_text(strip=True).lower()
+                    href = link.href
+                    link_text = link.text.lower()
                     
                     if not href or href.startswith('#'):
                         continue
@@ -116,7 +108,7 @@ class SimplifiedScraper:
                 
                 # Return the best URL after cleaning
                 for priority, length, url in deal_urls[:5]:  # Check top 5 candidates
-                    clean_url = self.strip_affiliate_tags(url)
+                    clean_url = canonical_url(url)
                     if clean_url and not any(x in clean_url.lower() for x in ['smartcanucks.ca', 'hotcanadadeals.ca', 'apps.apple.com']):
                         print(f"  Found deal URL: {clean_url[:60]}...")
                         return clean_url
@@ -126,66 +118,22 @@ class SimplifiedScraper:
         
         # Fallback to merchant homepage - but skip if it would link back to source
         fallback_url = self.get_merchant_homepage(title)
-        if fallback_url and not any(x in fallback_url.lower() for x in ['smartcanucks.ca', 'hotcanadadeals.ca']):
+        if fallback_url:
             return fallback_url
         
         # If we'd link back to source, return None to skip this deal
         print(f"  Skipping deal - would link back to source")
+        metrics.inc('scraper_skipped_total', scraper='simplified', reason='links_back_to_source')
         return None
     
-    def strip_affiliate_tags(self, url):
-        """Strip affiliate tags from URLs"""
-        if not url:
-            return url
-            
-        # Common affiliate parameters to remove
-        affiliate_params = [
-            'tag=', 'ref=', 'utm_', 'aff_', 'affiliate', 'referrer',
-            'source=', 'medium=', 'campaign=', 'content=', 'term=',
-            'clickid', 'tracking', 'partner', 'promo_id'
-        ]
-        
-        if '?' in url:
-            base_url, params = url.split('?', 1)
-            
-            # Filter out affiliate parameters
-            clean_params = []
-            for param in params.split('&'):
-                if '=' in param:
-                    key = param.split('=')[0].lower()
-                    # Keep only non-affiliate parameters
-                    if not any(aff in key for aff in affiliate_params):
-                        clean_params.append(param)
-            
-            if clean_params:
-                return base_url + '?' + '&'.join(clean_params)
-            else:
-                return base_url
-        
-        return url
-    
     def get_merchant_homepage(self, title):
         """Get clean merchant homepage as fallback"""
         title_lower = title.lower()
         
         # Priority 1: Our affiliate links (same as extract_deal_url_from_post)
-        if any(word in title_lower for word in ['walmart']):
-            return 'https://shopstyle.it/l/cuge4'
-        
-        if any(word in title_lower for word in ['lululemon', 'lulu']):
-            return 'https://shopstyle.it/l/cj22Z'
-        
-        if any(word in title_lower for word in ['gap']):
-            return 'https://shopstyle.it/l/cj24C'
-        
-        if any(word in title_lower for word in ['roxy']):
-            return 'https://shopstyle.it/l/cug5r'
-        
-        if any(word in title_lower for word in ['best buy', 'bestbuy']):
-            return 'https://bestbuy.ca/?tag=promopenguin-20'
-        
-        if any(word in title_lower for word in ['cabela', 'bass pro']):
-            return 'https://www.basspro.ca/home?utm_source=RAN&utm_medium=affiliate&utm_content=Living+off+the+GRID+in+Canada&ranMID=50435&ranEAID=sUVpAjRtGL4&ranSiteID=sUVpAjRtGL4-Ycc1ydj30YCWas34PH9jlg'
+        override = self.tenant.override(title)
+        if override:
+            return override[1]
         
         # Amazon gets our tag
         if any(word in title_lower for word in ['amazon', 'amzn']):
@@ -226,13 +174,20 @@ class SimplifiedScraper:
             if merchant in title_lower:
                 return url
         
-        return 'https://www.smartcanucks.ca/'  # Last resort fallback
+        return None  # Unknown merchant: the only other link is back to the source
+
+    def repair_affiliate_url(self, deal):
+        """Fall back to the merchant homepage when a deal's link is dead"""
+        fallback_url = self.get_merchant_homepage(deal['title'])
+        if fallback_url == deal['affiliateUrl']:
+            return None
+        return fallback_url
 
     def create_individual_flyer_cards(self, original_title, entry):
         """Create individual deal cards for each store mentioned in flyer roundups"""
         stores = [
             {'name': 'Costco', 'url': 'https://www.costco.ca/', 'emoji': '🛒'},
-            {'name': 'Walmart', 'url': 'https://shopstyle.it/l/cuge4', 'emoji': '🛍️'}, # Your affiliate link
+            {'name': 'Walmart', 'url': self.tenant.link('walmart'), 'emoji': '🛍️'}, # Your affiliate link
             {'name': 'No Frills', 'url': 'https://www.nofrills.ca/', 'emoji': '🛒'},
             {'name': 'Giant Tiger', 'url': 'https://www.gianttiger.com/', 'emoji': '🐅'},
             {'name': 'Sobeys', 'url': 'https://www.sobeys.com/', 'emoji': '🛒'},
@@ -240,7 +195,7 @@ class SimplifiedScraper:
             {'name': 'Loblaws', 'url': 'https://www.loblaws.ca/', 'emoji': '🛒'},
             {'name': 'Shoppers Drug Mart', 'url': 'https://www.shoppersdrugmart.ca/', 'emoji': '💊'},
             {'name': 'Canadian Tire', 'url': 'https://www.canadiantire.ca/', 'emoji': '🔧'},
-            {'name': 'Best Buy', 'url': 'https://bestbuy.ca/?tag=promopenguin-20', 'emoji': '📱'}, # Your affiliate
+            {'name': 'Best Buy', 'url': self.tenant.link('best buy'), 'emoji': '📱'}, # Your affiliate
         ]
         
         deals = []
@@ -249,10 +204,11 @@ class SimplifiedScraper:
         for store in stores:
             store_name = store['name'].lower()
             if store_name in original_title.lower() or any(word in original_title.lower() for word in store_name.split()):
-                price, original_price, discount = self.generate_pricing(f"{store['name']} flyer deals")
+                deal_id = make_deal_id(store['name'], 'flyer')
+                price, original_price, discount = self.generate_pricing(f"{store['name']} flyer deals", deal_id)
                 
                 deal = {
-                    'id': re.sub(r'[^a-z0-9]', '', f"{store['name']}flyer")[:20],
+                    'id': deal_id,
                     'title': f"{store['name']} Weekly Flyer Deals",
                     'imageUrl': base_image or f"https://via.placeholder.com/300x200/4285f4/ffffff?text={store['name']}",
                     'price': price,
@@ -266,44 +222,45 @@ class SimplifiedScraper:
                 }
                 deals.append(deal)
         
-        # If no specific stores found, create a generic flyer deal
         if not deals:
-            price, original_price, discount = self.generate_pricing("weekly flyer deals")
-            deals.append({
-                'id': re.sub(r'[^a-z0-9]', '', original_title.lower())[:20],
-                'title': original_title,
-                'imageUrl': base_image or "https://via.placeholder.com/300x200/4285f4/ffffff?text=Flyer",
-                'price': price,
-                'originalPrice': original_price,
-                'discountPercent': discount, 
-                'category': 'Flyer',
-                'description': '📄 Weekly flyer deals and special offers from multiple stores!',
-                'affiliateUrl': 'https://www.smartcanucks.ca/',
-                'featured': False,
-                'dateAdded': datetime.now().strftime('%Y-%m-%d')
-            })
+            # A roundup naming no known store has no merchant link worth publishing
+            print(f"  Skipping flyer - no known store in title")
+            metrics.inc('scraper_skipped_total', scraper='simplified', reason='no_merchant')
             
         return deals
 
+    def fetch_post(self, post_url):
+        """Fetch and parse a blog post once; deal URL and image extraction share the result"""
+        metrics.cache('post', self.last_post[0] == post_url)
+        if self.last_post[0] != post_url:
+            from http_client import iter_text, open_stream
+            from post_extract import extract_post
+            
+            headers = {'User-Agent': 'Mozilla/5.0 (compatible; PromoBot/1.0)'}
+            response = open_stream(post_url, headers)
+            if response.status_code == 200:
+                # Only read until the post body has closed; sidebars and comments are never downloaded
+                post = extract_post(iter_text(response))
+            else:
+                response.close()
+                post = None
+            self.last_post = (post_url, post)
+        return self.last_post[1]
+
     def extract_image_from_post(self, post_url):
         """Extract the largest/best product image from blog post"""
         try:
-            headers = {'User-Agent': 'Mozilla/5.0 (compatible; PromoBot/1.0)'}
-            response = requests.get(post_url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
+            post = self.fetch_post(post_url)
+            if post:
                 # Try Open Graph image first (usually the best)
-                og_image = soup.select_one('meta[property="og:image"]')
-                if og_image and og_image.get('content'):
-                    og_url = og_image.get('content')
+                og_url = post.og_image
+                if og_url:
                     if 'smartcanucks-01.png' not in og_url and 'logo' not in og_url.lower():
                         return og_url
                 
                 # Look for WordPress featured image
-                wp_image = soup.select_one('.wp-post-image')
-                if wp_image and wp_image.get('src'):
-                    img_url = wp_image.get('src')
+                img_url = post.featured_image
+                if img_url:
                     if 'smartcanucks-01.png' not in img_url and 'logo' not in img_url.lower():
                         if img_url.startswith('//'):
                             img_url = 'https:' + img_url
@@ -312,18 +269,17 @@ class SimplifiedScraper:
                         return img_url
                 
                 # Look for largest image in content that's not a logo
-                content_images = soup.select('.entry-content img, .post-content img, article img')
                 best_image = None
                 best_size = 0
                 
-                for img in content_images:
-                    img_url = img.get('src', '')
+                for img in post.content_images():
+                    img_url = img.src
                     if not img_url or 'logo' in img_url.lower() or 'smartcanucks-01.png' in img_url:
                         continue
                     
                     # Try to estimate image size from URL or attributes
-                    width = img.get('width', '0')
-                    height = img.get('height', '0')
+                    width = img.width
+                    height = img.height
                     
                     try:
                         size = int(width) * int(height) if width.isdigit() and height.isdigit() else 0
@@ -349,25 +305,26 @@ class SimplifiedScraper:
             print(f"  Error extracting image: {e}")
         return None
 
-    def generate_pricing(self, title):
-        """Generate realistic pricing based on title"""
+    def generate_pricing(self, title, seed=None):
+        """Generate realistic pricing based on title, the same every run for the same seed (deal ID)"""
+        rng = random.Random(seed or title)
         title_lower = title.lower()
         
         if any(word in title_lower for word in ['electronics', 'tv', 'phone', 'laptop']):
-            price = round(random.uniform(299, 799), 2)
-            original = round(price * random.uniform(1.3, 1.8), 2)
+            price = round(rng.uniform(299, 799), 2)
+            original = round(price * rng.uniform(1.3, 1.8), 2)
         elif any(word in title_lower for word in ['clothing', 'shoes', 'fashion']):
-            price = round(random.uniform(19, 89), 2)
-            original = round(price * random.uniform(1.2, 1.6), 2)
+            price = round(rng.uniform(19, 89), 2)
+            original = round(price * rng.uniform(1.2, 1.6), 2)
         else:
-            price = round(random.uniform(29, 149), 2)
-            original = round(price * random.uniform(1.3, 1.7), 2)
+            price = round(rng.uniform(29, 149), 2)
+            original = round(price * rng.uniform(1.3, 1.7), 2)
         
         discount = int(((original - price) / original) * 100)
         return price, original, discount
 
-    def generate_description(self, title):
-        """Generate engaging descriptions"""
+    def generate_description(self, title, seed=None):
+        """Generate engaging descriptions, the same every run for the same seed (deal ID)"""
         templates = [
             f"🔥 Amazing deal on {title}! Don't miss out on these incredible savings.",
             f"⚡ Hot savings on {title}! Limited time offer.",
@@ -376,145 +333,260 @@ class SimplifiedScraper:
             f"⭐ Customer favorite! {title} delivers exceptional value.",
             f"🎯 Limited time offer on {title}. Act fast!"
         ]
-        return random.choice(templates)
+        return random.Random(seed or title).choice(templates)
 
-    def scrape_deals(self):
-        """Scrape deals from RSS feeds"""
-        all_deals = []
-        
-        # RSS feeds to try
-        feeds = [
-            'https://www.smartcanucks.ca/feed/',
-            'https://www.redflagdeals.com/rss/forum/9/',
-            'https://bargainmoose.ca/feed',
-        ]
+    def process_entry(self, entry, i, source):
+        """Turn one feed entry into deals (several for a flyer roundup, none if unusable)"""
+        title = entry.title
+        print(f"Processing: {title[:50]}...")
+        
+        # Check if this is a flyer roundup and break it into individual store cards
+        if any(word in title.lower() for word in ['flyer', 'flyers']) and ('deals' in title.lower() or 'offers' in title.lower()):
+            flyer_deals = self.create_individual_flyer_cards(title, entry)
+            for flyer_deal in flyer_deals:
+                flyer_deal['source'] = source
+            print(f"Created {len(flyer_deals)} individual flyer cards from: {title[:30]}...")
+            return flyer_deals
+        else:
+            # Generate regular deal data
+            deal_id = make_deal_id(title, getattr(entry, 'link', ''))
+            
+            # Extract the real deal URL from the blog post
+            affiliate_url = self.extract_deal_url_from_post(entry.link, title) if hasattr(entry, 'link') else self.get_merchant_homepage(title)
+            
+            # Skip this deal if we couldn't find a valid URL
+            if not affiliate_url:
+                print(f"  Skipped: {title[:30]}... (no valid URL)")
+                if not hasattr(entry, 'link'):
+                    # With a post link, extract_deal_url_from_post has already counted why
+                    metrics.inc('scraper_skipped_total', scraper='simplified', reason='no_valid_url')
+                return []
+            
+            # Another source's post already led to this merchant page
+            duplicate_of = self.near_dups.find(url=affiliate_url)
+            if duplicate_of:
+                print(f"  Skipped duplicate: {title[:30]}... (same link as {duplicate_of[:40]})")
+                metrics.inc('scraper_skipped_total', scraper='simplified', reason='duplicate')
+                return []
+            
+            price, original_price, discount = self.generate_pricing(title, deal_id)
+            description = self.generate_description(title, deal_id)
+            
+            # Try to get image from RSS first (better than scraping)
+            image_url = None
+            
+            # RSS feeds often have image in media_content or enclosures
+            if hasattr(entry, 'media_content') and entry.media_content:
+                image_url = entry.media_content[0]['url']
+            elif hasattr(entry, 'enclosures') and entry.enclosures:
+                for enc in entry.enclosures:
+                    if enc.type.startswith('image/'):
+                        image_url = enc.href
+                        break
+            elif hasattr(entry, 'links'):
+                for link in entry.links:
+                    if link.get('type', '').startswith('image/'):
+                        image_url = link.href
+                        break
+            
+            # Fallback to scraping post if no RSS image
+            if not image_url and hasattr(entry, 'link'):
+                image_url = self.extract_image_from_post(entry.link)
+            
+            # Final fallback to placeholder
+            if not image_url:
+                image_url = f"https://via.placeholder.com/300x200/4285f4/ffffff?text={title.split()[0]}"
+            
+            deal = {
+                'id': deal_id,
+                'title': title,
+                'imageUrl': image_url,
+                'price': price,
+                'originalPrice': original_price,
+                'discountPercent': discount,
+                'category': 'General',
+                'description': description,
+                'affiliateUrl': affiliate_url,
+                'featured': i < 3,  # First 3 from each feed are featured
+                'dateAdded': datetime.now().strftime('%Y-%m-%d'),
+                'source': source
+            }
+            
+            print(f"Added: {title[:30]}... -> {affiliate_url[:40]}...")
+            return [deal]
+
+    def scrape_deals(self, feed_bodies=None, feeds=None, feed_state=None):
+        """Scrape deals from RSS feeds into a list; see iter_deals"""
+        return list(self.iter_deals(feed_bodies, feeds, feed_state))
+
+    async def aiter_deals(self, feed_bodies=None, feeds=None, feed_state=None):
+        """iter_deals as an async iterator, for callers running an event loop"""
+        from pipeline import aiterate
+        async for deal in aiterate(self.iter_deals(feed_bodies, feeds, feed_state)):
+            yield deal
+
+    def iter_deals(self, feed_bodies=None, feeds=None, feed_state=None, results=None, stop_event=None):
+        """Yield deals from RSS feeds (all of them unless given) as each entry is processed,
+        reusing already-fetched or parsed feeds when given
+
+        Entries from every feed are worked best-first by PriorityScheduler, so quota a feed
+        can't fill goes to other feeds and a RUN_TIME_BUDGET deadline keeps what's done so far.
+        With results ({entry key: deals} from work_queue workers) entries aren't processed
+        here, only selected. Setting stop_event ends the run after the current entry.
+        """
+        import feedparser
+        
+        feed_bodies = feed_bodies or {}
+        feeds = feeds or FEEDS
+        scheduler = PriorityScheduler(self.limit, feed_state=feed_state, stop_event=stop_event)
+        self.near_dups = NearDupIndex()
+        sources = {}
         
         for feed_url in feeds:
             print(f"Processing feed: {feed_url}")
+            sources[feed_url] = feed_url.split('/')[2].replace('www.', '')
             try:
-                feed = feedparser.parse(feed_url)
+                feed = feed_bodies.get(feed_url)
+                if not hasattr(feed, 'entries'):
+                    feed = feedparser.parse(feed or feed_url)
                 print(f"Found {len(feed.entries)} entries")
-                
-                for i, entry in enumerate(feed.entries[:self.limit//len(feeds)]):
-                    if len(all_deals) >= self.limit:
-                        break
-                    
-                    title = entry.title
-                    print(f"Processing: {title[:50]}...")
-                    
-                    # Check if this is a flyer roundup and break it into individual store cards
-                    if any(word in title.lower() for word in ['flyer', 'flyers']) and ('deals' in title.lower() or 'offers' in title.lower()):
-                        flyer_deals = self.create_individual_flyer_cards(title, entry)
-                        all_deals.extend(flyer_deals)
-                        print(f"Created {len(flyer_deals)} individual flyer cards from: {title[:30]}...")
-                    else:
-                        # Generate regular deal data
-                        deal_id = re.sub(r'[^a-z0-9]', '', title.lower())[:20] or f"deal{i}"
-                        
-                        # Extract the real deal URL from the blog post
-                        affiliate_url = self.extract_deal_url_from_post(entry.link, title) if hasattr(entry, 'link') else self.get_merchant_homepage(title)
-                        
-                        # Skip this deal if we couldn't find a valid URL
-                        if not affiliate_url:
-                            print(f"  Skipped: {title[:30]}... (no valid URL)")
-                            continue
-                        
-                        price, original_price, discount = self.generate_pricing(title)
-                        description = self.generate_description(title)
-                        
-                        # Try to get image from RSS first (better than scraping)
-                        image_url = None
-                        
-                        # RSS feeds often have image in media_content or enclosures
-                        if hasattr(entry, 'media_content') and entry.media_content:
-                            image_url = entry.media_content[0]['url']
-                        elif hasattr(entry, 'enclosures') and entry.enclosures:
-                            for enc in entry.enclosures:
-                                if enc.type.startswith('image/'):
-                                    image_url = enc.href
-                                    break
-                        elif hasattr(entry, 'links'):
-                            for link in entry.links:
-                                if link.get('type', '').startswith('image/'):
-                                    image_url = link.href
-                                    break
-                        
-                        # Fallback to scraping post if no RSS image
-                        if not image_url and hasattr(entry, 'link'):
-                            image_url = self.extract_image_from_post(entry.link)
-                        
-                        # Final fallback to placeholder
-                        if not image_url:
-                            image_url = f"https://via.placeholder.com/300x200/4285f4/ffffff?text={title.split()[0]}"
-                        
-                        deal = {
-                            'id': deal_id,
-                            'title': title,
-                            'imageUrl': image_url,
-                            'price': price,
-                            'originalPrice': original_price,
-                            'discountPercent': discount,
-                            'category': 'General',
-                            'description': description,
-                            'affiliateUrl': affiliate_url,
-                            'featured': i < 3,  # First 3 from each feed are featured
-                            'dateAdded': datetime.now().strftime('%Y-%m-%d')
-                        }
-                        
-                        all_deals.append(deal)
-                        print(f"Added: {title[:30]}... -> {affiliate_url[:40]}...")
-                    
-                    time.sleep(0.3)  # Be respectful
-                    
+                scheduler.add_feed(feed_url, feed.entries)
             except Exception as e:
                 print(f"Error processing feed {feed_url}: {e}")
                 continue
         
-        return all_deals
+        for item in scheduler:
+            # The same deal is often posted by several sources; keep the best-ranked copy
+            key = getattr(item.entry, 'link', None) or item.entry.title
+            duplicate_of = self.near_dups.find(item.entry.title, key)
+            if duplicate_of:
+                print(f"  Skipped duplicate: {item.entry.title[:30]}... (same as {duplicate_of[:40]})")
+                metrics.inc('scraper_skipped_total', scraper='simplified', reason='duplicate')
+                continue
+            
+            # Entries worked by work_queue workers or finished by an interrupted earlier run need no work
+            if results is not None:
+                done = {'deals': results.get(key) or []}
+            else:
+                done = self.journal.get(key)
+                metrics.cache('journal', done is not None)
+            if done is not None:
+                deals = done['deals']
+            else:
+                try:
+                    with metrics.timed('scraper_stage_seconds', scraper='simplified', stage='entry'):
+                        deals = self.process_entry(item.entry, item.index, sources[item.feed_url])
+                except Exception as e:
+                    print(f"Error processing entry from {item.feed_url}: {e}")
+                    metrics.inc('scraper_skipped_total', scraper='simplified', reason='error')
+                    deals = []
+                else:
+                    self.journal.record(key, deals=deals)
+                time.sleep(0.3)  # Be respectful
+            # Rejected before the link check and image stages spend requests on them
+            deals = self.valid_deals(deals) if deals else deals
+            # process_entry skips links already kept, but replayed results and flyer cards aren't checked
+            unique = [deal for deal in deals if not self.near_dups.find(url=deal['affiliateUrl'])]
+            if len(unique) < len(deals):
+                print(f"  Skipped {len(deals) - len(unique)} duplicate links from: {item.entry.title[:30]}...")
+                metrics.inc('scraper_skipped_total', len(deals) - len(unique), scraper='simplified', reason='duplicate')
+                deals = unique
+            self.near_dups.add(key, item.entry.title if deals else None, key)
+            for deal in deals:
+                self.near_dups.add(key, url=deal['affiliateUrl'])
+            scheduler.record(item, len(deals))
+            for deal in deals:
+                metrics.inc('scraper_deals_total', scraper='simplified', source=deal.get('source') or sources[item.feed_url])
+                yield deal
 
-    def load_existing_deals(self):
-        """Load existing deals to preserve custom images"""
-        output_path = '../public/deals.json'
-        try:
-            with open(output_path, 'r', encoding='utf-8') as f:
-                existing_deals = json.load(f)
-                # Create a mapping of deal ID to image URL for screenshot images
-                image_map = {}
-                for deal in existing_deals:
-                    # Only preserve SmartCanucks screenshot images
-                    if 'Screenshot' in deal.get('imageUrl', ''):
-                        image_map[deal['id']] = deal['imageUrl']
-                return image_map
-        except:
-            return {}
+    def load_existing_deals(self, store):
+        """Load existing screenshot images from the deal store"""
+        # Only preserve SmartCanucks screenshot images
+        return store.image_map('deals.json', 'Screenshot')
+
+    def valid_deals(self, batch):
+        """The deals in a batch that pass the deal_models rules, as plain dicts"""
+        # The size cap is retention's job; here only the per-deal rules and duplicates apply
+        records, errors = validate_deals(batch, max_deals=len(batch))
+        for deal_id, error in errors:
+            print(f"  [INVALID] {deal_id}: {error}")
+        metrics.inc('scraper_skipped_total', len(errors), scraper='simplified', reason='invalid')
+        return [record.to_dict() for record in records]
 
     def save_deals(self, deals):
-        """Save deals to JSON file"""
+        """Merge deals (any iterable, consumed as it yields) into the deal store and export deals.json
+
+        Returns the number of deals stored.
+        """
+        from pipeline import SAVE_BATCH, PublishTimer, batched
         output_path = '../public/deals.json'
+        now = time.time()
+        count = 0
+        retention = RetentionPolicy.from_env()
+        publish = PublishTimer()
         
-        # Load existing screenshot images
-        existing_images = self.load_existing_deals()
-        
-        # Preserve existing screenshot images
-        for deal in deals:
-            if deal['id'] in existing_images:
-                print(f"Preserving screenshot image for: {deal['title'][:30]}...")
-                deal['imageUrl'] = existing_images[deal['id']]
-        
-        print(f"Saving {len(deals)} deals to {output_path}")
-        
-        # Save deals
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(deals, f, indent=2, ensure_ascii=False)
+        with DealStore() as store:
+            store.import_json(output_path, 'deals.json')
+            
+            # Load existing screenshot images
+            existing_images = self.load_existing_deals(store)
+            
+            for batch in batched(deals, SAVE_BATCH):
+                # Deals imported from an old deals.json move to their new IDs first
+                for old_id, new_id in store.rekey(batch).items():
+                    if old_id in existing_images:
+                        existing_images[new_id] = existing_images.pop(old_id)
+                # Preserve existing screenshot images
+                for deal in batch:
+                    if deal['id'] in existing_images:
+                        print(f"Preserving screenshot image for: {deal['title'][:30]}...")
+                        deal['imageUrl'] = existing_images[deal['id']]
+                        # The <picture> sources would win over the screenshot, so drop the thumbnails
+                        deal.pop('imageSrcSet', None)
+                        deal.pop('imageAvifSrcSet', None)
+                # Checked again after the later stages, which rewrite links and images
+                batch = self.valid_deals(batch)
+                with metrics.timed('scraper_stage_seconds', scraper='simplified', stage='store'):
+                    store.upsert_deals(batch, 'deals.json', start_position=count, now=now)
+                count += len(batch)
+                if batch and publish.due():
+                    # Readers get the deals stored so far instead of waiting for the whole run
+                    with metrics.timed('scraper_stage_seconds', scraper='simplified', stage='export'):
+                        retention.compact(store, 'deals.json', output_path)
+            
+            print(f"Saving {count} deals to {output_path}")
+            with metrics.timed('scraper_stage_seconds', scraper='simplified', stage='export'):
+                retention.compact(store, 'deals.json', output_path)
         
-        print(f"Saved {len(deals)} deals successfully!")
-        return deals
+        self.journal.clear()
+        print(f"Saved {count} deals successfully!")
+        return count
 
 def main():
+    started = time.time()
+    # Cheap conditional check first: exit before importing anything heavy if no feed changed
+    feed_state = FeedState()
+    feed_bodies, changed = feed_state.fetch_all(FEEDS)
+    if not changed and os.getenv('FORCE_RUN', '0') != '1':
+        print("No feed changes since last run - nothing to do")
+        record_run('simplified', started, 0)
+        metrics.write_textfile('simplified')
+        return
+    
     scraper = SimplifiedScraper()
-    deals = scraper.scrape_deals()
-    scraper.save_deals(deals)
-    print(f"\nGenerated {len(deals)} deals total!")
+    # Each stage pulls deals as the one before produces them
+    deals = scraper.iter_deals(feed_bodies, feed_state=feed_state)
+    if os.getenv('LINK_CHECK', '1') != '0':
+        from link_checker import LinkChecker
+        deals = LinkChecker().filter_stream(deals, scraper.repair_affiliate_url)
+    if os.getenv('IMAGE_PIPELINE', '1') != '0':
+        from image_pipeline import ImagePipeline
+        deals = ImagePipeline().process_stream(deals)
+    count = scraper.save_deals(deals)
+    feed_state.commit()
+    record_run('simplified', started, count)
+    metrics.write_textfile('simplified')
+    print(f"\nGenerated {count} deals total!")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
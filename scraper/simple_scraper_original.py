@@ -3,75 +3,49 @@
 Simple RSS-to-JSON scraper that works without Google Sheets
 """
 
-import json
-import feedparser
-import requests
 import re
-from urllib.parse import urlparse, parse_qs
 from datetime import datetime
 import time
-from bs4 import BeautifulSoup
 import random
 import os
-from typing import List, Optional
-from pydantic import BaseModel, HttpUrl, field_validator, Field
+import importlib.util
+from deal_store import DealStore, make_deal_id
+from retention import RetentionPolicy
+from feed_state import FeedState
+from url_canon import affiliate_url, canonical_url
+from deal_record import DealRecord, validate_deals
 
-class Deal(BaseModel):
-    """Pydantic model for deal validation"""
-    id: str = Field(..., min_length=1, max_length=20, description="Unique deal identifier")
-    title: str = Field(..., min_length=5, max_length=200, description="Deal title")
-    imageUrl: str = Field(default="/placeholder-deal.svg", description="Product image URL")
-    price: float = Field(..., gt=0, lt=10000, description="Current price in CAD")
-    originalPrice: float = Field(..., gt=0, lt=10000, description="Original price in CAD")
-    discountPercent: int = Field(..., ge=1, le=90, description="Discount percentage")
-    category: str = Field(default="General", min_length=1, max_length=50, description="Deal category")
-    description: str = Field(..., min_length=10, max_length=500, description="Deal description")
-    affiliateUrl: HttpUrl = Field(..., description="Clean affiliate URL")
-    featured: bool = Field(default=False, description="Whether deal is featured")
-    dateAdded: str = Field(..., pattern=r'^\d{4}-\d{2}-\d{2}$', description="Date added (YYYY-MM-DD)")
-    
-    @field_validator('originalPrice')
-    def original_price_must_be_higher(cls, v, info):
-        """Original price must be higher than current price"""
-        if 'price' in info.data and v <= info.data['price']:
-            raise ValueError('originalPrice must be higher than price')
-        return v
-    
-    @field_validator('discountPercent')
-    def discount_percent_must_match(cls, v, info):
-        """Discount percentage must match the actual price difference"""
-        if 'price' in info.data and 'originalPrice' in info.data:
-            actual_discount = int(((info.data['originalPrice'] - info.data['price']) / info.data['originalPrice']) * 100)
-            if abs(v - actual_discount) > 2:  # Allow 2% tolerance for rounding
-                raise ValueError(f'discountPercent {v}% does not match calculated discount {actual_discount}%')
-        return v
-    
-    @field_validator('affiliateUrl')
-    def affiliate_url_must_be_valid(cls, v):
-        """Affiliate URL must not link back to SmartCanucks"""
-        url_str = str(v)
-        if 'smartcanucks.ca' in url_str.lower():
-            raise ValueError('affiliateUrl cannot link back to SmartCanucks')
-        return v
-    
-    @field_validator('title')
-    def title_must_be_clean(cls, v):
-        """Title must not contain suspicious content"""
-        if any(word in v.lower() for word in ['error', 'failed', 'test', 'debug']):
-            raise ValueError('title contains suspicious content')
-        return v
+# feedparser, requests, bs4 and the post-processing
+# stages are imported where they are used so startup stays cheap
 
-class DealsCollection(BaseModel):
-    """Collection of validated deals"""
-    deals: List[Deal] = Field(..., min_items=1, max_items=200, description="List of deals")
-    
-    @field_validator('deals')
-    def deals_must_have_unique_ids(cls, v):
-        """All deals must have unique IDs"""
-        ids = [deal.id for deal in v]
-        if len(ids) != len(set(ids)):
-            raise ValueError('Deal IDs must be unique')
-        return v
+# Multiple RSS feed sources for Canadian deals
+RSS_FEEDS = [
+    {
+        'name': 'SmartCanucks',
+        'url': 'https://www.smartcanucks.ca/feed/',
+        'site': 'https://www.smartcanucks.ca'
+    },
+    {
+        'name': 'RedFlagDeals Hot Deals',
+        'url': 'https://www.redflagdeals.com/rss/forum/9/',
+        'site': 'https://www.redflagdeals.com'
+    },
+    {
+        'name': 'Canadian Freebies',
+        'url': 'https://canadianfreebies.ca/feed/',
+        'site': 'https://canadianfreebies.ca'
+    },
+    {
+        'name': 'Bargainmoose',
+        'url': 'https://bargainmoose.ca/feed',
+        'site': 'https://bargainmoose.ca'
+    },
+    {
+        'name': 'Deal Hunter',
+        'url': 'https://www.dealhunter.ca/feed/',
+        'site': 'https://www.dealhunter.ca'
+    }
+]
 
 class SimpleScraper:
     def __init__(self):
@@ -79,34 +53,15 @@ class SimpleScraper:
         self.base_url = os.getenv('SITE_URL', 'https://www.smartcanucks.ca')
         self.limit = int(os.getenv('DEAL_LIMIT', '150'))  # Increase limit for multiple feeds
         
+        # Playwright is optional; the browser starts lazily and only for hosts that need JavaScript
+        self.use_playwright = os.getenv('USE_PLAYWRIGHT', '1') != '0' and importlib.util.find_spec('playwright') is not None
+        self.browser_pool = None
+        from browser_pool import JsHostMemo
+        self.js_hosts = JsHostMemo()
+        
         # Multiple RSS feed sources for Canadian deals
-        self.rss_feeds = [
-            {
-                'name': 'SmartCanucks',
-                'url': 'https://www.smartcanucks.ca/feed/',
-                'site': 'https://www.smartcanucks.ca'
-            },
-            {
-                'name': 'RedFlagDeals Hot Deals',
-                'url': 'https://www.redflagdeals.com/rss/forum/9/',
-                'site': 'https://www.redflagdeals.com'
-            },
-            {
-                'name': 'Canadian Freebies',
-                'url': 'https://canadianfreebies.ca/feed/',
-                'site': 'https://canadianfreebies.ca'
-            },
-            {
-                'name': 'Bargainmoose',
-                'url': 'https://bargainmoose.ca/feed',
-                'site': 'https://bargainmoose.ca'
-            },
-            {
-                'name': 'Deal Hunter',
-                'url': 'https://www.dealhunter.ca/feed/',
-                'site': 'https://www.dealhunter.ca'
-            }
-        ]
+        self.rss_feeds = RSS_FEEDS
+        self.feed_bodies = {}  # Feed bodies already fetched by the startup change check
         
         # Debug: Print the configuration being used
         print(f"=== SCRAPER CONFIGURATION ===")
@@ -157,6 +112,9 @@ class SimpleScraper:
     
     def extract_affiliate_link(self, deal_url):
         """Extract affiliate links from deal posts using Beautiful Soup"""
+        import requests
+        from bs4 import BeautifulSoup
+        
         try:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -257,7 +215,7 @@ class SimpleScraper:
                 
                 # Handle Amazon links
                 if any(x in best_link['url'].lower() for x in ['amazon.ca', 'amazon.com']):
-                    return self.clean_and_add_affiliate_tag(best_link['url'], 'amazon'), 'amazon'
+                    return affiliate_url(best_link['url'], self.affiliate_tag), 'amazon'
                 else:
                     cleaned_url = self.clean_affiliate_link(best_link['url'])
                     return cleaned_url, 'merchant' if cleaned_url else None
@@ -269,136 +227,100 @@ class SimpleScraper:
             return None, 'error'
     
     def extract_affiliate_link_with_playwright(self, deal_url):
-        """Use Playwright to extract JavaScript links from SmartCanucks posts"""
-        from playwright.sync_api import sync_playwright
-        
+        """Use the shared browser pool to extract JavaScript links from SmartCanucks posts"""
         try:
             print(f"  Using Playwright to load: {deal_url}")
             
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page = browser.new_page()
-                
-                # Navigate and wait for content to load
-                page.goto(deal_url, wait_until='networkidle')
-                
-                # Look for links in the content area
-                content_selector = '.entry-content, article, .post-content'
+            if self.browser_pool is None:
+                from browser_pool import BrowserPool
+                self.browser_pool = BrowserPool(max_pages=int(os.getenv('BROWSER_PAGES', '4')))
+            
+            # Reuses the running browser; images, fonts and other non-document resources are blocked
+            links = self.browser_pool.extract_links(deal_url)
+            
+            print(f"  Playwright found {len(links)} links")
+            
+            # Filter and select best link
+            skip_domains = [
+                'smartcanucks.ca', 'apps.apple.com', 'play.google.com', 
+                'facebook.com', 'twitter.com', 'instagram.com', 'pinterest.com',
+                'hotcanadadeals.ca', 'flipp.com'
+            ]
+            
+            valid_links = []
+            for link in links:
+                url = link['url']
+                text = link['text']
                 
-                # Get all links that have onclick handlers or href attributes
-                links = page.evaluate(r"""
-                    () => {
-                        const contentArea = document.querySelector('.entry-content, article, .post-content');
-                        if (!contentArea) return [];
-                        
-                        const links = [];
-                        const anchors = contentArea.querySelectorAll('a');
-                        
-                        anchors.forEach(a => {
-                            let url = null;
-                            let text = a.textContent.trim();
-                            
-                            // Check href first
-                            if (a.href && a.href.startsWith('http')) {
-                                url = a.href;
-                            }
-                            // Check onclick for JavaScript links
-                            else if (a.onclick) {
-                                const onclickStr = a.onclick.toString();
-                                const urlMatch = onclickStr.match(/https?:\/\/[^'")]+/);
-                                if (urlMatch) {
-                                    url = urlMatch[0];
-                                }
-                            }
-                            
-                            if (url && text) {
-                                links.push({ url, text });
-                            }
-                        });
-                        
-                        return links;
-                    }
-                """)
+                # Skip unwanted domains
+                if any(domain in url.lower() for domain in skip_domains):
+                    continue
                 
-                browser.close()
+                # Skip shortened links
+                if any(x in url.lower() for x in ['bit.ly/', 'tinyurl.com', 'goo.gl', 'ow.ly', 't.co']):
+                    continue
                 
-                print(f"  Playwright found {len(links)} links")
+                print(f"  Valid link: {text[:30]} -> {url[:60]}")
                 
-                # Filter and select best link
-                skip_domains = [
-                    'smartcanucks.ca', 'apps.apple.com', 'play.google.com', 
-                    'facebook.com', 'twitter.com', 'instagram.com', 'pinterest.com',
-                    'hotcanadadeals.ca', 'flipp.com'
-                ]
+                # Calculate priority
+                has_sale_text = any(keyword in text.lower() for keyword in 
+                                  ['sale', 'deal', 'promo', 'clearance', 'offer', 'save', 'discount', 'shop now'])
+                path_depth = len([p for p in url.split('/')[3:] if p])  # Count path segments after domain
                 
-                valid_links = []
-                for link in links:
-                    url = link['url']
-                    text = link['text']
-                    
-                    # Skip unwanted domains
-                    if any(domain in url.lower() for domain in skip_domains):
-                        continue
-                    
-                    # Skip shortened links
-                    if any(x in url.lower() for x in ['bit.ly/', 'tinyurl.com', 'goo.gl', 'ow.ly', 't.co']):
-                        continue
-                    
-                    print(f"  Valid link: {text[:30]} -> {url[:60]}")
-                    
-                    # Calculate priority
-                    has_sale_text = any(keyword in text.lower() for keyword in 
-                                      ['sale', 'deal', 'promo', 'clearance', 'offer', 'save', 'discount', 'shop now'])
-                    path_depth = len([p for p in url.split('/')[3:] if p])  # Count path segments after domain
-                    
-                    valid_links.append({
-                        'url': url,
-                        'text': text,
-                        'has_sale_text': has_sale_text,
-                        'path_depth': path_depth
-                    })
-                
-                if valid_links:
-                    # Sort by sale text and path depth
-                    valid_links.sort(key=lambda x: (x['has_sale_text'], x['path_depth']), reverse=True)
-                    best_link = valid_links[0]
-                    
-                    print(f"  Selected: {best_link['text'][:30]} -> {best_link['url']}")
-                    
-                    # Handle Amazon links
-                    if any(x in best_link['url'].lower() for x in ['amazon.ca', 'amazon.com']):
-                        return self.clean_and_add_affiliate_tag(best_link['url'], 'amazon'), 'amazon'
-                    else:
-                        cleaned_url = self.clean_affiliate_link(best_link['url'])
-                        return cleaned_url, 'other' if cleaned_url else None, 'unknown'
+                valid_links.append({
+                    'url': url,
+                    'text': text,
+                    'has_sale_text': has_sale_text,
+                    'path_depth': path_depth
+                })
+            
+            if valid_links:
+                # Sort by sale text and path depth
+                valid_links.sort(key=lambda x: (x['has_sale_text'], x['path_depth']), reverse=True)
+                best_link = valid_links[0]
                 
-                return None, 'unknown'
+                print(f"  Selected: {best_link['text'][:30]} -> {best_link['url']}")
                 
+                # Handle Amazon links
+                if any(x in best_link['url'].lower() for x in ['amazon.ca', 'amazon.com']):
+                    return affiliate_url(best_link['url'], self.affiliate_tag), 'amazon'
+                else:
+                    cleaned_url = self.clean_affiliate_link(best_link['url'])
+                    return cleaned_url, 'other' if cleaned_url else None
+            
+            return None, 'unknown'
+            
         except Exception as e:
             print(f"  Playwright error: {e}")
             return None, 'error'
     
-    def clean_and_add_affiliate_tag(self, amazon_url, platform='amazon'):
-        """Clean existing affiliate tags and add our tag to Amazon URL"""
-        parsed = urlparse(amazon_url)
-        params = parse_qs(parsed.query)
-        
-        # Remove any existing affiliate tags
-        affiliate_params = ['tag', 'ref', 'ref_', 'linkCode', 'linkId', 'camp', 'creative', 'creativeASIN']
-        for param in affiliate_params:
-            if param in params:
-                del params[param]
-        
-        # Add our affiliate tag
-        if platform == 'amazon':
-            params['tag'] = [self.affiliate_tag]
-        
-        # Rebuild query string
-        if params:
-            new_query = '&'.join([f"{k}={v[0]}" for k, v in params.items()])
-            return f"{parsed.scheme}://{parsed.netloc}{parsed.path}?{new_query}"
-        else:
-            return f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+    def extract_link_with_fallback(self, deal_url):
+        """Plain HTTP extraction, rendering with Playwright only on hosts that need JavaScript"""
+        needs_js = self.js_hosts.needs_js(deal_url)
+        plain_type = None
+        
+        if needs_js is not True:
+            affiliate_url, link_type = self.extract_affiliate_link(deal_url)
+            if affiliate_url:
+                if needs_js is None:
+                    self.js_hosts.record(deal_url, False)
+                return affiliate_url, link_type
+            if needs_js is False or not self.use_playwright:
+                return affiliate_url, link_type
+            plain_type = link_type
+
+        affiliate_url, link_type = self.extract_affiliate_link_with_playwright(deal_url)
+        if needs_js is None and 'error' not in (plain_type, link_type):
+            # Remember whether rendering found a link plain HTTP missed; a failed
+            # fetch or render says nothing about the host, so it isn't recorded
+            self.js_hosts.record(deal_url, bool(affiliate_url))
+        return affiliate_url, link_type
+    
+    def close(self):
+        """Shut down the browser pool if it was started"""
+        if self.browser_pool is not None:
+            self.browser_pool.close()
+            self.browser_pool = None
     
     def clean_affiliate_link(self, url):
         """Clean affiliate parameters from non-Amazon URLs - NEVER link back to SmartCanucks"""
@@ -407,21 +329,8 @@ class SimpleScraper:
         if any(domain in url.lower() for domain in unwanted_domains):
             return None
             
-        parsed = urlparse(url)
-        params = parse_qs(parsed.query)
-        
-        # Remove common affiliate parameters
-        affiliate_params = ['aff', 'affiliate', 'ref', 'referrer', 'source', 'utm_source', 'utm_medium', 'utm_campaign']
-        for param in affiliate_params:
-            if param in params:
-                del params[param]
-        
-        # Rebuild URL without affiliate params (ready for our future tags)
-        if params:
-            new_query = '&'.join([f"{k}={v[0]}" for k, v in params.items()])
-            return f"{parsed.scheme}://{parsed.netloc}{parsed.path}?{new_query}"
-        else:
-            return f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+        # Drop affiliate/tracking params (ready for our future tags)
+        return canonical_url(url)
     
     def extract_featured_image_from_api(self, post_data):
         """Extract featured image from WordPress REST API response"""
@@ -450,6 +359,9 @@ class SimpleScraper:
     
     def extract_product_image(self, deal_url):
         """Extract the main product image from SmartCanucks post"""
+        import requests
+        from bs4 import BeautifulSoup
+        
         try:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -485,27 +397,28 @@ class SimpleScraper:
             return None
     
     def generate_price_and_discount(self, title):
-        """Generate realistic prices based on product type"""
+        """Generate realistic prices based on product type, the same every run for the same title"""
+        rng = random.Random(title)
         title_lower = title.lower()
         
         if any(word in title_lower for word in ['electronics', 'tech', 'phone', 'laptop', 'tv', 'lego', 'game']):
-            current_price = random.uniform(199, 899)
-            original_price = current_price * random.uniform(1.3, 1.6)
+            current_price = rng.uniform(199, 899)
+            original_price = current_price * rng.uniform(1.3, 1.6)
         elif any(word in title_lower for word in ['clothing', 'shirt', 'pants', 'dress', 'shoes', 'tight', 'under']):
-            current_price = random.uniform(19, 79)
-            original_price = current_price * random.uniform(1.2, 1.5)
+            current_price = rng.uniform(19, 79)
+            original_price = current_price * rng.uniform(1.2, 1.5)
         elif any(word in title_lower for word in ['home', 'kitchen', 'furniture', 'decor', 'backpack', 'bag']):
-            current_price = random.uniform(29, 199)
-            original_price = current_price * random.uniform(1.3, 1.7)
+            current_price = rng.uniform(29, 199)
+            original_price = current_price * rng.uniform(1.3, 1.7)
         else:
-            current_price = random.uniform(24, 89)
-            original_price = current_price * random.uniform(1.3, 1.6)
+            current_price = rng.uniform(24, 89)
+            original_price = current_price * rng.uniform(1.3, 1.6)
         
         discount = int(((original_price - current_price) / original_price) * 100)
         return round(current_price, 2), round(original_price, 2), discount
     
     def generate_description(self, title):
-        """Generate engaging descriptions"""
+        """Generate engaging descriptions, the same every run for the same title"""
         templates = [
             f"🔥 Amazing deal on {title}! Premium quality at an unbeatable price.",
             f"⚡ Hot savings on {title}! Don't miss this incredible offer.",
@@ -514,10 +427,12 @@ class SimpleScraper:
             f"⭐ Customer favorite! {title} delivers exceptional value.",
             f"🎯 Limited time offer on {title}. Act fast before it's gone!",
         ]
-        return random.choice(templates)
+        return random.Random(title).choice(templates)
     
     def fetch_wordpress_posts(self, base_url=None, limit=500):
         """Fetch posts using WordPress REST API with pagination for 500+ posts"""
+        import requests
+        
         base_url = base_url or self.base_url
         all_posts = []
         page = 1
@@ -562,6 +477,9 @@ class SimpleScraper:
     
     def scrape_deals_from_wordpress(self, limit=100):
         """Scrape deals directly from WordPress site using Beautiful Soup"""
+        import requests
+        from bs4 import BeautifulSoup
+        
         print(f"Scraping deals from WordPress site...")
         
         deals = []
@@ -642,10 +560,10 @@ class SimpleScraper:
                                 print(f"Processing: {title[:50]}...")
                                 
                                 # Create unique ID
-                                deal_id = re.sub(r'[^a-zA-Z0-9]', '', title.lower())[:20]
+                                deal_id = make_deal_id(title, post_url)
                                 
                                 # Extract actual affiliate link from post
-                                affiliate_url, link_type = self.extract_affiliate_link(post_url)
+                                affiliate_url, link_type = self.extract_link_with_fallback(post_url)
                                 
                                 # If no link found, try title mapping as fallback
                                 if not affiliate_url:
@@ -706,12 +624,22 @@ class SimpleScraper:
         
         print(f"\n=== TOTAL: {len(all_deals)} deals from all feeds ===")
         
+        # Verify links and images before saving
+        if os.getenv('LINK_CHECK', '1') != '0':
+            from link_checker import LinkChecker
+            all_deals = LinkChecker().filter_deals(all_deals)
+        if os.getenv('IMAGE_PIPELINE', '1') != '0':
+            from image_pipeline import ImagePipeline
+            all_deals = ImagePipeline().process_deals(all_deals)
+        
         # Save all deals
         self.save_deals(all_deals)
         return all_deals
         
     def scrape_single_feed(self, feed_info, per_feed_limit):
         """Scrape deals from a single RSS feed"""
+        import feedparser
+        
         deals = []
         
         # For SmartCanucks, try WordPress API first
@@ -729,10 +657,10 @@ class SimpleScraper:
                     print(f"Processing: {title[:50]}...")
                     
                     # Create unique ID
-                    deal_id = re.sub(r'[^a-zA-Z0-9]', '', title.lower())[:20]
+                    deal_id = make_deal_id(title, post_url)
                     
                     # Extract actual affiliate link from post
-                    affiliate_url, link_type = self.extract_affiliate_link(post_url)
+                    affiliate_url, link_type = self.extract_link_with_fallback(post_url)
                     
                     # If no link found, try title mapping as fallback
                     if not affiliate_url:
@@ -760,7 +688,7 @@ class SimpleScraper:
                     # Generate description
                     description = self.generate_description(title)
                     
-                    # Create and validate deal with Pydantic
+                    # Create and validate deal
                     try:
                         deal_data = {
                             'id': deal_id,
@@ -776,12 +704,11 @@ class SimpleScraper:
                             'dateAdded': datetime.now().strftime('%Y-%m-%d')
                         }
                         
-                        # Validate with Pydantic
-                        validated_deal = Deal(**deal_data)
-                        # Convert to dict and ensure affiliateUrl is string
-                        deal_dict = validated_deal.model_dump()
-                        deal_dict['affiliateUrl'] = str(deal_dict['affiliateUrl'])
-                        deals.append(deal_dict)
+                        # Validate against the deal rules
+                        error = DealRecord.from_dict(deal_data).validation_error()
+                        if error:
+                            raise ValueError(error)
+                        deals.append(deal_data)
                         print(f"Valid deal: {title[:30]}... -> {affiliate_url[:50]}... [{link_type}]")
                         
                     except ValueError as e:
@@ -791,7 +718,7 @@ class SimpleScraper:
         
         if len(deals) < 10:  # Fallback to RSS if REST API failed
             print(f"WordPress scraping got {len(deals)} deals, falling back to RSS...")
-            feed = feedparser.parse(feed_info['url'])
+            feed = feedparser.parse(self.feed_bodies.get(feed_info['url']) or feed_info['url'])
             deals = []
             
             count = 0
@@ -812,10 +739,10 @@ class SimpleScraper:
                     print(f"Processing: {entry.title[:30].encode('ascii', 'replace').decode('ascii')}...")
                 
                 # Create unique ID
-                deal_id = re.sub(r'[^a-zA-Z0-9]', '', entry.title.lower())[:20]
+                deal_id = make_deal_id(entry.title, entry.link)
                 
                 # Extract actual affiliate link from post
-                affiliate_url, link_type = self.extract_affiliate_link(entry.link)
+                affiliate_url, link_type = self.extract_link_with_fallback(entry.link)
                 
                 # If no link found, try title mapping as fallback
                 if not affiliate_url:
@@ -843,7 +770,7 @@ class SimpleScraper:
                 # Generate description
                 description = self.generate_description(entry.title)
                 
-                # Create and validate deal with Pydantic
+                # Create and validate deal
                 try:
                     deal_data = {
                         'id': deal_id,
@@ -859,12 +786,11 @@ class SimpleScraper:
                         'dateAdded': datetime.now().strftime('%Y-%m-%d')
                     }
                     
-                    # Validate with Pydantic
-                    validated_deal = Deal(**deal_data)
-                    # Convert to dict and ensure affiliateUrl is string
-                    deal_dict = validated_deal.model_dump()
-                    deal_dict['affiliateUrl'] = str(deal_dict['affiliateUrl'])
-                    deals.append(deal_dict)
+                    # Validate against the deal rules
+                    error = DealRecord.from_dict(deal_data).validation_error()
+                    if error:
+                        raise ValueError(error)
+                    deals.append(deal_data)
                     print(f"Valid RSS deal: {entry.title[:30]}... -> {affiliate_url[:50]}... [{link_type}]")
                     
                 except ValueError as e:
@@ -884,9 +810,11 @@ class SimpleScraper:
     
     def process_rss_feed(self, feed_url, limit):
         """Process a single RSS feed and return deals"""
+        import feedparser
+        
         deals = []
         try:
-            feed = feedparser.parse(feed_url)
+            feed = feedparser.parse(self.feed_bodies.get(feed_url) or feed_url)
             print(f"Processing RSS feed: {feed.feed.get('title', 'Unknown')}")
             
             count = 0
@@ -898,12 +826,10 @@ class SimpleScraper:
                 print(f"Processing RSS: {title[:50]}...")
                 
                 # Create unique ID
-                deal_id = re.sub(r'[^a-zA-Z0-9]', '', title.lower())[:20]
-                if len(deal_id) < 5:
-                    deal_id = f"deal_{hash(title) % 100000}"
+                deal_id = make_deal_id(title, entry.link)
                 
                 # Try to extract affiliate link
-                affiliate_url, link_type = self.extract_affiliate_link(entry.link)
+                affiliate_url, link_type = self.extract_link_with_fallback(entry.link)
                 
                 # If no direct link, try title mapping
                 if not affiliate_url:
@@ -924,7 +850,7 @@ class SimpleScraper:
                 
                 # Create deal
                 try:
-                    deal = Deal(
+                    deal = DealRecord(
                         id=deal_id,
                         title=title,
                         imageUrl=product_image or f"https://via.placeholder.com/200x200?text={title.split()[0]}",
@@ -937,8 +863,10 @@ class SimpleScraper:
                         featured=False,
                         dateAdded=datetime.now().isoformat()
                     )
-                    
-                    deals.append(deal.model_dump())
+                    error = deal.validation_error()
+                    if error:
+                        raise ValueError(error)
+                    deals.append(deal.to_dict())
                     print(f"Valid RSS deal: {title[:30]}... -> {affiliate_url[:50]}... [{link_type}]")
                     
                 except ValueError as e:
@@ -954,37 +882,41 @@ class SimpleScraper:
         return deals
         
     def save_deals(self, deals):
-        """Save deals to JSON file, appending to existing deals"""
+        """Merge deals into the deal store and export deals.json"""
         output_path = '../public/deals.json'
-        existing_deals = []
         
-        # Load existing deals if file exists
-        try:
-            with open(output_path, 'r') as f:
-                existing_deals = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            existing_deals = []
-        
-        # Get existing deal IDs to avoid duplicates
-        existing_ids = {deal.get('id') for deal in existing_deals}
-        
-        # Add new deals that don't already exist
-        new_deals_count = 0
-        for deal in deals:
-            if deal.get('id') not in existing_ids:
-                existing_deals.append(deal)
-                new_deals_count += 1
-        
-        # Write combined deals back to file
-        with open(output_path, 'w') as f:
-            json.dump(existing_deals, f, indent=2)
-        
-        print(f"Added {new_deals_count} new deals ({len(existing_deals)} total) in {output_path}")
-        return existing_deals
+        # Collection rules (unique IDs, size cap) checked over the whole batch in one call
+        records, errors = validate_deals(deals)
+        for deal_id, error in errors:
+            print(f"Dropped deal {deal_id}: {error}")
+        deals = [record.to_dict() for record in records]
+        
+        with DealStore() as store:
+            # Seed the store from the existing file on first use
+            store.import_json(output_path, 'deals.json')
+            
+            # Upsert only touches new or changed rows instead of rewriting history
+            new_deals_count, updated_count, _ = store.upsert_deals(deals, 'deals.json')
+            all_deals = RetentionPolicy.from_env().compact(store, 'deals.json', output_path)
+        
+        print(f"Added {new_deals_count} new deals, updated {updated_count} ({len(all_deals)} total) in {output_path}")
+        return all_deals
 
 def main():
+    # Cheap conditional check first: exit before importing anything heavy if no feed changed
+    feed_state = FeedState()
+    feed_bodies, changed = feed_state.fetch_all([feed['url'] for feed in RSS_FEEDS])
+    if not changed and os.getenv('FORCE_RUN', '0') != '1':
+        print("No feed changes since last run - nothing to do")
+        return
+    
     scraper = SimpleScraper()
-    scraper.parse_rss_and_generate_json()
+    scraper.feed_bodies = feed_bodies
+    try:
+        scraper.parse_rss_and_generate_json()
+        feed_state.commit()
+    finally:
+        scraper.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
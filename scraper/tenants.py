@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Tenant profiles: several sites with their own affiliate tag and merchant
+overrides published from one crawl
+
+The crawl runs once for the default tenant (AFFILIATE_TAG, the built-in
+overrides, ../public). Every other tenant in TENANTS_FILE gets the same deals
+with only their links rewritten, written to its own public directory with its
+own version.json and deltas, so an extra site costs a pass over the exported
+deals rather than another crawl. The thumbnails and placeholders the deals
+reference by site path are hardlinked (or copied) from ../public, so every
+site serves its own.
+
+tenants.json:
+
+    [{"name": "maplesaver", "affiliate_tag": "maplesaver-20",
+      "public_dir": "../sites/maplesaver/public",
+      "overrides": {"walmart": "https://shopstyle.it/l/abc12"}}]
+
+Merchants a tenant has no override for link to the merchant's homepage.
+Run `python tenants.py` to rebuild every tenant from the deal store, e.g.
+after adding one.
+"""
+
+import json
+import os
+import shutil
+
+from url_canon import retag_url
+
+TENANTS_FILE = os.getenv('TENANTS_FILE', 'tenants.json')
+
+# merchant -> (title keywords, homepage), in match order. Matching is the same for
+# every tenant so the crawl's decisions don't depend on which tenant it runs for.
+MERCHANTS = {
+    'walmart': (('walmart',), 'https://www.walmart.ca/'),
+    'lululemon': (('lululemon', 'lulu'), 'https://shop.lululemon.com/'),
+    'gap': (('gap',), 'https://www.gap.ca/'),
+    'roxy': (('roxy',), 'https://www.roxy.com/'),
+    'best buy': (('best buy', 'bestbuy'), 'https://www.bestbuy.ca/'),
+    'bass pro': (('cabela', 'bass pro'), 'https://www.basspro.ca/'),
+}
+
+DEFAULT_OVERRIDES = {
+    'walmart': 'https://shopstyle.it/l/cuge4',
+    'lululemon': 'https://shopstyle.it/l/cj22Z',
+    'gap': 'https://shopstyle.it/l/cj24C',
+    'roxy': 'https://shopstyle.it/l/cug5r',
+    'best buy': 'https://bestbuy.ca/?tag=promopenguin-20',
+    'bass pro': 'https://www.basspro.ca/home?utm_source=RAN&utm_medium=affiliate&utm_content=Living+off+the+GRID+in+Canada&ranMID=50435&ranEAID=sUVpAjRtGL4&ranSiteID=sUVpAjRtGL4-Ycc1ydj30YCWas34PH9jlg',
+}
+
+
+class Tenant:
+    def __init__(self, name, affiliate_tag, overrides=None, public_dir='../public'):
+        self.name = name
+        self.affiliate_tag = affiliate_tag
+        self.overrides = dict(overrides or {})
+        self.public_dir = public_dir
+        for merchant in self.overrides:
+            if merchant not in MERCHANTS:
+                print(f"[{name}] Ignoring override for unknown merchant: {merchant}")
+
+    def link(self, merchant):
+        """This tenant's link for a merchant: its override, else the homepage"""
+        return self.overrides.get(merchant) or MERCHANTS[merchant][1]
+
+    def override(self, title):
+        """(merchant, link) for the first merchant named in the title, or None"""
+        title_lower = title.lower()
+        for merchant, (keywords, _) in MERCHANTS.items():
+            if any(word in title_lower for word in keywords):
+                return merchant, self.link(merchant)
+        return None
+
+    def rewrite(self, deals, base):
+        """Copies of deals made for the base tenant with this tenant's links"""
+        merchants = {base.link(merchant): merchant for merchant in MERCHANTS}
+        rewritten = []
+        for deal in deals:
+            url = deal['affiliateUrl']
+            merchant = merchants.get(url)
+            new_url = self.link(merchant) if merchant else retag_url(url, self.affiliate_tag)
+            rewritten.append(dict(deal, affiliateUrl=new_url) if new_url != url else deal)
+        return rewritten
+
+    def copy_assets(self, deals, base):
+        """Link the site-relative images deals reference from base's public directory
+        into this tenant's; returns the number of files added"""
+        from image_pipeline import image_urls
+        added = 0
+        for deal in deals:
+            for url in image_urls(deal):
+                if not url.startswith('/') or url.startswith('//'):
+                    continue
+                relative = os.path.normpath(url.split('?', 1)[0].lstrip('/'))
+                if relative.startswith('..'):
+                    continue
+                target = os.path.join(self.public_dir, relative)
+                source = os.path.join(base.public_dir, relative)
+                if os.path.exists(target) or not os.path.isfile(source):
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                try:
+                    os.link(source, target)
+                except OSError:
+                    # Another filesystem (or a link already made by a concurrent export)
+                    shutil.copy2(source, target)
+                added += 1
+        if added:
+            print(f"[{self.name}] Linked {added} images from {base.public_dir}")
+        return added
+
+    def export(self, output, deals, base):
+        from deal_store import export_deals
+        deals = self.rewrite(deals, base)
+        # Images first, so the published file never references one the site lacks
+        self.copy_assets(deals, base)
+        path = os.path.join(self.public_dir, output)
+        return export_deals(path, output, deals)
+
+
+def default_tenant():
+    """The tenant the crawl runs for"""
+    return Tenant('default', os.getenv('AFFILIATE_TAG', 'promopenguin-20'), DEFAULT_OVERRIDES)
+
+
+_extra_tenants = None
+
+
+def extra_tenants():
+    """Tenants from TENANTS_FILE (none if it doesn't exist), loaded once"""
+    global _extra_tenants
+    if _extra_tenants is None:
+        try:
+            with open(TENANTS_FILE, 'r', encoding='utf-8') as f:
+                profiles = json.load(f)
+        except FileNotFoundError:
+            profiles = []
+        _extra_tenants = [
+            Tenant(profile['name'], profile['affiliate_tag'], profile.get('overrides'),
+                   profile.get('public_dir') or f"../sites/{profile['name']}/public")
+            for profile in profiles
+        ]
+    return _extra_tenants
+
+
+def publish_tenants(output, deals):
+    """Write every extra tenant's copy of an output's exported deals"""
+    tenants = extra_tenants()
+    if not tenants:
+        return
+    base = default_tenant()
+    for tenant in tenants:
+        tenant.export(output, deals, base)
+
+
+def main():
+    from deal_store import DealStore
+
+    if not extra_tenants():
+        print(f"No tenants in {TENANTS_FILE}")
+        return
+    with DealStore() as store:
+        for output in ('deals.json', 'additional_deals.json'):
+            deals = store.load_deals(output)
+            if deals:
+                publish_tenants(output, deals)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Shared fixtures: the scraper modules on sys.path, a scratch working directory
+for the relative state/ and ../public paths, and a local HTTP server
+
+Run from scraper/: python -m pytest -q
+"""
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+SCRAPER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(SCRAPER_DIR, 'fixtures')
+sys.path.insert(0, SCRAPER_DIR)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """tmp/scraper as the working directory, so state/ and ../public land under tmp"""
+    scraper = tmp_path / 'scraper'
+    (tmp_path / 'public').mkdir()
+    scraper.mkdir()
+    monkeypatch.chdir(scraper)
+    return scraper
+
+
+class LocalServer:
+    """Serves routes[path] = (status, body, headers) and records every request
+
+    A route may also be a callable taking the handler and returning that tuple.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def respond(self, send_body):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.body = self.rfile.read(length) if length else b''
+                server.requests.append((self.command, self.path, dict(self.headers)))
+                route = server.routes.get(self.path.split('?', 1)[0], (404, b'', {}))
+                status, body, headers = route(self) if callable(route) else route
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def do_HEAD(self):
+                self.respond(False)
+
+            def do_GET(self):
+                self.respond(True)
+
+            def do_POST(self):
+                self.respond(True)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def http_server(monkeypatch):
+    # Never send the local requests through a proxy from the environment
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1,localhost')
+    server = LocalServer()
+    yield server
+    server.close()
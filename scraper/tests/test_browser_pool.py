@@ -0,0 +1,65 @@
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from browser_pool import BrowserPool
+
+from conftest import FIXTURES_DIR
+
+EXPECTED = {
+    'https://www.example.com/static-deal',
+    'https://www.amazon.ca/dp/B000000000',
+    'https://www.example.com/onclick-deal',
+}
+
+
+@pytest.fixture
+def fixture_url(monkeypatch):
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1,localhost')
+
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(Handler, directory=FIXTURES_DIR))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/js_links.html'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def pool():
+    pool = BrowserPool(max_pages=2)
+    try:
+        pool.start()
+    except Exception as e:
+        pytest.skip(f'needs Playwright and Chromium (playwright install chromium): {e}')
+    yield pool
+    pool.close()
+
+
+def test_finds_scripted_links(pool, fixture_url):
+    assert {link['url'] for link in pool.extract_links(fixture_url)} >= EXPECTED
+
+
+def test_warm_pool_pages_match(pool, fixture_url):
+    results = pool.extract_links_many([f'{fixture_url}?page={i}' for i in range(4)])
+    for links in results.values():
+        assert {link['url'] for link in links} >= EXPECTED
+
+
+def test_failed_launch_leaves_nothing_running(monkeypatch):
+    pool = BrowserPool()
+
+    async def broken_launch():
+        raise RuntimeError('no browser')
+
+    monkeypatch.setattr(pool, '_launch', broken_launch)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            pool.start()
+        assert pool._loop is None
+    pool.close()
@@ -0,0 +1,47 @@
+import pytest
+
+from deal_record import DealRecord, validate_deals
+
+VALID = {'id': 'a1', 'title': 'Walmart TV half price', 'price': 50.0, 'originalPrice': 100.0,
+         'discountPercent': 50, 'description': 'A big TV for less money', 'category': 'General',
+         'affiliateUrl': 'https://www.walmart.ca/', 'dateAdded': '2026-01-01'}
+
+
+def error(**fields):
+    return DealRecord(**dict(VALID, **fields)).validation_error()
+
+
+@pytest.mark.parametrize('title', ['Greatest deals of the week', 'Contest: win a TV', 'Errorless printing paper'])
+def test_suspicious_words_match_whole_words_only(title):
+    assert error(title=title) is None
+
+
+@pytest.mark.parametrize('title', ['Test deal', 'Debug build sale', 'Checkout FAILED', 'Error 404 page'])
+def test_suspicious_titles_rejected(title):
+    assert error(title=title) == 'title contains suspicious content'
+
+
+def test_links_back_to_the_source_rejected():
+    assert error(affiliateUrl='https://www.smartcanucks.ca/') == 'affiliateUrl cannot link back to SmartCanucks'
+    assert error(affiliateUrl='/relative') == 'affiliateUrl must be an http(s) URL'
+
+
+def test_price_rules():
+    assert error(discountPercent=30) == 'discountPercent 30% does not match calculated discount 50%'
+    assert error(originalPrice=40.0) == 'originalPrice must be higher than price'
+    no_price = dict(VALID, price=None, originalPrice=None, discountPercent=0)
+    assert DealRecord(**no_price).validation_error(require_price=False) is None
+    assert DealRecord(**no_price).validation_error() == 'price must be between 0 and 10000'
+
+
+def test_validate_deals_drops_invalid_duplicates_and_overflow():
+    deals = [VALID, dict(VALID, title='Test'), VALID, dict(VALID, id='a2'), dict(VALID, id='a3')]
+    valid, errors = validate_deals(deals, max_deals=2)
+    assert [record.id for record in valid] == ['a1', 'a2']
+    assert [reason for _, reason in errors] == ['title must be 5-200 characters', 'duplicate id',
+                                               'more than 2 deals']
+
+
+def test_round_trip_keeps_unknown_fields():
+    data = dict(VALID, imageUrl='/x.webp', featured=True, extraField=1)
+    assert DealRecord.from_dict(data).to_dict() == dict(data)
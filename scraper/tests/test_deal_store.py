@@ -0,0 +1,73 @@
+from deal_store import DealStore, legacy_deal_id, make_deal_id
+
+
+def deal(title, deal_id=None, **fields):
+    return dict({'id': deal_id or make_deal_id(title), 'title': title, 'category': 'General',
+                 'dateAdded': '2026-01-01', 'imageUrl': '/placeholder-deal.svg',
+                 'affiliateUrl': 'https://www.walmart.ca/'}, **fields)
+
+
+def test_make_deal_id_ignores_case_and_spacing():
+    assert make_deal_id('Big  Sale', 'https://a.com/1') == make_deal_id('big sale ', 'https://a.com/1')
+    assert make_deal_id('Big Sale', 'https://a.com/1') != make_deal_id('Big Sale', 'https://a.com/2')
+    assert len(make_deal_id('anything')) == 20
+
+
+def test_upsert_counts_and_keeps_first_date(tmp_path):
+    with DealStore(str(tmp_path / 'deals.db')) as store:
+        first = [deal('One deal'), deal('Two deal')]
+        assert store.upsert_deals(first, 'deals.json', now=100) == (2, 0, 0)
+
+        again = [deal('One deal', dateAdded='2026-02-01'), deal('Two deal', description='changed')]
+        assert store.upsert_deals(again, 'deals.json', now=200) == (0, 1, 1)
+
+        stored = {d['title']: d for d in store.load_deals('deals.json')}
+        assert stored['One deal']['dateAdded'] == '2026-01-01'
+        assert stored['Two deal']['description'] == 'changed'
+        assert store.count('deals.json') == 2
+        assert store.count('additional_deals.json') == 0
+
+
+def test_load_order_is_latest_run_then_position(tmp_path):
+    with DealStore(str(tmp_path / 'deals.db')) as store:
+        store.upsert_deals([deal('Old deal')], 'deals.json', now=100)
+        store.upsert_deals([deal('New A'), deal('New B')], 'deals.json', now=200)
+        assert [d['title'] for d in store.load_deals('deals.json')] == ['New A', 'New B', 'Old deal']
+
+
+def test_rekey_moves_imported_deal_to_content_id(tmp_path):
+    title = 'Walmart Screenshot Deal'
+    legacy = deal(title, legacy_deal_id(title), imageUrl='/img/Screenshot-1.png', dateAdded='2025-12-01')
+    with DealStore(str(tmp_path / 'deals.db')) as store:
+        store.upsert_deals([legacy], 'deals.json', now=100)
+        scraped = deal(title, make_deal_id(title, 'https://a.com/post'), dateAdded='2026-01-05')
+
+        assert store.rekey([scraped]) == {legacy['id']: scraped['id']}
+        assert store.rekey([scraped]) == {}
+        # The screenshot is found under the new ID, so save_deals can restore it
+        assert store.image_map('deals.json') == {scraped['id']: '/img/Screenshot-1.png'}
+        store.upsert_deals([scraped], 'deals.json', now=200)
+
+        assert store.count() == 1
+        [stored] = store.load_deals('deals.json')
+        assert stored['id'] == scraped['id']
+        assert stored['dateAdded'] == '2025-12-01'
+
+
+def test_rekey_leaves_both_rows_when_new_id_exists(tmp_path):
+    title = 'Walmart Twice Deal'
+    legacy = deal(title, legacy_deal_id(title))
+    current = deal(title, make_deal_id(title, 'https://a.com/post'))
+    with DealStore(str(tmp_path / 'deals.db')) as store:
+        store.upsert_deals([legacy, current], 'deals.json')
+        assert store.rekey([current]) == {}
+        assert store.count() == 2
+
+
+def test_import_json_seeds_once_without_duplicates(tmp_path):
+    path = tmp_path / 'deals.json'
+    path.write_text('[{"id": "a", "title": "Deal A"}, {"id": "a", "title": "Deal A again"}, {"title": "no id"}]')
+    with DealStore(str(tmp_path / 'deals.db')) as store:
+        assert store.import_json(str(path), 'deals.json') == 1
+        assert store.import_json(str(path), 'deals.json') == 0
+        assert store.load_deals('deals.json')[0]['title'] == 'Deal A'
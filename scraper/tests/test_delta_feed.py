@@ -0,0 +1,81 @@
+import json
+import os
+import random
+
+from deal_store import as_records
+from delta_feed import DeltaFeed, diff_deals, merge_deltas
+
+
+def apply_delta(deals, delta):
+    """What src/utils/dealFeed.ts applyDelta does with a delta"""
+    by_id = {deal['id']: deal for deal in deals}
+    for deal_id in delta['removed']:
+        by_id.pop(deal_id, None)
+    for deal in delta['updated'] + delta['added']:
+        by_id[deal['id']] = deal
+    added = [deal['id'] for deal in delta['added']]
+    order = delta.get('order') or added + [deal['id'] for deal in deals
+                                           if deal['id'] in by_id and deal['id'] not in added]
+    return [by_id[deal_id] for deal_id in order if deal_id in by_id]
+
+
+def mutate(rng, deals, pool):
+    """A random next run: some deals dropped, changed, re-added or new, sometimes reordered"""
+    deals = [deal for deal in deals if rng.random() > 0.2]
+    deals = [dict(deal, price=rng.randint(1, 5)) if rng.random() < 0.3 else deal for deal in deals]
+    present = {deal['id'] for deal in deals}
+    returning = [deal for deal in pool if deal['id'] not in present and rng.random() < 0.15]
+    fresh = [{'id': f'n{rng.random():.12f}', 'title': 'New deal', 'price': 1} for _ in range(rng.randint(0, 3))]
+    deals = fresh + returning + deals
+    pool.extend(fresh)
+    if rng.random() < 0.3:
+        rng.shuffle(deals)
+    return deals
+
+
+def test_diff_applies_exactly():
+    rng = random.Random(1)
+    pool = [{'id': f'd{i}', 'title': f'Deal {i}', 'price': 1} for i in range(10)]
+    previous = list(pool)
+    for _ in range(200):
+        deals = mutate(rng, previous, pool)
+        assert apply_delta(previous, diff_deals(previous, deals)) == deals
+        previous = deals
+
+
+def test_merged_deltas_compose():
+    rng = random.Random(2)
+    for _ in range(300):
+        pool = [{'id': f'd{i}', 'title': f'Deal {i}', 'price': 1} for i in range(8)]
+        versions = [list(pool)]
+        for _ in range(rng.randint(2, 5)):
+            versions.append(mutate(rng, versions[-1], pool))
+
+        # The same folding DeltaFeed.publish does: oldest delta merged with every later step
+        merged = diff_deals(versions[0], versions[1])
+        for before, after in zip(versions[1:], versions[2:]):
+            merged = merge_deltas(merged, diff_deals(before, after), [deal['id'] for deal in after])
+        assert apply_delta(versions[0], merged) == versions[-1]
+
+
+def test_publish_keeps_a_delta_from_every_recent_version(tmp_path):
+    feed = DeltaFeed(str(tmp_path), keep=3)
+    rng = random.Random(3)
+    pool = [{'id': f'd{i}', 'title': f'Deal {i}', 'price': 1} for i in range(6)]
+    history = [[]]
+    for _ in range(5):
+        # Normalized the way export_deals writes them
+        deals = [record.to_dict() for record in as_records(mutate(rng, history[-1] or list(pool), pool))]
+        feed.publish('deals.json', history[-1], deals)
+        history.append(deals)
+
+    with open(tmp_path / 'version.json', encoding='utf-8') as f:
+        current = json.load(f)['deals.json']
+    assert current['version'] == 5
+    assert current['since'] == [2, 3, 4]
+    assert sorted(os.listdir(tmp_path / 'delta' / 'deals')) == ['since-2.json', 'since-3.json', 'since-4.json']
+    for since in current['since']:
+        with open(feed.delta_path('deals.json', since), encoding='utf-8') as f:
+            delta = json.load(f)
+        assert (delta['from'], delta['to']) == (since, 5)
+        assert apply_delta(history[since], delta) == history[5]
@@ -0,0 +1,65 @@
+from link_checker import PLACEHOLDER_IMAGE, LinkChecker
+
+
+def by_method(head, get):
+    """Route answering HEAD and GET with different statuses"""
+    return lambda handler: ((head if handler.command == 'HEAD' else get), b'x', {})
+
+
+def make_checker():
+    return LinkChecker(cache_path='state/link_verdicts.json', max_workers=4, timeout=5)
+
+
+def test_head_ok(workdir, http_server):
+    http_server.routes['/ok'] = (200, b'', {})
+    assert make_checker().check_url(http_server.url + '/ok') == (True, 200)
+    assert [method for method, _, _ in http_server.requests] == ['HEAD']
+
+
+def test_rejected_head_falls_back_to_range_get(workdir, http_server):
+    for path, status in (('/405', 405), ('/403', 403), ('/501', 501)):
+        http_server.routes[path] = by_method(status, 206)
+        assert make_checker().check_url(http_server.url + path) == (True, 206)
+    gets = [headers for method, _, headers in http_server.requests if method == 'GET']
+    assert len(gets) == 3
+    assert all(headers.get('Range') == 'bytes=0-0' for headers in gets)
+
+
+def test_range_get_still_dead(workdir, http_server):
+    http_server.routes['/gone'] = by_method(405, 404)
+    assert make_checker().check_url(http_server.url + '/gone') == (False, 404)
+
+
+def test_rate_limits_and_server_errors_are_not_verdicts(workdir, http_server):
+    http_server.routes['/429'] = (429, b'', {})
+    http_server.routes['/503'] = (503, b'', {})
+    http_server.routes['/404'] = (404, b'', {})
+    urls = [http_server.url + path for path in ('/429', '/503', '/404')]
+
+    checker = make_checker()
+    assert checker.check_urls(urls) == {urls[0]: True, urls[1]: True, urls[2]: False}
+    # Only the real answer is cached; the refused ones are probed again next run
+    assert set(checker.verdicts) == {urls[2]}
+    assert set(make_checker().verdicts) == {urls[2]}
+
+    probes = len(http_server.requests)
+    make_checker().check_urls(urls)
+    assert len(http_server.requests) == probes + 2
+
+
+def test_filter_deals_repairs_links_and_replaces_images(workdir, http_server):
+    http_server.routes['/live'] = (200, b'', {})
+    http_server.routes['/dead'] = (404, b'', {})
+    live, dead = http_server.url + '/live', http_server.url + '/dead'
+    deals = [
+        {'title': 'Repaired deal', 'affiliateUrl': dead, 'imageUrl': dead},
+        {'title': 'Dropped deal', 'affiliateUrl': dead, 'imageUrl': live},
+        {'title': 'Kept deal', 'affiliateUrl': live, 'imageUrl': '/img/local.webp'},
+    ]
+    repair = lambda deal: 'https://www.walmart.ca/' if deal['title'] == 'Repaired deal' else None
+
+    kept = make_checker().filter_deals(deals, repair)
+    assert [deal['title'] for deal in kept] == ['Repaired deal', 'Kept deal']
+    assert kept[0]['affiliateUrl'] == 'https://www.walmart.ca/'
+    assert kept[0]['imageUrl'] == PLACEHOLDER_IMAGE
+    assert kept[1]['imageUrl'] == '/img/local.webp'
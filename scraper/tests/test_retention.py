@@ -0,0 +1,60 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from deal_store import DealStore
+from retention import RetentionPolicy
+
+NOW = time.time()
+
+
+def day(offset):
+    return (datetime.fromtimestamp(NOW) + timedelta(days=offset)).strftime('%Y-%m-%d')
+
+
+def test_age_and_unseen_limits():
+    rows = [
+        ('fresh', 's', 'c', day(0), NOW),
+        ('old', 's', 'c', day(-31), NOW),
+        ('unseen', 's', 'c', day(0), NOW - 15 * 86400),
+    ]
+    assert RetentionPolicy().select_expired(rows, NOW) == {'old': 'age', 'unseen': 'unseen'}
+
+
+def test_caps_keep_the_newest_per_category_and_source():
+    rows = [(f'd{i}', 'a' if i < 4 else 'b', 'x' if i % 2 else 'y', day(0), NOW) for i in range(8)]
+    expired = RetentionPolicy(max_per_category=3, max_per_source=2).select_expired(rows, NOW)
+    assert expired == {'d2': 'source_cap', 'd3': 'source_cap', 'd6': 'source_cap',
+                       'd7': 'source_cap'}
+
+    expired = RetentionPolicy(max_per_category=1, max_per_source=0).select_expired(rows, NOW)
+    assert set(expired) == {f'd{i}' for i in range(2, 8)}
+    assert set(expired.values()) == {'category_cap'}
+
+
+def test_expired_deals_count_against_no_cap():
+    rows = [('old', 's', 'c', day(-40), NOW), ('new', 's', 'c', day(0), NOW)]
+    assert RetentionPolicy(max_per_category=1).select_expired(rows, NOW) == {'old': 'age'}
+
+
+def test_zero_disables_a_rule():
+    rows = [('old', 's', 'c', day(-400), NOW - 400 * 86400)]
+    assert RetentionPolicy(max_age_days=0, max_unseen_days=0).select_expired(rows, NOW) == {}
+
+
+def test_compact_archives_expired_and_exports_the_rest(workdir, monkeypatch):
+    monkeypatch.setenv('IMAGE_PIPELINE', '0')
+    deals = [{'id': f'd{i}', 'title': f'Deal number {i}', 'category': 'General', 'source': 'a',
+              'dateAdded': day(-40 if i == 0 else 0)} for i in range(4)]
+    policy = RetentionPolicy(max_per_source=2, archive_dir='../public/archive')
+    with DealStore('state/deals.db') as store:
+        store.upsert_deals(deals, 'deals.json', now=NOW)
+        policy.compact(store, 'deals.json', '../public/deals.json')
+        assert store.count('deals.json') == 2
+
+    with open('../public/deals.json', encoding='utf-8') as f:
+        assert [deal['id'] for deal in json.load(f)] == ['d1', 'd2']
+    [archive] = os.listdir('../public/archive')
+    with open(os.path.join('../public/archive', archive), encoding='utf-8') as f:
+        assert sorted(deal['id'] for deal in json.load(f)) == ['d0', 'd3']
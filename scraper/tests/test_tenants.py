@@ -0,0 +1,65 @@
+import json
+import os
+
+import pytest
+
+import tenants
+from retention import RetentionPolicy
+
+THUMB = '0123456789abcdef-300x200.webp'
+LARGE = '0123456789abcdef-600x400.webp'
+STALE = 'fedcba9876543210-300x200.webp'
+
+
+@pytest.fixture
+def site(workdir, monkeypatch):
+    """../public with thumbnails and one extra tenant"""
+    monkeypatch.setenv('DELTA_FEED', '0')
+    os.makedirs('../public/img')
+    with open('../public/placeholder-deal.svg', 'w') as f:
+        f.write('<svg/>')
+    for name in (THUMB, LARGE, STALE):
+        with open(f'../public/img/{name}', 'wb') as f:
+            f.write(b'image')
+        os.utime(f'../public/img/{name}', (0, 0))
+    with open('tenants.json', 'w') as f:
+        json.dump([{'name': 'maple', 'affiliate_tag': 'maple-20', 'overrides': {'walmart': 'https://w.example/m'}}], f)
+    monkeypatch.setattr(tenants, 'TENANTS_FILE', 'tenants.json')
+    monkeypatch.setattr(tenants, '_extra_tenants', None)
+    return '../sites/maple/public'
+
+
+def deals():
+    return [
+        {'id': 'a', 'title': 'Walmart TV', 'affiliateUrl': tenants.DEFAULT_OVERRIDES['walmart'],
+         'imageUrl': f'/img/{THUMB}', 'imageSrcSet': f'/img/{THUMB} 300w, /img/{LARGE} 600w'},
+        {'id': 'b', 'title': 'Amazon thing', 'affiliateUrl': 'https://www.amazon.ca/dp/B000000000?tag=promopenguin-20',
+         'imageUrl': '/placeholder-deal.svg'},
+        {'id': 'c', 'title': 'Escaping image', 'affiliateUrl': 'https://example.com/', 'imageUrl': '/../../secret'},
+    ]
+
+
+def test_tenant_copy_has_its_links_and_images(site):
+    tenants.publish_tenants('deals.json', deals())
+
+    with open(f'{site}/deals.json', encoding='utf-8') as f:
+        exported = {deal['id']: deal for deal in json.load(f)}
+    assert exported['a']['affiliateUrl'] == 'https://w.example/m'
+    assert exported['b']['affiliateUrl'] == 'https://www.amazon.ca/dp/B000000000?tag=maple-20'
+    assert sorted(os.listdir(f'{site}/img')) == [THUMB, LARGE]
+    assert os.path.exists(f'{site}/placeholder-deal.svg')
+    assert not os.path.exists(os.path.join(site, '..', '..', 'secret'))
+
+
+def test_prune_respects_tenant_references(site):
+    from deal_store import export_deals
+    tenants.publish_tenants('deals.json', deals())
+    # The main site dropped deal a but the tenant copy hasn't been rebuilt yet
+    export_deals('../public/deals.json', 'deals.json', deals()[1:])
+
+    assert RetentionPolicy().prune_images('../public/deals.json') == 1
+    assert sorted(os.listdir('../public/img')) == [THUMB, LARGE]
+
+    tenants.publish_tenants('deals.json', deals()[1:])
+    assert RetentionPolicy().prune_images('../public/deals.json') == 4
+    assert os.listdir('../public/img') == [] and os.listdir(f'{site}/img') == []
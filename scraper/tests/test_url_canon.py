@@ -0,0 +1,43 @@
+from url_canon import affiliate_url, canonical_url, retag_url
+
+
+def test_tracking_params_and_fragment_dropped_query_sorted():
+    url = 'HTTPS://Shop.Example.com/p?utm_content=a&content_id=5&b=2&fbclid=x&a=1#reviews'
+    assert canonical_url(url) == 'https://shop.example.com/p?a=1&b=2&content_id=5'
+
+
+def test_keys_match_exactly():
+    # content_id and tagline are real parameters even though utm_content and tag are not
+    url = 'https://example.com/p?tagline=x&tag=ours-20&ref_=nav&content_id=5'
+    assert canonical_url(url) == 'https://example.com/p?content_id=5&tagline=x'
+
+
+def test_domain_rules():
+    assert canonical_url('https://www.walmart.ca/ip/123?wmlspartner=x&veh=aff&color=red') == \
+        'https://www.walmart.ca/ip/123?color=red'
+    assert canonical_url('https://www.bestbuy.ca/en-ca/product/1?irgwc=1&icmp=x') == \
+        'https://www.bestbuy.ca/en-ca/product/1'
+    # Rules for a domain don't apply elsewhere
+    assert canonical_url('https://example.com/p?veh=1') == 'https://example.com/p?veh=1'
+
+
+def test_amazon_product_pages_reduced_to_the_asin():
+    url = 'https://WWW.Amazon.ca/Some-Thing/dp/B07XYZ1234/ref=sr_1_1?keywords=x&tag=other-20&psc=1'
+    assert canonical_url(url) == 'https://www.amazon.ca/dp/B07XYZ1234'
+    assert affiliate_url(url, 'ours-20') == 'https://www.amazon.ca/dp/B07XYZ1234?tag=ours-20'
+
+
+def test_affiliate_tag_only_where_the_domain_takes_one():
+    assert affiliate_url('https://www.walmart.ca/ip/1?utm_source=x', 'ours-20') == 'https://www.walmart.ca/ip/1'
+    assert affiliate_url('https://www.amazon.ca/s?k=tv&tag=other-20', 'ours-20') == \
+        'https://www.amazon.ca/s?k=tv&tag=ours-20'
+
+
+def test_retag_leaves_other_domains_untouched():
+    url = 'https://shopstyle.it/l/cuge4?utm_source=x#top'
+    assert retag_url(url, 'ours-20') == url
+    assert retag_url('https://amazon.ca/?tag=promopenguin-20', 'ours-20') == 'https://amazon.ca/?tag=ours-20'
+
+
+def test_non_urls_pass_through():
+    assert canonical_url('not a url') == 'not a url'
@@ -0,0 +1,108 @@
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from websub import LocalHub, WebSubSubscriber, discover_hub, signature, signature_valid
+
+FEED = b"""<?xml version="1.0"?>
+<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>
+<atom:link rel="hub" href="https://hub.example.com/" />
+<atom:link href="https://example.com/feed/" rel="self" type="application/rss+xml" />
+<item><title>Deal</title><link>https://example.com/deal</link></item>
+</channel></rss>"""
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.02)
+
+
+def test_discover_hub():
+    assert discover_hub(FEED) == ('https://hub.example.com/', 'https://example.com/feed/')
+    assert discover_hub('<rss><channel></channel></rss>') == (None, None)
+
+
+def test_signature_checks():
+    body = b'<rss/>'
+    assert signature_valid('secret', body, signature('secret', body))
+    assert signature_valid('secret', body, signature('secret', body, 'sha1'))
+    assert not signature_valid('other', body, signature('secret', body))
+    assert not signature_valid('secret', body + b' ', signature('secret', body))
+    assert not signature_valid('secret', body, signature('secret', body, 'md5'))
+    assert not signature_valid('secret', body, None)
+    assert not signature_valid('secret', body, 'sha256=')
+
+
+def test_receive_only_accepts_signed_pushes_for_active_leases(tmp_path):
+    subscriber = WebSubSubscriber('http://localhost:8090', path=str(tmp_path / 'websub.json'))
+    token = subscriber.token('https://example.com/feed/')
+    subscriber.subscriptions[token] = {
+        'feed': 'https://example.com/feed/', 'hub': 'https://hub.example.com/', 'topic': 'https://example.com/feed/',
+        'secret': 'secret', 'mode': 'subscribe', 'state': 'active', 'lease_until': time.time() + 60,
+    }
+    assert subscriber.receive(token, FEED, signature('wrong', FEED)) is None
+    assert subscriber.receive('unknown', FEED, signature('secret', FEED)) is None
+    assert subscriber.receive(token, FEED, signature('secret', FEED)) == 'https://example.com/feed/'
+    assert subscriber.drain() == {'https://example.com/feed/': FEED}
+    assert subscriber.drain() == {}
+
+    subscriber.subscriptions[token]['lease_until'] = time.time() - 1
+    assert subscriber.receive(token, FEED, signature('secret', FEED)) is None
+
+
+def test_verify_refuses_wrong_topic_or_mode(tmp_path):
+    subscriber = WebSubSubscriber('http://localhost:8090', path=str(tmp_path / 'websub.json'))
+    token = subscriber.token('https://example.com/feed/')
+    subscriber.subscriptions[token] = {
+        'feed': 'https://example.com/feed/', 'hub': 'https://hub.example.com/', 'topic': 'https://example.com/feed/',
+        'secret': 'secret', 'mode': 'subscribe', 'state': 'pending', 'lease_until': 0,
+    }
+    query = {'hub.mode': 'subscribe', 'hub.topic': 'https://example.com/feed/', 'hub.challenge': 'c1',
+             'hub.lease_seconds': '600'}
+    assert subscriber.verify(token, dict(query, **{'hub.topic': 'https://evil.example.com/'})) is None
+    assert subscriber.verify(token, dict(query, **{'hub.mode': 'unsubscribe'})) is None
+    assert not subscriber.active('https://example.com/feed/')
+    assert subscriber.verify(token, query) == 'c1'
+    assert subscriber.active('https://example.com/feed/')
+
+
+@pytest.fixture
+def hub():
+    hub = LocalHub()
+    server = hub.serve(0, '127.0.0.1')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    hub.url = f'http://127.0.0.1:{server.server_address[1]}/'
+    yield hub
+    server.shutdown()
+    server.server_close()
+
+
+def test_subscribe_verify_and_push_through_local_hub(tmp_path, http_server, hub):
+    http_server.routes['/feed/'] = (200, FEED, {'Content-Type': 'application/rss+xml'})
+    feed_url = http_server.url + '/feed/'
+    subscriber = WebSubSubscriber(path=str(tmp_path / 'websub.json'), lease_seconds=600)
+    server = subscriber.serve(0, '127.0.0.1')
+    try:
+        subscriber.callback_url = f'http://127.0.0.1:{server.server_address[1]}'
+        assert subscriber.subscribe(feed_url, hub.url, feed_url) == 202
+        wait_for(lambda: subscriber.active(feed_url))
+
+        hub.publish(feed_url)
+        wait_for(lambda: subscriber.pushed)
+        assert subscriber.drain() == {feed_url: FEED}
+
+        # A push signed with someone else's secret is acknowledged but ignored
+        callback = f'{subscriber.callback_url}/websub/{subscriber.token(feed_url)}'
+        forged = urllib.request.Request(callback, data=FEED, method='POST',
+                                        headers={'X-Hub-Signature': signature('forged', FEED)})
+        with urllib.request.urlopen(forged, timeout=5) as response:
+            assert response.status == 202
+        assert subscriber.drain() == {}
+    finally:
+        server.shutdown()
+        server.server_close()
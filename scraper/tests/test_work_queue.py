@@ -0,0 +1,80 @@
+import pytest
+
+from work_queue import WorkQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    with WorkQueue(str(tmp_path / 'queue.db')) as queue:
+        yield queue
+
+
+def enqueue(queue, *priorities):
+    tasks = [('simplified', f'https://a.com/{i}', 'https://a.com/feed', i, priority, {'index': i})
+             for i, priority in enumerate(priorities)]
+    return queue.create_run(tasks)
+
+
+def test_lease_best_first_and_complete(queue):
+    run = enqueue(queue, 0.2, 0.9, 0.5)
+    leased = [queue.lease('w1') for _ in range(3)]
+    assert [payload['index'] for _, _, _, payload in leased] == [1, 2, 0]
+    assert queue.lease('w1') is None
+
+    for task_id, _, _, payload in leased:
+        assert queue.complete(task_id, 'w1', [payload['index']])
+    assert queue.counts(run) == {'done': 3}
+    assert [result for _, _, _, result in queue.tasks(run, 'simplified')] == [[0], [1], [2]]
+
+
+def test_duplicate_keys_enqueued_once(queue):
+    tasks = [('simplified', 'https://a.com/1', 'https://a.com/feed', i, 0.5, {}) for i in range(2)]
+    run = queue.create_run(tasks)
+    assert queue.counts(run) == {'pending': 1}
+
+
+def test_expired_lease_is_fenced_off(queue):
+    enqueue(queue, 0.5)
+    task_id, _, _, _ = queue.lease('w1', visibility=-1)
+    # w1's lease ran out, so w2 gets the task and w1's late result is dropped
+    assert queue.lease('w2')[0] == task_id
+    assert not queue.complete(task_id, 'w1', ['late'])
+    assert queue.complete(task_id, 'w2', ['ok'])
+    assert not queue.complete(task_id, 'w2', ['again'])
+
+
+def test_live_lease_is_not_handed_out(queue):
+    enqueue(queue, 0.5)
+    assert queue.lease('w1', visibility=60)
+    assert queue.lease('w2') is None
+
+
+def test_lease_expiring_every_attempt_fails_the_task(queue):
+    run = enqueue(queue, 0.5)
+    for attempt in range(3):
+        assert queue.lease(f'w{attempt}', visibility=-1, max_attempts=3)
+    assert queue.lease('w3', max_attempts=3) is None
+    assert queue.counts(run) == {'failed': 1}
+
+
+def test_fail_retries_until_max_attempts(queue):
+    run = enqueue(queue, 0.5)
+    task_id = queue.lease('w1', max_attempts=2)[0]
+    queue.fail(task_id, 'w1', ValueError('boom'), max_attempts=2)
+    assert queue.counts(run) == {'pending': 1}
+
+    task_id = queue.lease('w2', max_attempts=2)[0]
+    # Only the lease holder can release a task
+    queue.fail(task_id, 'w1', ValueError('not mine'), max_attempts=2)
+    assert queue.counts(run) == {'leased': 1}
+    queue.fail(task_id, 'w2', ValueError('boom'), max_attempts=2)
+    assert queue.counts(run) == {'failed': 1}
+
+
+def test_finish_run(queue):
+    first = enqueue(queue, 0.5)
+    enqueue(queue, 0.5)
+    assert queue.oldest_open_run() == first
+    queue.finish_run(first)
+    assert queue.counts(first) == {}
+    assert queue.oldest_open_run() != first
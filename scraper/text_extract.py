@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Precompiled text extraction for post descriptions and titles
+
+Text is consumed node by node in document order and extraction stops as soon as
+enough clean text has been collected, so long posts cost no more than short ones.
+"""
+
+import re
+
+# Ashly Fraser's standard intro, in order of preference; the description starts after it
+INTRO_RE = re.compile(
+    r"(If you're not sure whether to buy, add to cart, and you can come back to it later!\*\*)"
+    r"|(add to cart, and you can come back to it later!)"
+    r"|(read some of the reviews and see people thought of the product)",
+    re.IGNORECASE,
+)
+# Links and social call-outs that never belong in a description
+NOISE_RE = re.compile(
+    r'https?://\S+|www\.\S+|(?:facebook|twitter|instagram|youtube|tiktok)\.com\S*'
+    r'|(?:Follow us on|Like us on|Subscribe)[^\n]*',
+    re.IGNORECASE,
+)
+SELLS_ON_AMAZON_RE = re.compile(r'^(.*?)(?:\s+sells on Amazon|$)', re.IGNORECASE)
+BYLINE_RE = re.compile(r'^.*?\d{4}\s+\d+\s+')
+WHITESPACE_RE = re.compile(r'\s+')
+
+TITLE_PRICE_RE = re.compile(r'\$\d+(?:\.\d{2})?(?:\s*(?:off|sale|deal|save))?', re.IGNORECASE)
+TITLE_PREFIX_RE = re.compile(r'^(?:deal|sale|save|hot)\s*:?\s*', re.IGNORECASE)
+
+# Longer than any intro marker, so one split across text nodes is still found
+MARKER_SPAN = 100
+# How far past the first marker a preferred one from the same intro can still turn up
+INTRO_SLACK = 500
+MIN_DESCRIPTION = 50
+
+
+def clean_deal_title(title):
+    """Title without prices and "Deal:"-style prefixes"""
+    return TITLE_PREFIX_RE.sub('', TITLE_PRICE_RE.sub('', title)).strip()
+
+
+def find_intro_end(text):
+    """Offset just past the preferred intro marker in text, or 0"""
+    best = None
+    for match in INTRO_RE.finditer(text):
+        if best is None or match.lastindex < best.lastindex:
+            best = match
+            if best.lastindex == 1:
+                break
+    return best.end() if best else 0
+
+
+def extract_description(chunks, limit=300):
+    """Description text after the intro from an iterable of text nodes in document order
+
+    The post is read until its first intro marker, however far in (plus a little
+    further for a preferred marker), and from there only until there is enough
+    text for the description.
+    """
+    head_text = ''
+    searched = 0
+    settle_at = None
+    intro_end = None
+    tail = []
+    clean_length = 0
+
+    for chunk in chunks:
+        if intro_end is None:
+            head_text += chunk
+            if settle_at is None:
+                match = INTRO_RE.search(head_text, max(0, searched - MARKER_SPAN))
+                searched = len(head_text)
+                if match:
+                    settle_at = match.end() + INTRO_SLACK
+            if settle_at is None or len(head_text) < settle_at:
+                continue
+            intro_end = find_intro_end(head_text)
+            chunk = head_text[intro_end:]
+        tail.append(chunk)
+        clean_length += len(NOISE_RE.sub('', chunk).strip())
+        if clean_length > limit + MIN_DESCRIPTION:
+            # Enough text to fill the description; the rest of the post is never read
+            break
+
+    if intro_end is None:
+        content = head_text[find_intro_end(head_text):]
+    else:
+        content = ''.join(tail)
+    content = NOISE_RE.sub('', content).strip()
+
+    if len(content) < MIN_DESCRIPTION:
+        # Not much after the intro; use the opening line (before "sells on Amazon") instead
+        match = SELLS_ON_AMAZON_RE.match(head_text)
+        if match:
+            content = BYLINE_RE.sub('', match.group(1).strip()).strip()
+
+    content = WHITESPACE_RE.sub(' ', content).strip()
+    return content[:limit] + ('...' if len(content) > limit else '')
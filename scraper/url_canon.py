@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+One URL canonicalization and affiliate-rewriting engine for every scraper
+
+Rules are table-driven per domain and query keys are matched exactly, so a
+legitimate key like content_id survives while utm_content does not. Results are
+memoized; canonical_url() output doubles as the cache and dedupe key.
+"""
+
+from amazon import parse_asin, product_url
+
+# Query keys dropped on every domain
+STRIP_KEYS = frozenset(key.lower() for key in [
+    'tag', 'ref', 'ref_', 'aff', 'aff_id', 'affid', 'affiliate', 'affiliate_id', 'referrer', 'source',
+    'clickid', 'click_id', 'irclickid', 'cjevent', 'partner', 'promo_id', 'tracking',
+    'fbclid', 'gclid', 'msclkid', 'mc_cid', 'mc_eid', 'ranMID', 'ranEAID', 'ranSiteID',
+])
+STRIP_PREFIXES = ('utm_',)
+
+
+def amazon_product(url, tag):
+    parsed = parse_asin(url)
+    return product_url(*parsed, tag) if parsed else None
+
+
+AMAZON_RULE = {
+    'strip': {'ascsubtag', 'linkcode', 'linkid', 'camp', 'creative', 'creativeasin', 'psc', 'th', 'smid', 'sr', 'qid', 'crid', 'sprefix', 'keywords_ref'},
+    'strip_prefixes': ('pf_rd_', 'pd_rd_'),
+    'affiliate_param': 'tag',
+    'product': amazon_product,
+}
+
+# Host (or registrable suffix) -> rule. 'strip' keys are lowercase; 'affiliate_param'
+# is where our tag goes; 'product' maps a product page to its minimal (tagged) form.
+DOMAIN_RULES = {
+    'amazon.ca': AMAZON_RULE,
+    'amazon.com': AMAZON_RULE,
+    'amazon.co.uk': AMAZON_RULE,
+    'walmart.ca': {'strip': {'wmlspartner', 'sourceid', 'veh', 'affillinktype', 'affiliates_ad_id', 'campaign_id'}},
+    'walmart.com': {'strip': {'wmlspartner', 'sourceid', 'veh', 'affillinktype', 'affiliates_ad_id', 'campaign_id'}},
+    'bestbuy.ca': {'strip': {'irgwc', 'icmp', 'loc'}},
+    'ebay.ca': {'strip': {'mkevt', 'mkcid', 'mkrid', 'campid', 'toolid', 'customid'}},
+    'ebay.com': {'strip': {'mkevt', 'mkcid', 'mkrid', 'campid', 'toolid', 'customid'}},
+}
+DEFAULT_RULE = {}
+
+# Memo tables are dropped wholesale when they reach this size
+MEMO_LIMIT = 200000
+_canonical_memo = {}
+_affiliate_memo = {}
+
+
+def rule_for(host):
+    """Most specific rule for a host: www.amazon.ca -> amazon.ca -> ca"""
+    while host:
+        rule = DOMAIN_RULES.get(host)
+        if rule is not None:
+            return rule
+        _, _, host = host.partition('.')
+    return DEFAULT_RULE
+
+
+def _rewrite(url, tag=None):
+    """Canonical form of url; with tag, also put our tag where the domain takes one"""
+    url = str(url).strip()
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        return url
+    rest = rest.split('#', 1)[0]
+    location, _, query = rest.partition('?')
+    host, slash, path = location.partition('/')
+    host = host.lower()
+    rule = rule_for(host[4:] if host.startswith('www.') else host)
+
+    if 'product' in rule:
+        product = rule['product'](url, tag)
+        if product:
+            return product
+
+    strip = rule.get('strip', ())
+    prefixes = STRIP_PREFIXES + rule.get('strip_prefixes', ())
+    params = []
+    for pair in query.split('&') if query else ():
+        key = pair.split('=', 1)[0].lower()
+        if pair and key not in STRIP_KEYS and key not in strip and not key.startswith(prefixes):
+            params.append(pair)
+    params.sort()
+    affiliate_param = rule.get('affiliate_param')
+    if tag and affiliate_param:
+        params.append(f'{affiliate_param}={tag}')
+
+    canonical = f'{scheme.lower()}://{host}{slash}{path}'
+    return f'{canonical}?{"&".join(params)}' if params else canonical
+
+
+def canonical_url(url):
+    """URL without tracking/affiliate params or fragment, host lowercased, query sorted"""
+    result = _canonical_memo.get(url)
+    if result is None:
+        if len(_canonical_memo) >= MEMO_LIMIT:
+            _canonical_memo.clear()
+        result = _canonical_memo[url] = _rewrite(url)
+    return result
+
+
+def affiliate_url(url, tag):
+    """Canonical URL carrying our affiliate tag on domains that take one"""
+    key = (url, tag)
+    result = _affiliate_memo.get(key)
+    if result is None:
+        if len(_affiliate_memo) >= MEMO_LIMIT:
+            _affiliate_memo.clear()
+        result = _affiliate_memo[key] = _rewrite(url, tag)
+    return result
+
+
+def retag_url(url, tag):
+    """url with its affiliate tag swapped for tag on domains that take one, otherwise as is"""
+    host = str(url).partition('://')[2].split('/', 1)[0].split('?', 1)[0].lower()
+    if not rule_for(host[4:] if host.startswith('www.') else host).get('affiliate_param'):
+        return url
+    return affiliate_url(url, tag)
+
+
+def canonical_urls(urls):
+    return [canonical_url(url) for url in urls]
+
+
+def affiliate_urls(urls, tag):
+    return [affiliate_url(url, tag) for url in urls]
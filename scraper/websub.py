@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+WebSub (PubSubHubbub) subscriber so the daemon hears about new posts as they
+are published instead of on its next poll
+
+Feeds that advertise a hub (<atom:link rel="hub">, which WordPress adds) are
+subscribed with a per-feed callback URL and secret. The hub's intent
+verification is answered, signed content pushes are handed to the daemon, and
+leases are renewed before they run out. Polling carries on at the longest
+interval as a safety net.
+
+Enabled by setting WEBSUB_CALLBACK_URL to the public base URL the hub can
+reach (forwarded to WEBSUB_PORT). For local testing run the stand-in hub:
+
+    python websub.py hub --port 8091
+    WEBSUB_HUB=http://localhost:8091/ WEBSUB_CALLBACK_URL=http://localhost:8090 python daemon.py
+
+and publish with: curl -d hub.mode=publish -d hub.url=<feed URL> http://localhost:8091/
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from deal_store import write_json_atomic
+from metrics import metrics
+
+CALLBACK_URL = os.getenv('WEBSUB_CALLBACK_URL', '')
+WEBSUB_PORT = int(os.getenv('WEBSUB_PORT', '8090'))
+# Forces one hub for every feed (e.g. the local stand-in) instead of discovery
+HUB_OVERRIDE = os.getenv('WEBSUB_HUB', '')
+LEASE_SECONDS = int(os.getenv('WEBSUB_LEASE_SECONDS', '864000'))
+# Renew this long before a lease runs out
+RENEW_MARGIN = 3600
+MAX_PUSH_BYTES = 5 * 1024 * 1024
+
+LINK_TAG_RE = re.compile(r'<(?:atom:)?link\b[^>]*>', re.IGNORECASE)
+ATTR_RE = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+
+def discover_hub(body):
+    """(hub, topic) advertised in a feed body; topic is the feed's rel="self" URL"""
+    if isinstance(body, bytes):
+        body = body[:65536].decode('utf-8', 'replace')
+    hub = topic = None
+    for tag in LINK_TAG_RE.findall(body or ''):
+        attrs = {name.lower(): double or single for name, double, single in ATTR_RE.findall(tag)}
+        rels = attrs.get('rel', '').split()
+        if 'hub' in rels and not hub:
+            hub = attrs.get('href')
+        elif 'self' in rels and not topic:
+            topic = attrs.get('href')
+    return hub, topic
+
+
+def signature(secret, body, method='sha256'):
+    return f'{method}=' + hmac.new(secret.encode('utf-8'), body, method).hexdigest()
+
+
+def signature_valid(secret, body, header):
+    """Check an X-Hub-Signature header ('<method>=<hex digest>')"""
+    method, _, _ = (header or '').partition('=')
+    if method not in ('sha1', 'sha256', 'sha384', 'sha512'):
+        return False
+    return hmac.compare_digest(signature(secret, body, method), header)
+
+
+def post_form(url, fields, timeout=15):
+    """POST form fields; returns the status code (or None if the request failed)"""
+    import urllib.error
+    import urllib.request
+
+    request = urllib.request.Request(url, data=urlencode(fields).encode('utf-8'), method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except Exception as e:
+        print(f"WebSub request to {url} failed: {e}")
+        return None
+
+
+class WebSubSubscriber:
+    """Subscriptions per feed, the callback endpoint and a queue of pushed feed bodies"""
+
+    def __init__(self, callback_url=None, path=None, lease_seconds=LEASE_SECONDS):
+        self.callback_url = (callback_url or CALLBACK_URL).rstrip('/')
+        self.path = path or os.getenv('WEBSUB_STATE_PATH', 'state/websub.json')
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self.pushed = {}  # feed_url -> body (None: thin ping, fetch it)
+        self.on_push = None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.subscriptions = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.subscriptions = {}  # token -> {feed, hub, topic, secret, mode, state, lease_until}
+
+    @staticmethod
+    def token(feed_url):
+        return hashlib.sha1(feed_url.encode('utf-8')).hexdigest()[:16]
+
+    def save(self):
+        with self._lock:
+            data = dict(self.subscriptions)
+        write_json_atomic(self.path, data)
+
+    def active(self, feed_url):
+        """Whether a verified lease for the feed is running (also while it's being renewed)"""
+        subscription = self.subscriptions.get(self.token(feed_url))
+        return bool(subscription and subscription.get('lease_until', 0) > time.time())
+
+    def ensure(self, feed_url, body):
+        """Subscribe to a feed's hub if it advertises one"""
+        # Existing subscriptions are renewed or retried by renew_due
+        if self.token(feed_url) in self.subscriptions:
+            return
+        hub, topic = discover_hub(body) if body else (None, None)
+        hub = HUB_OVERRIDE or hub
+        if hub:
+            self.subscribe(feed_url, hub, topic or feed_url)
+
+    def subscribe(self, feed_url, hub, topic, mode='subscribe'):
+        token = self.token(feed_url)
+        with self._lock:
+            previous = self.subscriptions.get(token, {})
+            # Recorded before the request: hubs may verify before they answer it
+            subscription = self.subscriptions[token] = {
+                'feed': feed_url, 'hub': hub, 'topic': topic,
+                'secret': previous.get('secret') or secrets.token_hex(20),
+                'mode': mode, 'state': 'pending', 'requested': time.time(),
+                'lease_until': previous.get('lease_until', 0),
+            }
+        status = post_form(hub, {
+            'hub.mode': mode,
+            'hub.topic': topic,
+            'hub.callback': f'{self.callback_url}/websub/{token}',
+            'hub.lease_seconds': self.lease_seconds,
+            'hub.secret': subscription['secret'],
+        })
+        if status not in (202, 204):
+            print(f"WebSub {mode} for {feed_url} at {hub} refused: {status}")
+            with self._lock:
+                subscription['state'] = 'failed'
+        else:
+            print(f"WebSub {mode} requested for {feed_url} at {hub}")
+        self.save()
+        return status
+
+    def renew_due(self, now=None):
+        """Re-subscribe leases that run out soon and retry stale pending or failed requests"""
+        now = now or time.time()
+        for subscription in list(self.subscriptions.values()):
+            state = subscription['state']
+            if ((state == 'active' and subscription.get('lease_until', 0) - now < RENEW_MARGIN)
+                    or (state in ('pending', 'failed') and now - subscription.get('requested', 0) > RENEW_MARGIN)):
+                self.subscribe(subscription['feed'], subscription['hub'], subscription['topic'])
+
+    def verify(self, token, query):
+        """Answer an intent verification; returns the challenge to echo or None to refuse"""
+        subscription = self.subscriptions.get(token)
+        mode = query.get('hub.mode')
+        if not subscription or query.get('hub.topic') != subscription['topic']:
+            return None
+        if mode == 'denied':
+            print(f"WebSub subscription to {subscription['feed']} denied: {query.get('hub.reason', '')}")
+            with self._lock:
+                subscription['state'] = 'failed'
+            self.save()
+            return ''
+        if mode != subscription['mode'] or 'hub.challenge' not in query:
+            return None
+        with self._lock:
+            if mode == 'subscribe':
+                lease = int(query.get('hub.lease_seconds') or self.lease_seconds)
+                subscription.update(state='active', lease_until=time.time() + lease)
+            else:
+                self.subscriptions.pop(token, None)
+        self.save()
+        print(f"WebSub {mode} verified for {subscription['feed']}")
+        return query['hub.challenge']
+
+    def receive(self, token, body, signature_header):
+        """Accept a content push; returns the feed URL when it's genuine"""
+        subscription = self.subscriptions.get(token)
+        if not subscription or not self.active(subscription['feed']):
+            metrics.inc('scraper_websub_pushes_total', result='unknown')
+            return None
+        # Pushes that don't carry our secret's signature are acknowledged but ignored
+        if not signature_valid(subscription['secret'], body, signature_header):
+            print(f"WebSub push for {subscription['feed']} has a bad signature - ignored")
+            metrics.inc('scraper_websub_pushes_total', result='bad_signature')
+            return None
+        feed_url = subscription['feed']
+        with self._lock:
+            self.pushed[feed_url] = body or None
+        metrics.inc('scraper_websub_pushes_total', result='accepted')
+        print(f"WebSub push for {feed_url} ({len(body)} bytes)")
+        if self.on_push:
+            self.on_push(feed_url)
+        return feed_url
+
+    def drain(self):
+        """Pushed feeds since the last call: {feed_url: body or None}"""
+        with self._lock:
+            pushed, self.pushed = self.pushed, {}
+        return pushed
+
+    def serve(self, port=WEBSUB_PORT, host='0.0.0.0'):
+        """Serve the /websub/<token> callbacks from a background thread; returns the server"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        subscriber = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def token(self):
+                parts = urlsplit(self.path)
+                prefix = '/websub/'
+                return parts.path[len(prefix):] if parts.path.startswith(prefix) else None, parts.query
+
+            def reply(self, status, body=b''):
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                token, query = self.token()
+                query = {key: values[0] for key, values in parse_qs(query).items()}
+                challenge = subscriber.verify(token, query) if token else None
+                if challenge is None:
+                    self.reply(404)
+                else:
+                    self.reply(200, challenge.encode('utf-8'))
+
+            def do_POST(self):
+                token, _ = self.token()
+                length = int(self.headers.get('Content-Length') or 0)
+                if not token or length > MAX_PUSH_BYTES:
+                    self.reply(404 if not token else 413)
+                    return
+                body = self.rfile.read(length)
+                subscriber.receive(token, body, self.headers.get('X-Hub-Signature'))
+                self.reply(202)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='websub', daemon=True).start()
+        print(f"WebSub callbacks at {self.callback_url}/websub/<feed> (listening on {host}:{server.server_address[1]})")
+        return server
+
+
+class LocalHub:
+    """Minimal stand-in hub for testing: verifies subscribers and pushes a topic when it's published"""
+
+    def __init__(self):
+        self.subscribers = {}  # (topic, callback) -> secret
+
+    def verify(self, mode, topic, callback, secret, lease):
+        import urllib.request
+
+        challenge = secrets.token_hex(8)
+        query = urlencode({'hub.mode': mode, 'hub.topic': topic, 'hub.challenge': challenge,
+                           'hub.lease_seconds': lease})
+        try:
+            with urllib.request.urlopen(f"{callback}{'&' if '?' in callback else '?'}{query}", timeout=15) as response:
+                confirmed = response.read().decode('utf-8') == challenge
+        except Exception:
+            confirmed = False
+        print(f"[hub] {mode} {topic} -> {callback}: {'verified' if confirmed else 'not verified'}")
+        if confirmed and mode == 'subscribe':
+            self.subscribers[(topic, callback)] = secret
+        elif confirmed:
+            self.subscribers.pop((topic, callback), None)
+
+    def publish(self, topic):
+        import urllib.request
+
+        with urllib.request.urlopen(topic, timeout=15) as response:
+            body = response.read()
+        for (subscribed, callback), secret in list(self.subscribers.items()):
+            if subscribed != topic:
+                continue
+            headers = {'Content-Type': 'application/rss+xml', 'Link': f'<{topic}>; rel="self"'}
+            if secret:
+                headers['X-Hub-Signature'] = signature(secret, body)
+            request = urllib.request.Request(callback, data=body, headers=headers, method='POST')
+            try:
+                with urllib.request.urlopen(request, timeout=15) as delivered:
+                    print(f"[hub] pushed {len(body)} bytes to {callback}: {delivered.status}")
+            except Exception as e:
+                print(f"[hub] push to {callback} failed: {e}")
+
+    def serve(self, port, host='0.0.0.0'):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+                mode = form.get('hub.mode')
+                if mode in ('subscribe', 'unsubscribe') and form.get('hub.topic') and form.get('hub.callback'):
+                    args = (mode, form['hub.topic'], form['hub.callback'], form.get('hub.secret'),
+                            form.get('hub.lease_seconds') or LEASE_SECONDS)
+                    threading.Thread(target=hub.verify, args=args, daemon=True).start()
+                    status = 202
+                elif mode == 'publish' and form.get('hub.url'):
+                    threading.Thread(target=hub.publish, args=(form['hub.url'],), daemon=True).start()
+                    status = 204
+                else:
+                    status = 400
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        print(f"[hub] Listening on {host}:{server.server_address[1]}")
+        return server
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='WebSub tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+    hub = commands.add_parser('hub', help='run a local stand-in hub')
+    hub.add_argument('--port', type=int, default=8091)
+    commands.add_parser('status', help='list subscriptions')
+    args = parser.parse_args()
+
+    if args.command == 'hub':
+        try:
+            LocalHub().serve(args.port).serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    now = time.time()
+    for subscription in WebSubSubscriber().subscriptions.values():
+        left = max(0, subscription.get('lease_until', 0) - now) / 3600
+        print(f"{subscription['state']:<8} {left:6.1f}h  {subscription['feed']}  via {subscription['hub']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Durable SQLite work queue so feed entries can be worked by several processes or
+containers sharing the state volume
+
+A coordinator enqueues the entries a run would reach as tasks, any number of workers
+lease tasks best-first with a visibility timeout and complete them, and a
+reducer replays the usual selection (priority, quotas, duplicates) over the
+finished results and writes the output files. A worker that dies mid-task only
+loses its lease; the task becomes visible again once the lease expires.
+
+Usage:
+    python work_queue.py enqueue
+    python work_queue.py worker [--id NAME] [--idle-exit SECONDS]
+    python work_queue.py reduce [--wait SECONDS]
+    python work_queue.py status
+
+SQLite WAL needs every process on the same host; run more workers on that host
+(e.g. docker compose --profile queue up --scale queue-worker=4).
+"""
+
+import argparse
+import json
+import os
+import secrets
+import socket
+import sqlite3
+import time
+
+DEFAULT_QUEUE_PATH = os.getenv('WORK_QUEUE_PATH', 'state/work_queue.db')
+VISIBILITY_TIMEOUT = int(os.getenv('WORK_VISIBILITY_TIMEOUT', '300'))
+MAX_ATTEMPTS = int(os.getenv('WORK_MAX_ATTEMPTS', '3'))
+
+# Entry fields the scrapers and the scheduler read
+ENTRY_FIELDS = ('title', 'link', 'published_parsed', 'updated_parsed', 'media_content', 'enclosures', 'links')
+
+
+class WorkQueue:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            id TEXT PRIMARY KEY,
+            created REAL NOT NULL,
+            state TEXT NOT NULL DEFAULT 'open'
+        );
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            run TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            feed_url TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            priority REAL NOT NULL,
+            payload TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            worker TEXT,
+            lease_until REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            UNIQUE(run, kind, key)
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks(state, priority);
+        CREATE INDEX IF NOT EXISTS idx_tasks_run ON tasks(run, kind, state);
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_QUEUE_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit; leases take the write lock up front with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def create_run(self, tasks):
+        """Enqueue (kind, key, feed_url, position, priority, payload) tasks as a new run; returns its id"""
+        # Random suffix, since one process may create several runs within a second
+        run = time.strftime('%Y%m%d-%H%M%S') + f'-{os.getpid()}-{secrets.token_hex(3)}'
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.execute('INSERT INTO runs (id, created) VALUES (?, ?)', (run, time.time()))
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO tasks (run, kind, key, feed_url, position, priority, payload) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(run, kind, key, feed_url, position, priority, json.dumps(payload))
+                 for kind, key, feed_url, position, priority, payload in tasks],
+            )
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return run
+
+    def expire_leases(self, now=None, max_attempts=MAX_ATTEMPTS):
+        """Fail leased tasks whose lease ran out on their last allowed attempt"""
+        self.conn.execute(
+            "UPDATE tasks SET state = 'failed', error = 'lease expired on every attempt', lease_until = NULL "
+            "WHERE state = 'leased' AND lease_until < ? AND attempts >= ?", (now or time.time(), max_attempts)
+        )
+
+    def lease(self, worker, visibility=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        """Claim the best visible task for visibility seconds; returns (id, kind, feed_url, payload) or None
+
+        A task whose lease expired max_attempts times (its worker keeps dying on it)
+        is marked failed instead of being handed out again.
+        """
+        now = time.time()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.expire_leases(now, max_attempts)
+            row = self.conn.execute(
+                "SELECT id, kind, feed_url, payload FROM tasks "
+                "WHERE state = 'pending' OR (state = 'leased' AND lease_until < ? AND attempts < ?) "
+                "ORDER BY priority DESC, id LIMIT 1", (now, max_attempts)
+            ).fetchone()
+            if row:
+                self.conn.execute(
+                    "UPDATE tasks SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                    "WHERE id = ?", (worker, now + visibility, row[0])
+                )
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        if not row:
+            return None
+        return row[0], row[1], row[2], json.loads(row[3])
+
+    def complete(self, task_id, worker, result):
+        """Store a task's result; False if the lease was lost to another worker meanwhile"""
+        cursor = self.conn.execute(
+            "UPDATE tasks SET state = 'done', result = ?, lease_until = NULL "
+            "WHERE id = ? AND worker = ? AND state = 'leased'", (json.dumps(result), task_id, worker)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, task_id, worker, error, max_attempts=MAX_ATTEMPTS):
+        """Release a task for another try, or give up on it after max_attempts"""
+        self.conn.execute(
+            "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ?, lease_until = NULL WHERE id = ? AND worker = ? AND state = 'leased'",
+            (max_attempts, str(error)[:500], task_id, worker)
+        )
+
+    def counts(self, run=None):
+        """{state: tasks} for one run or the whole queue"""
+        if run:
+            rows = self.conn.execute('SELECT state, COUNT(*) FROM tasks WHERE run = ? GROUP BY state', (run,))
+        else:
+            rows = self.conn.execute('SELECT state, COUNT(*) FROM tasks GROUP BY state')
+        return dict(rows.fetchall())
+
+    def oldest_open_run(self):
+        row = self.conn.execute("SELECT id FROM runs WHERE state = 'open' ORDER BY created LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def tasks(self, run, kind):
+        """(feed_url, key, payload, result or None) for a run's tasks of one kind in feed order"""
+        rows = self.conn.execute(
+            'SELECT feed_url, key, payload, result FROM tasks WHERE run = ? AND kind = ? ORDER BY feed_url, position',
+            (run, kind)
+        )
+        return [(feed_url, key, json.loads(payload), json.loads(result) if result else None)
+                for feed_url, key, payload, result in rows]
+
+    def finish_run(self, run):
+        """Mark a run reduced and drop its tasks"""
+        self.conn.execute('BEGIN IMMEDIATE')
+        self.conn.execute("UPDATE runs SET state = 'reduced' WHERE id = ?", (run,))
+        self.conn.execute('DELETE FROM tasks WHERE run = ?', (run,))
+        self.conn.execute('COMMIT')
+
+
+def entry_payload(entry):
+    """JSON-safe copy of the feed entry fields the scrapers use"""
+    return {field: entry[field] for field in ENTRY_FIELDS if entry.get(field)}
+
+
+def entry_from_payload(data):
+    """Feed entry with attribute access, as feedparser returns it"""
+    from feedparser import FeedParserDict
+
+    def convert(value):
+        if isinstance(value, dict):
+            return FeedParserDict({key: convert(item) for key, item in value.items()})
+        if isinstance(value, list):
+            return [convert(item) for item in value]
+        return value
+
+    entry = convert(data)
+    for field in ('published_parsed', 'updated_parsed'):
+        if entry.get(field):
+            entry[field] = time.struct_time(entry[field])
+    return entry
+
+
+def scrapers():
+    import additional_scraper
+    import simple_scraper
+    return {
+        'simplified': (simple_scraper.FEEDS, simple_scraper.SimplifiedScraper),
+        'additional': (additional_scraper.FEED_URLS, additional_scraper.AdditionalScraper),
+    }
+
+
+def entry_key(kind, entry):
+    """The key each scraper's journal and duplicate checks use for an entry"""
+    if kind == 'simplified':
+        return entry.get('link') or entry.get('title')
+    return entry.get('link')
+
+
+def select_entries(kind, feeds, scheduler):
+    """The entries a run would reach, best first: near-duplicates dropped and the
+    scheduler's limit and per-feed quotas applied as if every entry made a deal"""
+    from near_dup import NearDupIndex
+
+    near_dups = NearDupIndex()
+    for feed_url, entries in feeds.items():
+        if kind == 'additional':
+            # The same post in overlapping feeds, as iter_additional_deals skips it
+            unique = []
+            for entry in entries:
+                if entry.get('link') and not near_dups.find(url=entry.link):
+                    near_dups.add(entry.link, url=entry.link)
+                    unique.append(entry)
+            entries = unique
+        scheduler.add_feed(feed_url, entries)
+
+    selected = []
+    for item in scheduler:
+        key = entry_key(kind, item.entry)
+        if not key:
+            continue
+        title = item.entry.get('title')
+        if near_dups.find(title, key if kind == 'simplified' else None):
+            continue
+        near_dups.add(key, title)
+        scheduler.reserve(item)
+        selected.append((item, key))
+    return selected
+
+
+def enqueue(args):
+    """Coordinator: fetch changed feeds and enqueue the entries a run would work as one run
+
+    Selection is the scrapers' own (priority, quotas, near-duplicates) with
+    WORK_ENQUEUE_HEADROOM times the deal limit, since entries that make no
+    deal are only found out by the workers; the reducer settles the rest.
+    """
+    import feedparser
+    from feed_state import FeedState
+    from priority_scheduler import PriorityScheduler
+
+    headroom = float(os.getenv('WORK_ENQUEUE_HEADROOM', '2'))
+    feed_state = FeedState()
+    tasks = []
+    for kind, (feed_urls, scraper_class) in scrapers().items():
+        bodies, changed = feed_state.fetch_all(feed_urls)
+        if not changed and os.getenv('FORCE_RUN', '0') != '1':
+            print(f"[{kind}] No feed changes since last run")
+            continue
+        feeds = {feed_url: feedparser.parse(bodies.get(feed_url) or feed_url).entries for feed_url in feed_urls}
+        limit = int(scraper_class.deal_limit() * headroom)
+        selected = select_entries(kind, feeds, PriorityScheduler(limit, time_budget=0, feed_state=feed_state))
+        for item, key in selected:
+            payload = {'entry': entry_payload(item.entry), 'index': item.index}
+            tasks.append((kind, key, item.feed_url, item.index, item.priority, payload))
+        total = sum(len(entries) for entries in feeds.values())
+        print(f"[{kind}] Selected {len(selected)} of {total} entries (limit {limit})")
+
+    if not tasks:
+        print("Nothing to enqueue")
+        return 0
+    with WorkQueue() as queue:
+        run = queue.create_run(tasks)
+        print(f"Enqueued run {run}: {queue.counts(run).get('pending', 0)} tasks")
+    # The run is durable now, so the feeds count as seen even if this process dies
+    feed_state.commit()
+    return 0
+
+
+def work(args):
+    """Worker: lease tasks, process their entry with the scraper for their kind, complete them"""
+    from metrics import metrics
+    from near_dup import NearDupIndex
+
+    worker = args.id or f'{socket.gethostname()}-{os.getpid()}'
+    instances = {}
+    idle_since = None
+    done = 0
+    print(f"Worker {worker} started")
+
+    with WorkQueue() as queue:
+        while True:
+            task = queue.lease(worker, args.visibility)
+            if task is None:
+                idle_since = idle_since or time.time()
+                if args.idle_exit and time.time() - idle_since >= args.idle_exit:
+                    break
+                time.sleep(args.poll)
+                continue
+            idle_since = None
+
+            task_id, kind, feed_url, payload = task
+            if kind not in instances:
+                instances[kind] = scrapers()[kind][1]()
+            scraper = instances[kind]
+            entry = entry_from_payload(payload['entry'])
+            try:
+                with metrics.timed('scraper_stage_seconds', scraper=kind, stage='entry'):
+                    if kind == 'simplified':
+                        # Fresh index: links kept by other entries are dropped when the reducer replays results
+                        scraper.near_dups = NearDupIndex()
+                        source = feed_url.split('/')[2].replace('www.', '')
+                        result = scraper.process_entry(entry, payload['index'], source)
+                    else:
+                        result = scraper.process_entry(entry, payload['index'])
+            except Exception as e:
+                print(f"Task {task_id} failed: {e}")
+                queue.fail(task_id, worker, e)
+            else:
+                if not queue.complete(task_id, worker, result):
+                    print(f"Task {task_id} lease expired before it finished; result dropped")
+                done += 1
+            time.sleep(0.3)  # Be respectful; workers share the source sites
+
+    if 'additional' in instances:
+        instances['additional'].asin_cache.save()
+    metrics.write_textfile(f'worker-{worker}')
+    print(f"Worker {worker} finished {done} tasks")
+    return 0
+
+
+def reduce(args):
+    """Reducer: once a run's tasks are finished, select and save deals exactly as a normal run would"""
+    from types import SimpleNamespace
+    from feed_state import FeedState
+    from metrics import metrics, record_run
+    from pipeline import peek
+
+    with WorkQueue() as queue:
+        run = queue.oldest_open_run()
+        if not run:
+            print("No open run to reduce")
+            return 0
+        deadline = time.time() + args.wait
+        while True:
+            queue.expire_leases()
+            counts = queue.counts(run)
+            if not counts.get('pending') and not counts.get('leased'):
+                break
+            if time.time() >= deadline:
+                print(f"Run {run} still has unfinished tasks {counts}; reducing what's done")
+                break
+            time.sleep(args.poll)
+
+        feed_state = FeedState()
+        for kind, (feed_urls, scraper_class) in scrapers().items():
+            rows = queue.tasks(run, kind)
+            if not rows:
+                continue
+            started = time.time()
+            feeds = {}
+            results = {}
+            for feed_url, key, payload, result in rows:
+                feeds.setdefault(feed_url, SimpleNamespace(entries=[])).entries.append(
+                    entry_from_payload(payload['entry']))
+                results[key] = result
+
+            scraper = scraper_class()
+            feed_urls = [url for url in feed_urls if url in feeds]
+            if kind == 'simplified':
+                deals = scraper.iter_deals(feeds, feed_urls, feed_state, results=results)
+                repair = scraper.repair_affiliate_url
+            else:
+                deals = scraper.iter_additional_deals(feeds, feed_urls, feed_state, results=results)
+                repair = None
+            if os.getenv('LINK_CHECK', '1') != '0':
+                from link_checker import LinkChecker
+                deals = LinkChecker().filter_stream(deals, repair)
+            if os.getenv('IMAGE_PIPELINE', '1') != '0':
+                from image_pipeline import ImagePipeline
+                deals = ImagePipeline().process_stream(deals)
+            first, deals = peek(deals)
+            count = scraper.save_deals(deals) if first is not None else 0
+            record_run(kind, started, count)
+            print(f"[{kind}] Reduced run {run}: {count} deals from {len(rows)} tasks")
+
+        # Reliability counts from the replayed selection
+        feed_state.commit()
+        queue.finish_run(run)
+        metrics.write_textfile('reducer')
+    return 0
+
+
+def status(args):
+    with WorkQueue() as queue:
+        print(f"Open run: {queue.oldest_open_run() or '-'}")
+        for state, count in sorted(queue.counts().items()):
+            print(f"  {state:<8} {count}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('enqueue', help='coordinator: enqueue entries of changed feeds').set_defaults(func=enqueue)
+
+    worker = commands.add_parser('worker', help='lease and process tasks')
+    worker.add_argument('--id', default=None)
+    worker.add_argument('--visibility', type=int, default=VISIBILITY_TIMEOUT)
+    worker.add_argument('--poll', type=float, default=2.0)
+    worker.add_argument('--idle-exit', type=float, default=0, help='exit after this many idle seconds (0: never)')
+    worker.set_defaults(func=work)
+
+    reducer = commands.add_parser('reduce', help='build the output files from a finished run')
+    reducer.add_argument('--wait', type=float, default=1800, help='seconds to wait for unfinished tasks')
+    reducer.add_argument('--poll', type=float, default=5.0)
+    reducer.set_defaults(func=reduce)
+
+    commands.add_parser('status', help='task counts by state').set_defaults(func=status)
+
+    args = parser.parse_args()
+    raise SystemExit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { loadDeals } from '../utils/dealFeed';
 
 interface AmazonCategory {
   id: string;
@@ -31,11 +32,8 @@ const AmazonPage: React.FC = () => {
   useEffect(() => {
     const fetchAdditionalDeals = async () => {
       try {
-        const response = await fetch('/additional_deals.json');
-        if (response.ok) {
-          const deals = await response.json();
-          setAdditionalDeals(deals.slice(0, 6)); // Show first 6 deals
-        }
+        const deals = await loadDeals<AdditionalDeal>('additional_deals.json');
+        setAdditionalDeals(deals.slice(0, 6)); // Show first 6 deals
       } catch (error) {
         console.log('No additional deals file found');
       } finally {
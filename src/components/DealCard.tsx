@@ -14,6 +14,7 @@ const DealCard: React.FC<DealCardProps> = ({ deal, onClick, variant = 'default',
   const bgColor = bgColors[colorIndex % bgColors.length];
   
   const isLarge = variant === 'featured';
+  const imageSizes = '(max-width: 640px) 100vw, 300px';
   
   const handleCardClick = () => {
     if (window.innerWidth < 768) { // Mobile - center modal
@@ -39,6 +40,12 @@ const DealCard: React.FC<DealCardProps> = ({ deal, onClick, variant = 'default',
   const handleImageError = (e: React.SyntheticEvent<HTMLImageElement>) => {
     const img = e.currentTarget;
     
+    // Local thumbnails failed: drop the srcset candidates so src fallbacks take effect
+    if (img.srcset) {
+      img.removeAttribute('srcset');
+      img.parentElement?.querySelectorAll('source').forEach(source => source.remove());
+    }
+    
     // Try different fallback strategies for mobile compatibility
     if (!img.dataset.fallbackAttempt) {
       img.dataset.fallbackAttempt = '1';
@@ -75,6 +82,23 @@ const DealCard: React.FC<DealCardProps> = ({ deal, onClick, variant = 'default',
     img.src = `data:image/svg+xml,%3Csvg width='400' height='400' xmlns='http://www.w3.org/2000/svg'%3E%3Cdefs%3E%3ClinearGradient id='grad' x1='0%25' y1='0%25' x2='100%25' y2='100%25'%3E%3Cstop offset='0%25' stop-color='${bgColor}'/%3E%3Cstop offset='100%25' stop-color='%23ffffff'/%3E%3C/linearGradient%3E%3C/defs%3E%3Crect width='400' height='400' fill='url(%23grad)'/%3E%3Ctext x='50%25' y='45%25' text-anchor='middle' fill='%23333' font-family='sans-serif' font-size='18' font-weight='bold'%3E🛒%3C/text%3E%3Ctext x='50%25' y='60%25' text-anchor='middle' fill='%23333' font-family='sans-serif' font-size='14'%3E${encodeURIComponent(deal.title.substring(0, 15))}%3C/text%3E%3C/svg%3E`;
   };
   
+  const renderImage = () => (
+    <picture className="block w-full h-full">
+      {deal.imageAvifSrcSet && (
+        <source type="image/avif" srcSet={deal.imageAvifSrcSet} sizes={imageSizes} />
+      )}
+      <img 
+        src={deal.imageUrl} 
+        srcSet={deal.imageSrcSet}
+        sizes={deal.imageSrcSet ? imageSizes : undefined}
+        alt={deal.title}
+        className="w-full h-full object-cover p-2"
+        onError={handleImageError}
+        loading="lazy"
+      />
+    </picture>
+  );
+  
   // Mobile center-sliding modal
   if (isExpanded && window.innerWidth < 768) {
     return (
@@ -106,13 +130,7 @@ const DealCard: React.FC<DealCardProps> = ({ deal, onClick, variant = 'default',
               {/* Image Section */}
               <div className="relative bg-penguin-white">
                 <div className="aspect-square">
-                  <img 
-                    src={deal.imageUrl} 
-                    alt={deal.title}
-                    className="w-full h-full object-cover p-2"
-                    onError={handleImageError}
-                    loading="lazy"
-                  />
+                  {renderImage()}
                 </div>
               </div>
               
@@ -167,13 +185,7 @@ const DealCard: React.FC<DealCardProps> = ({ deal, onClick, variant = 'default',
     >
       <div className="relative h-full flex flex-col">
         <div className={`relative ${isLarge ? 'h-64' : 'h-48'} overflow-hidden`}>
-          <img 
-            src={deal.imageUrl} 
-            alt={deal.title}
-            className="w-full h-full object-cover p-2"
-            onError={handleImageError}
-            loading="lazy"
-          />
+          {renderImage()}
         </div>
         
         <div className="flex-1 p-4 bg-penguin-white/95 backdrop-blur-sm flex flex-col justify-between rounded-t-2xl">
@@ -5,6 +5,7 @@ import StoreFlyerModal from './StoreFlyerModal';
 import Sidebar from './Sidebar';
 import { Deal } from '../types/Deal';
 import { Store } from '../types/Store';
+import { loadDeals } from '../utils/dealFeed';
 // import { useIsMobile } from '../utils/useIsMobile';
 
 interface HomePageProps {
@@ -93,8 +94,7 @@ const HomePage: React.FC<HomePageProps> = ({ searchQuery: propSearchQuery = '' }
   }, []);
 
   useEffect(() => {
-    fetch('/deals.json')
-      .then(res => res.json())
+    loadDeals<Deal>('deals.json')
       .then(data => {
         setDeals(data);
         const groupedStores = groupDealsByStore(data);
@@ -2,6 +2,8 @@ export interface Deal {
   id: string;
   title: string;
   imageUrl: string;
+  imageSrcSet?: string;
+  imageAvifSrcSet?: string;
   price: number;
   originalPrice: number;
   discountPercent: number;
@@ -0,0 +1,119 @@
+/**
+ * Loads a deal file through the versioned delta feed published by the scraper.
+ * The last copy is kept in localStorage; when the published version has moved on,
+ * only the delta since that copy's version is downloaded instead of the whole file.
+ */
+
+interface FeedVersion {
+  version: number;
+  hash: string;
+  since: number[];
+}
+
+interface DealDelta<T> {
+  from: number;
+  to: number;
+  added: T[];
+  updated: T[];
+  removed: string[];
+  order?: string[];
+}
+
+interface CachedFeed<T> {
+  version: number;
+  deals: T[];
+}
+
+const CACHE_PREFIX = 'dealFeed:';
+
+function readCache<T>(file: string): CachedFeed<T> | null {
+  try {
+    const raw = window.localStorage.getItem(CACHE_PREFIX + file);
+    return raw ? JSON.parse(raw) : null;
+  } catch (error) {
+    return null;
+  }
+}
+
+function writeCache<T>(file: string, cached: CachedFeed<T>) {
+  try {
+    window.localStorage.setItem(CACHE_PREFIX + file, JSON.stringify(cached));
+  } catch (error) {
+    // Storage full or disabled: the next load downloads the full file again
+  }
+}
+
+export function applyDelta<T extends { id: string }>(deals: T[], delta: DealDelta<T>): T[] {
+  const byId: { [id: string]: T } = {};
+  deals.forEach(deal => { byId[deal.id] = deal; });
+  delta.removed.forEach(id => { delete byId[id]; });
+  delta.updated.forEach(deal => { byId[deal.id] = deal; });
+
+  const addedIds: { [id: string]: boolean } = {};
+  delta.added.forEach(deal => {
+    byId[deal.id] = deal;
+    addedIds[deal.id] = true;
+  });
+
+  // Without an explicit order, new deals go first and the rest keep their places
+  const order = delta.order || delta.added.map(deal => deal.id).concat(
+    deals.map(deal => deal.id).filter(id => id in byId && !addedIds[id])
+  );
+  return order.filter(id => id in byId).map(id => byId[id]);
+}
+
+async function fetchVersion(file: string): Promise<FeedVersion | undefined> {
+  try {
+    const response = await fetch('/version.json', { cache: 'no-cache' });
+    return response.ok ? (await response.json())[file] : undefined;
+  } catch (error) {
+    return undefined;
+  }
+}
+
+async function fetchFull<T>(file: string, version?: number): Promise<T[]> {
+  // Versioned URL and revalidation, so neither the browser nor a CDN serves an older copy
+  const url = version === undefined ? `/${file}` : `/${file}?v=${version}`;
+  const response = await fetch(url, { cache: 'no-cache' });
+  if (!response.ok) {
+    throw new Error(`Failed to load ${file}: ${response.status}`);
+  }
+  return response.json();
+}
+
+export async function loadDeals<T extends { id: string }>(file: string): Promise<T[]> {
+  const latest = await fetchVersion(file);
+  if (!latest) {
+    return fetchFull<T>(file);
+  }
+
+  const cached = readCache<T>(file);
+  if (cached && cached.version === latest.version) {
+    return cached.deals;
+  }
+
+  let deals: T[] | null = null;
+  if (cached && latest.since.indexOf(cached.version) !== -1) {
+    try {
+      const stem = file.replace(/\.json$/, '');
+      const response = await fetch(`/delta/${stem}/since-${cached.version}.json`);
+      if (response.ok) {
+        deals = applyDelta(cached.deals, await response.json());
+      }
+    } catch (error) {
+      deals = null;
+    }
+  }
+  if (!deals) {
+    deals = await fetchFull<T>(file, latest.version);
+    // The scraper writes the file before version.json, so if the version is unchanged
+    // the download is that version; otherwise it may be newer and isn't cached under it
+    const current = await fetchVersion(file);
+    if (!current || current.version !== latest.version) {
+      return deals;
+    }
+  }
+
+  writeCache(file, { version: latest.version, deals });
+  return deals;
+}